@@ -0,0 +1,266 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from data_extraction import import_data, clean_data, CACHE_DIRECTORY
+from streaming_statistics import stream_clean_data
+from data_visualization import DataVisualization
+from allele_distributions import allele_distributions
+from parallel_statistics import parallel_tumor_anova
+from synthetic_data import make_dataset
+
+"""
+This code measures how long each stage of the import -> clean_data -> query pipeline takes, and how much
+memory it allocates at its peak, on synthetic GSE50161-shaped datasets of several sizes.
+
+The results are printed as a table and can be written as JSON (--output) and compared with the JSON of
+an earlier run (--compare), e.g. of another commit, flagging the stages that got slower.
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes small realistic --output bench.json
+    python benchmarks/run_benchmarks.py --sizes small --compare bench.json
+"""
+
+# The sizes of the datasets, as (samples, probes, types). 'realistic' is the size of GSE50161.
+SIZES = {'small': (60, 5000, 5),
+         'realistic': (130, 54675, 5),
+         'scaled': (520, 54675, 8)}
+
+# The entry point of the program, whose startup (until the user interface asks for its first query) is measured.
+MAIN = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'main.py'))
+
+
+def measure(function, repeat = 3):
+
+    """
+    Runs function repeat times, and once more under tracemalloc.
+
+    Return:
+        seconds (float) - The fastest time of the runs (the least disturbed by the rest of the machine).
+
+        peak_bytes (int) - The peak memory allocated by Python and NumPy during the traced run.
+    """
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    # Tracing slows the run down, so the memory is measured in a separate run.
+    tracemalloc.start()
+    try:
+        function()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return min(times), peak_bytes
+
+
+def benchmark_size(size, num_samples, num_probes, num_types, repeat = 3, workers = None):
+
+    """
+    Benchmarks every stage of the pipeline on one synthetic dataset.
+
+    Return:
+        results (list) - A dict (size, stage, seconds, peak_bytes) for each stage.
+    """
+
+    df = make_dataset(num_samples, num_probes, num_types)
+    results = []
+
+    def record(stage, function, stage_repeat = repeat):
+        seconds, peak_bytes = measure(function, stage_repeat)
+        results.append({'size': size, 'samples': num_samples, 'probes': num_probes, 'types': num_types,
+                         'stage': stage, 'seconds': seconds, 'peak_bytes': peak_bytes})
+        print(f"{size:<10} {stage:<32} {seconds:>10.4f} s {peak_bytes / 1024 ** 2:>10.1f} MB")
+
+    current_directory = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory) # import_data looks for the CSV file in the current directory.
+
+        try:
+            df.to_csv("benchmark.csv", index=False)
+
+            def cold_cache():
+                shutil.rmtree(os.path.join(directory, CACHE_DIRECTORY), ignore_errors=True) # Every run writes the cache again.
+                return quiet(import_data, "benchmark")
+
+            record("import_data (csv, no cache)", lambda: quiet(import_data, "benchmark", use_cache=False), 1)
+            record("import_data (cold cache)", cold_cache, 1)
+            record("import_data (cached)", lambda: quiet(import_data, "benchmark"))
+
+            record("import_data (cached, compact)", lambda: quiet(import_data, "benchmark", compact=True))
+
+            loaded = quiet(import_data, "benchmark")
+            record("clean_data", lambda: quiet(clean_data, loaded, 0.01))
+
+            matrix = quiet(import_data, "benchmark", compact=True)
+            record("clean_data (compact)", lambda: quiet(clean_data, matrix, 0.01))
+
+            record("clean_data (mannwhitney, bh)", lambda: quiet(clean_data, matrix, 0.01, test='mannwhitney', correction='bh'), 1)
+            record("clean_data (permutation)", lambda: quiet(clean_data, matrix, 0.01, test='permutation'), 1)
+
+            if workers is not None and workers > 1:
+                record(f"clean_data (workers={workers})", lambda: quiet(clean_data, loaded, 0.01, workers))
+
+                # The pool even below PARALLEL_MIN_VALUES, against the single-process "clean_data" above.
+                normal = matrix.cancer_type.index('normal')
+                record(f"parallel_tumor_anova (workers={workers}, pool)",
+                       lambda: parallel_tumor_anova(matrix.values, matrix.codes, len(matrix.cancer_type), normal, workers, min_values=0), 1)
+
+            record("stream_clean_data", lambda: quiet(stream_clean_data, "benchmark", 0.01), 1)
+            record("stream_clean_data (mannwhitney)", lambda: quiet(stream_clean_data, "benchmark", 0.01, test='mannwhitney'), 1)
+
+            data = quiet(clean_data, loaded, 0.01)
+            record("DataVisualization (index)", lambda: quiet(DataVisualization, data, loaded, interactive=False))
+
+            visualization = quiet(DataVisualization, data, loaded, interactive=False)
+            tumors = [tumor for tumor in visualization.cancer_type if tumor != 'normal']
+            alleles = list(np.random.default_rng(0).choice(visualization.alleles, min(1000, num_probes), replace=False))
+
+            record("query_tumor (all tumors)", lambda: [visualization.query_tumor(tumor, 5) for tumor in tumors])
+            record("query_allele (1000 alleles)", lambda: [visualization.query_allele(allele) for allele in alleles])
+
+            def tumor_analyses():
+                visualization.cache.clear() # Measuring the computation, not the cache.
+                return [visualization.tumor_results(tumor) for tumor in tumors]
+
+            record("tumor_results (all tumors)", tumor_analyses)
+
+            record("allele_distributions (all alleles)", lambda: quiet(allele_distributions, loaded), 1)
+
+            # The whole program in a new interpreter (imports, cached import_data, clean_data and the lookups), until the
+            # user interface shows its first prompt, which is answered with 'exit'.
+            record("startup (import main)", lambda: startup(['-c', 'import main'], os.path.dirname(MAIN)), 1)
+            record("startup (time to first prompt)", lambda: startup([MAIN, '--datasets', 'benchmark', '--no-plots']), 1)
+
+        finally:
+            os.chdir(current_directory)
+
+    return results
+
+
+def startup(arguments, directory = None):
+
+    """
+    Runs python with arguments in a new process (in directory, or the current one), answering 'exit' to any prompt.
+    """
+
+    return subprocess.run([sys.executable] + arguments, input='exit\n', capture_output=True, text=True,
+                          cwd=directory, check=True)
+
+
+def quiet(function, *args, **kwargs):
+
+    """
+    Calls function without letting it print (the pipeline prints messages meant for the user).
+    """
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+
+def compare(results, baseline, tolerance):
+
+    """
+    Prints the change of every stage from the baseline run, and returns the stages that got slower than tolerance allows.
+    """
+
+    baseline_seconds = {(row['size'], row['stage']): row['seconds'] for row in baseline['results']}
+    regressions = []
+
+    print(f"\n{'size':<10} {'stage':<32} {'baseline':>10} {'current':>10} {'change':>8}")
+
+    for row in results:
+        key = (row['size'], row['stage'])
+        if key not in baseline_seconds:
+            continue
+
+        change = row['seconds'] / baseline_seconds[key] - 1
+        flag = '  SLOWER' if change > tolerance else ''
+        print(f"{row['size']:<10} {row['stage']:<32} {baseline_seconds[key]:>10.4f} {row['seconds']:>10.4f} {change:>+8.1%}{flag}")
+
+        if change > tolerance:
+            regressions.append(key)
+
+    return regressions
+
+
+def environment():
+
+    """
+    Returns the details of the run that the results depend on (commit, versions and machine).
+    """
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+            'pandas': pd.__version__, 'machine': platform.machine(), 'system': platform.system(),
+            'cpus': os.cpu_count(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def main(argv = None):
+
+    """
+    Runs the benchmarks from the command line.
+    """
+
+    parser = argparse.ArgumentParser(description="Benchmarks of the import -> clean_data -> query pipeline.")
+    parser.add_argument('--sizes', nargs='+', default=['small', 'realistic'], choices=sorted(SIZES) + ['custom'])
+    parser.add_argument('--samples', type=int, default=130, help="Samples of the 'custom' size.")
+    parser.add_argument('--probes', type=int, default=54675, help="Probes of the 'custom' size.")
+    parser.add_argument('--types', type=int, default=5, help="Types (including normal) of the 'custom' size.")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs of each stage (the fastest one is kept).")
+    parser.add_argument('--workers', type=int, default=None, help="Also benchmark clean_data on this many processes.")
+    parser.add_argument('--output', help="Write the results to this JSON file.")
+    parser.add_argument('--compare', help="Compare the results with the JSON file of an earlier run.")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed slowdown before a stage is flagged (0.2 = 20%%).")
+    arguments = parser.parse_args(argv)
+
+    print(f"{'size':<10} {'stage':<32} {'time':>12} {'peak memory':>13}")
+
+    results = []
+    for size in arguments.sizes:
+        num_samples, num_probes, num_types = SIZES.get(size, (arguments.samples, arguments.probes, arguments.types))
+        results += benchmark_size(size, num_samples, num_probes, num_types, arguments.repeat, arguments.workers)
+
+    report = {'environment': environment(), 'results': results}
+
+    if arguments.output:
+        with open(arguments.output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if arguments.compare:
+        with open(arguments.compare, encoding='utf-8') as baseline_file:
+            regressions = compare(results, json.load(baseline_file), arguments.tolerance)
+
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) slower than the baseline by more than {arguments.tolerance:.0%}.")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
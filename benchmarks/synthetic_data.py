@@ -0,0 +1,62 @@
+import pandas as pd
+import numpy as np
+
+"""
+This code generates synthetic expression datasets shaped like the GSE50161 CSV file:
+a 'samples' column, a 'type' column and one column of (log2 scale) expression values per probe,
+with a share of the probes shifted in each tumor so that clean_data finds significant ones.
+"""
+
+# The tumor types of GSE50161.
+TUMOR_TYPES = ['ependymoma', 'glioblastoma', 'medulloblastoma', 'pilocytic_astrocytoma']
+
+
+def probe_names(num_probes):
+
+    """
+    Returns num_probes Affymetrix-like probe names (e.g. '1000001_at', '1000002_s_at').
+    """
+
+    suffixes = np.array(['_at', '_s_at', '_x_at', '_a_at'])
+
+    return [f"{1000000 + probe}{suffixes[probe % 4]}" for probe in range(num_probes)]
+
+
+def make_dataset(num_samples = 130, num_probes = 54675, num_types = 5, significant_share = 0.05, seed = 0):
+
+    """
+    Generates a synthetic dataset.
+
+    Args:
+        num_samples (int) - The number of samples (rows). Baseline is 130 (as in GSE50161).
+
+        num_probes (int) - The number of probes (expression columns). Baseline is 54675 (as in GSE50161).
+
+        num_types (int) - The number of sample types, including 'normal'. Baseline is 5 (as in GSE50161).
+
+        significant_share (float) - The share of probes shifted in each tumor. Baseline is 0.05.
+
+        seed (int) - The seed of the random generator, so that every run generates the same data.
+
+    Return:
+        df (DataFrame) - The dataset, in the layout import_data returns.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    # 'normal' and the tumor types (with made up names if more types than GSE50161 are asked for).
+    types = ['normal'] + [TUMOR_TYPES[tumor] if tumor < len(TUMOR_TYPES) else f"tumor_{tumor}" for tumor in range(num_types - 1)]
+    codes = np.arange(num_samples) % num_types # Every type gets about the same number of samples.
+
+    values = rng.normal(7, 1.5, (num_samples, num_probes)).astype(np.float32)
+
+    # Shifting a random share of the probes in each tumor.
+    for tumor in range(1, num_types):
+        probes = rng.choice(num_probes, int(num_probes * significant_share), replace=False)
+        values[np.ix_(codes == tumor, probes)] += rng.choice([-2, 2], len(probes)).astype(np.float32)
+
+    df = pd.DataFrame(values, columns=probe_names(num_probes), copy=False)
+    df.insert(0, 'type', np.array(types)[codes])
+    df.insert(0, 'samples', np.arange(num_samples))
+
+    return df
@@ -1,17 +1,57 @@
 #main.py: Entry point for the project
 
-from src.data_extraction import import_data, clean_data, print_data  
-from src.data_visualization import DataVisualization
+import argparse
+import os
 
+from src.data_extraction import import_data, clean_data, print_data, dataset_key  
+from src.data_visualization import DataVisualization, load_pyplot
 
-def main():
+# The modules of the other modes (the server, the overview, the incremental statistics...) are only imported by the
+# branch of run() that uses them, so that the user interface starts without loading them.
+
+
+def main(argv = None):
     """
     This is the main function of the project. It first defines some essential variables  
     that'll be used later on throughout the code and then runs the functions. 
+
+    Args:
+        argv (list) - The command line arguments (see parse_arguments). If no value is used 
+                      then the arguments of the program are used.
     """  
+
+    arguments = parse_arguments(argv)
+
+    if not (arguments.profile or arguments.profile_memory or arguments.cprofile or arguments.profile_output):
+        run(arguments)
+        return
+
+    # Recording the time (and memory) of every stage, and reporting them once the program ends (see instrumentation.py).
+    from src.instrumentation import enable_instrumentation, disable_instrumentation, summary_table, export_json
+
+    enable_instrumentation(memory=arguments.profile_memory, profile=arguments.cprofile)
+
+    try:
+        run(arguments)
+    finally:
+        result = disable_instrumentation()
+        print('\n' + summary_table(result))
+
+        if arguments.profile_output:
+            export_json(arguments.profile_output, result)
+            print(f"\nProfile saved to {arguments.profile_output}.")
+
+
+def run(arguments):
+    """
+    Loads and cleans the data and runs the mode chosen in the command line arguments.
+
+    Args:
+        arguments (Namespace) - The parsed arguments (see parse_arguments).
+    """
            # Initializing Important Variables:
 
-    csv_name = "Brain_GSE50161" # Name of the CSV file.
+    csv_name = arguments.datasets[0] # Name of the CSV file (Brain_GSE50161 unless --datasets is used).
 
     # Significance threshold for identifying significant alleles.
     critical_alpha = 0.01 # Can be somewhere between 0 and 1.
@@ -22,19 +62,227 @@ def main():
     # Threshold for identifying significant correlations. 
     corr_threshold = 0.7 # Can be somewhere between 0 and 1.
 
+    # Whether to draw the plots (without them, matplotlib and seaborn are never imported).
+    plots = not arguments.no_plots
+
 
                     # Running The Code:
 
-    # Load data from CSV file.
-    df = import_data(csv_name) #Ensure csv_name is in the correct directory.
+    if len(arguments.datasets) > 1:
+        # Analysing several datasets at once, on the alleles they share (see multi_dataset.py).
+        from src.multi_dataset import compare_datasets, replicated_alleles
+
+        combined = compare_datasets(arguments.datasets, critical_alpha, arguments.test, arguments.correction)
+
+        if combined is not None:
+            print('\n' + replicated_alleles(combined).drop(columns='replicated_alleles').to_string())
+
+            if arguments.combined_output:
+                combined.to_csv(arguments.combined_output)
+                print(f"\nCombined results saved to {arguments.combined_output}.")
+        return
+
+    if arguments.verify:
+        # Checking that the incrementally updated statistics give the same results as a full recompute.
+        from src.incremental_statistics import verify_statistics
+
+        verify_statistics(csv_name, critical_alpha, arguments.test, arguments.correction)
+        return
+
+    if arguments.incremental:
+        # Only the samples appended since the last run are analysed (see incremental_statistics.py). They are also
+        # appended to the binary copy of the file, so loading every sample below (for the intervals, the overview and
+        # the user interface) reads that copy instead of parsing the whole file again.
+        from src.incremental_statistics import incremental_clean_data
+
+        data = incremental_clean_data(csv_name, critical_alpha, arguments.test, arguments.correction)
+
+        if data is None: # The statistics could not be computed (the reason was already printed).
+            return
+
+    # Load data from CSV file, as a compact float32 matrix (see expression_matrix.py).
+    df = import_data(csv_name, compact=True) #Ensure csv_name is in the correct directory.
+
+    if df is None: # The file could not be loaded (the reason was already printed).
+        return
+
+    # The gene of each probe, from a local annotation file of the platform (see gene_annotation.py).
+    annotation = None
+    if arguments.annotation:
+        from src.gene_annotation import load_annotation
+        annotation = load_annotation(arguments.annotation)
+    source = dataset_key(csv_name) # Identifies the data of a saved analysis (--artifact).
 
-    # Modified data after statistical analysis.
-    data = clean_data(df, critical_alpha)
+    if annotation is not None and arguments.genes and arguments.incremental:
+        print('\nThe stored statistics of --incremental are of the probes, so --genes was not used.')
+
+    elif annotation is not None and arguments.genes:
+        # Collapsing the probes of each gene, so that everything below runs at gene level.
+        from src.gene_annotation import aggregate_genes
+
+        df = aggregate_genes(df, annotation, arguments.genes)
+        if df is None:
+            return
+        source = dict(source or {}, genes=arguments.genes, annotation=os.path.abspath(arguments.annotation))
+
+    # Modified data after statistical analysis (only the significant entries, see allele_table.py).
+    if arguments.incremental: # The significant alleles were found above, from the stored statistics.
+        pass
+    elif arguments.artifact: # The saved analysis is reused while the CSV file and the parameters are unchanged (see analysis_artifact.py).
+        from src.analysis_artifact import load_or_build_artifact
+
+        artifact = load_or_build_artifact(arguments.artifact, df, critical_alpha, arguments.workers, arguments.test,
+                                          arguments.correction, source=source)
+        data = artifact.to_table(sparse=True) if artifact is not None else None
+    else:
+        data = clean_data(df, critical_alpha, arguments.workers, arguments.test, arguments.correction, sparse=True)
 
     # print_data(data) # Optional.  
 
-    # Visualising data of the excel using user interface.
-    DataVisualization(data, df)
+    if arguments.intervals_output and data is not None:
+        # The confidence intervals and P values of the fold changes of every significant allele (see resampling.py).
+        from src.resampling import fold_change_intervals, significant_alleles
+
+        intervals = fold_change_intervals(df, significant_alleles(data), arguments.resamples or 1000, arguments.resamples or 1000,
+                                          workers=arguments.workers)
+        if intervals is not None:
+            intervals.to_csv(arguments.intervals_output)
+            print(f"\nConfidence intervals saved to {arguments.intervals_output}.")
+
+    if arguments.overview:
+        # How the samples separate over all the alleles (or the significant ones): PCA and clustering (see sample_overview.py).
+        from src.sample_overview import sample_overview, plot_sample_overview
+
+        overview = sample_overview(df, data if arguments.overview_significant else None, clusters=arguments.clusters,
+                                   method=arguments.cluster_method)
+
+        if overview is not None:
+            print('\nVariance explained by each principal component:\n' + overview['explained'].round(4).to_string())
+            print('\nSamples of each type in each cluster:\n' + overview['types_by_cluster'].to_string())
+            print('\nAlleles of each cluster (of the top alleles of the components):')
+            for cluster, alleles in overview['probe_clusters'].groupby(overview['probe_clusters']):
+                print(f"Cluster {cluster}: {', '.join(alleles.index)}")
+
+            if plots:
+                plt = load_pyplot()
+                figure, axes = plt.subplots(figsize=(10, 7))
+                plot_sample_overview(axes, overview)
+                plt.show()
+
+    elif arguments.batch:
+        # Saving the plots of the requested tumors and alleles to files, without any user interface.
+        from src.batch_report import run_batch_report
+
+        visualization = DataVisualization(data, df, num_for_plot, corr_threshold, interactive=False, plots=plots,
+                                          rank_by=arguments.rank_by, resamples=arguments.resamples,
+                                          annotation=annotation)
+        run_batch_report(visualization, arguments.tumors, arguments.alleles, arguments.output, arguments.workers)
+
+    elif arguments.serve:
+        # Serving the analyses over HTTP to several analysts, with the data loaded and cleaned once.
+        from src.query_server import serve
+
+        visualization = DataVisualization(data, df, num_for_plot, corr_threshold, interactive=False, plots=plots,
+                                          rank_by=arguments.rank_by, resamples=arguments.resamples,
+                                          annotation=annotation)
+        serve(visualization, arguments.host, arguments.port)
+
+    elif arguments.session:
+        # The same user interface, computing the queries in the background and showing the results as they finish.
+        from src.interactive_session import InteractiveSession
+
+        visualization = DataVisualization(data, df, num_for_plot, corr_threshold, interactive=False, plots=plots,
+                                          rank_by=arguments.rank_by, resamples=arguments.resamples,
+                                          annotation=annotation)
+        InteractiveSession(visualization, arguments.workers or 2).run()
+
+    else:
+        # Visualising data of the excel using user interface.
+        DataVisualization(data, df, num_for_plot, corr_threshold, plots=plots, rank_by=arguments.rank_by,
+                          resamples=arguments.resamples, annotation=annotation)
+
+
+def parse_arguments(argv = None):
+    """
+    Parses the command line arguments of the program. 
+
+    Args:
+        argv (list) - The command line arguments. If no value is used then the arguments of the program are used.
+
+    Return:
+        arguments (Namespace) - The parsed arguments.
+    """
+
+    # Only the choices of the options, from modules whose own imports are already loaded at this point.
+    from src.statistical_tests import TESTS, CORRECTIONS
+    from src.query_index import RANKINGS
+    from src.sample_overview import CLUSTERING_METHODS
+    from src.gene_annotation import AGGREGATIONS
+
+    parser = argparse.ArgumentParser(description="Brain cancer gene expression analysis.")
+
+    parser.add_argument('--batch', action='store_true',
+                        help="Save the plots of --tumors and --alleles to files instead of running the user interface.")
+    parser.add_argument('--session', action='store_true',
+                        help="Run the user interface without blocking: queries are computed in the background (and the tumors prefetched).")
+    parser.add_argument('--serve', action='store_true',
+                        help="Serve the analyses as JSON and PNG over HTTP instead of running the user interface.")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="Address the server listens on (default: 127.0.0.1).")
+    parser.add_argument('--port', type=int, default=8000,
+                        help="Port the server listens on (default: 8000).")
+    parser.add_argument('--tumors', nargs='*', default=[], metavar='TUMOR',
+                        help="Tumor types to report in batch mode, or 'all'.")
+    parser.add_argument('--alleles', nargs='*', default=[], metavar='ALLELE',
+                        help="Alleles to report in batch mode, or 'all'.")
+    parser.add_argument('--output', default='report',
+                        help="Directory of the batch report (default: report).")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Number of processes for the statistics and the batch rendering.")
+    parser.add_argument('--test', default='anova', choices=TESTS,
+                        help="Test comparing each tumor with the normal tissue (default: anova).")
+    parser.add_argument('--correction', default=None, choices=[correction for correction in CORRECTIONS if correction],
+                        help="Correction of the P values for testing every allele (default: none).")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Update the stored per-type statistics with the newly appended samples instead of analysing the whole file.")
+    parser.add_argument('--verify', action='store_true',
+                        help="Check that the incrementally updated statistics match a full recompute, then exit.")
+    parser.add_argument('--datasets', nargs='+', default=['Brain_GSE50161'], metavar='CSV',
+                        help="The CSV files to analyse (default: Brain_GSE50161). With several, they are compared on their shared alleles.")
+    parser.add_argument('--combined-output', default=None, metavar='PATH',
+                        help="Save the combined results of several --datasets as CSV to PATH.")
+    parser.add_argument('--artifact', default=None, metavar='PATH',
+                        help="Save the analysis to PATH (a .npz file) and reload it from there while the data and parameters are unchanged.")
+    parser.add_argument('--resamples', type=int, default=0,
+                        help="Print bootstrap confidence intervals and permutation P values (with N resamples) with the fold changes of an allele.")
+    parser.add_argument('--intervals-output', default=None, metavar='PATH',
+                        help="Save the confidence intervals of the fold changes of every significant allele as CSV to PATH.")
+    parser.add_argument('--overview', action='store_true',
+                        help="Run a PCA of the samples and cluster the samples and the top alleles, then exit.")
+    parser.add_argument('--overview-significant', action='store_true',
+                        help="Use only the alleles significant in at least one tumor in --overview.")
+    parser.add_argument('--clusters', type=int, default=None,
+                        help="The number of clusters of --overview (default: the number of sample types).")
+    parser.add_argument('--cluster-method', default='kmeans', choices=CLUSTERING_METHODS,
+                        help="How --overview clusters the samples (default: kmeans).")
+    parser.add_argument('--annotation', default=None, metavar='PATH',
+                        help="A local annotation file of the platform (e.g. GPL570.annot from GEO), to look up genes by their symbol.")
+    parser.add_argument('--genes', default=None, choices=AGGREGATIONS,
+                        help="With --annotation, collapse the probes of each gene (by their mean, max or most variable probe) and analyse genes.")
+    parser.add_argument('--rank-by', default='difference', choices=RANKINGS,
+                        help="How the top alleles of a tumor are chosen: by difference from normal, log2 fold change or t statistic (default: difference).")
+    parser.add_argument('--no-plots', action='store_true',
+                        help="Only print the analyses (and write the batch summary table), without drawing any plot.")
+    parser.add_argument('--profile', action='store_true',
+                        help="Time every stage (and count the probes tested, significant and the cache hits), and print a summary at the end.")
+    parser.add_argument('--profile-memory', action='store_true',
+                        help="Also record the peak memory of every stage with tracemalloc (slower).")
+    parser.add_argument('--cprofile', action='store_true',
+                        help="Also capture a cProfile profile of the run and print its top functions.")
+    parser.add_argument('--profile-output', default=None, metavar='PATH',
+                        help="Save the profile as JSON to PATH.")
+
+    return parser.parse_args(argv)
 
 
 if __name__ == "__main__":
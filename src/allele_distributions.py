@@ -0,0 +1,353 @@
+import pandas as pd
+import numpy as np
+
+try: # When src is on sys.path (as in the tests).
+    from expression_matrix import as_expression_matrix
+    from instrumentation import span, timed
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.expression_matrix import as_expression_matrix
+    from src.instrumentation import span, timed
+
+"""
+This code precomputes the distribution of the expression of every allele, so that the plots and the statistical
+summaries of analyze_allele_expression (and of batch_report.py, which draws thousands of them) are read from
+arrays instead of being computed (describe() and a seaborn KDE fit) for each allele that is queried.
+
+For every allele, at once for blocks of alleles:
+
+    statistics - What describe() returns (count, mean, std, min, quartiles, max), in all the samples and in the
+                 samples of each type (from a single sort of the columns of the block, skipping missing values).
+    histograms - The counts of a fixed number of equal bins between the minimum and the maximum of the allele,
+                 in all the samples and in the samples of each type (on the same bins): the bin of every value
+                 is computed for the whole block, and the counts of every (type, allele, bin) are a single
+                 np.bincount.
+    KDE        - The kernel density estimate of all the samples (a Gaussian kernel with Scott's bandwidth, as
+                 seaborn's histplot(..., kde=True) fits it with scipy), evaluated on a grid of points between
+                 the minimum and the maximum. The values are spread linearly over the grid and convolved with the
+                 kernel of each allele through the FFT (the kernel is a product in the frequency domain), so no
+                 samples x grid x alleles array is ever formed.
+
+Missing (NaN) values are left out of all of them, as describe() and seaborn leave them out. The histograms are
+kept in the smallest integer type that holds the number of samples, the statistics in float64 (so the summaries
+print the same digits as describe()) and the KDE in float32 (the type of the expression values).
+"""
+
+# The statistics of the summary of an allele, in the order of describe().
+STATISTICS = ('count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max')
+
+
+class AlleleDistributions:
+    """
+    This class holds the statistics, histograms and KDE of the expression of every allele.
+    """
+
+    def __init__(self, df, bins = None, grid_size = 100, block_size = 4096):
+        """
+        Computes the distributions.
+
+        Args:
+           df (DataFrame / ExpressionMatrix) - Consists of the raw data of the file.
+
+           bins (int) - The number of bins of the histograms. If no value is used then it is given by the
+                        number of samples (Sturges' rule, log2(samples) + 1).
+
+           grid_size (int) - The number of points the KDE is evaluated at. Baseline is 100.
+
+           block_size (int) - The number of alleles computed at once. Baseline is 4096.
+        """
+
+        matrix = as_expression_matrix(df)
+        samples, allele_count = matrix.values.shape
+
+        # In case the programmer has inserted invalid values.
+        if bins is not None and (type(bins) is not int or bins < 1):
+            bins = None
+            print("\nInserted number of bins is invalid. Baseline value (Sturges' rule) was used instead.")
+
+        if type(grid_size) is not int or grid_size < 2:
+            grid_size = 100
+            print('\nInserted size of the grid is invalid. Baseline value (100) was used instead.')
+
+        self.alleles = matrix.alleles
+        self.cancer_type = list(matrix.cancer_type)
+        self.samples = samples
+        self.bins = bins or int(np.ceil(np.log2(max(samples, 1)))) + 1
+        self.grid_size = grid_size
+
+        # The statistics (STATISTICS x alleles), in all the samples and in the samples of each type (types x STATISTICS x alleles).
+        self.statistics = np.empty((len(STATISTICS), allele_count))
+        self.tumor_statistics = np.empty((len(self.cancer_type), len(STATISTICS), allele_count))
+
+        # The lowest and highest edges of the bins of each allele (the bins are equal in between).
+        self.lows = np.empty(allele_count)
+        self.highs = np.empty(allele_count)
+
+        # The counts of the bins, in all the samples (alleles x bins) and in the samples of each type (types x alleles x bins).
+        count_type = np.min_scalar_type(max(samples, 1))
+        self.counts = np.empty((allele_count, self.bins), dtype=count_type)
+        self.tumor_counts = np.empty((len(self.cancer_type), allele_count, self.bins), dtype=count_type)
+
+        # The KDE of each allele on grid_size points from its minimum to its maximum (NaN if all its values are equal).
+        self.density = np.empty((allele_count, grid_size), dtype=np.float32)
+
+        with span('allele_distributions', alleles=allele_count):
+            for start in range(0, allele_count, block_size):
+                block = slice(start, min(start + block_size, allele_count))
+                self._compute_block(matrix, block)
+
+
+    def _compute_block(self, matrix, block):
+        """
+        Computes the distributions of a block (a slice) of alleles.
+        """
+
+        values = matrix.values[:, block].astype(np.float64)
+        codes = matrix.codes
+
+        statistics = describe_columns(values)
+        self.statistics[:, block] = statistics
+
+        for code in range(len(self.cancer_type)):
+            self.tumor_statistics[code][:, block] = describe_columns(values[codes == code])
+
+        minimums, maximums = statistics[STATISTICS.index('min')], statistics[STATISTICS.index('max')]
+
+        # The bins of an allele whose values are all equal are around its value (as np.histogram makes them).
+        constant = minimums == maximums
+        self.lows[block] = np.where(constant, minimums - 0.5, minimums)
+        self.highs[block] = np.where(constant, maximums + 0.5, maximums)
+
+        # The bin of every value, and the counts of every (type, allele, bin) at once.
+        bin_indexes = bin_columns(values, self.lows[block], self.highs[block], self.bins)
+
+        alleles = values.shape[1]
+        cells = (codes.astype(np.intp)[:, None] * alleles + np.arange(alleles)) * self.bins + bin_indexes
+        counts = np.bincount(cells[(codes >= 0)[:, None] & (bin_indexes >= 0)], minlength=len(self.cancer_type) * alleles * self.bins)
+
+        self.tumor_counts[:, block] = counts.reshape(len(self.cancer_type), alleles, self.bins)
+        self.counts[block] = histogram_columns(bin_indexes, self.bins)
+
+        self.density[block] = kde_columns(values, minimums, maximums, np.nan_to_num(statistics[STATISTICS.index('std')]), self.grid_size)
+
+
+    def nbytes(self):
+        """
+        Returns the memory (in bytes) used by the distributions.
+        """
+
+        arrays = [self.statistics, self.tumor_statistics, self.lows, self.highs, self.counts, self.tumor_counts, self.density]
+
+        return sum(array.nbytes for array in arrays)
+
+
+    def summary(self, allele, tumor_type = None):
+        """
+        Returns the statistical summary of the expression of allele (what describe() returns).
+
+        Args:
+            allele (str) - The name of the allele.
+
+            tumor_type (str) - The tumor whose samples are summarised. If no value is used then all the samples are.
+
+        Return:
+            summary (Series) - The statistics (in index) of the allele, named after it.
+        """
+
+        position = self.alleles.get_loc(allele)
+        statistics = self.statistics if tumor_type is None else self.tumor_statistics[self.cancer_type.index(tumor_type)]
+
+        return pd.Series(statistics[:, position], index=list(STATISTICS), name=allele)
+
+
+    def histogram(self, allele, tumor_type = None):
+        """
+        Returns the histogram of the expression of allele.
+
+        Args:
+            allele (str) - The name of the allele.
+
+            tumor_type (str) - The tumor whose samples are counted (on the bins of all the samples).
+                               If no value is used then all the samples are.
+
+        Return:
+            counts (ndarray) - The number of samples in each bin.
+
+            edges (ndarray) - The edges of the bins (one more than the bins).
+        """
+
+        position = self.alleles.get_loc(allele)
+        counts = self.counts if tumor_type is None else self.tumor_counts[self.cancer_type.index(tumor_type)]
+
+        return counts[position], np.linspace(self.lows[position], self.highs[position], self.bins + 1)
+
+
+    def distribution(self, allele):
+        """
+        Returns what plot_allele_distribution draws for allele.
+
+        Return:
+            distribution (dict) - 'counts' and 'edges' (as returned by histogram), 'grid' (the points of the KDE),
+                                  'density' (the KDE at those points) and 'samples' (the number of samples with a value).
+        """
+
+        position = self.alleles.get_loc(allele)
+        counts, edges = self.histogram(allele)
+        minimum, maximum = self.statistics[STATISTICS.index('min'), position], self.statistics[STATISTICS.index('max'), position]
+
+        return {'counts': counts, 'edges': edges, 'grid': np.linspace(minimum, maximum, self.grid_size),
+                'density': self.density[position], 'samples': int(self.statistics[STATISTICS.index('count'), position])}
+
+
+@timed('allele_distributions')
+def allele_distributions(df, bins = None, grid_size = 100, block_size = 4096):
+
+    """
+    Precomputes the distribution of the expression of every allele (see AlleleDistributions).
+
+    Return:
+        distributions (AlleleDistributions) - The statistics, histograms and KDE of every allele.
+    """
+
+    return AlleleDistributions(df, bins, grid_size, block_size)
+
+
+def distribution_of(allele_data, bins = None, grid_size = 100):
+
+    """
+    Computes what AlleleDistributions.distribution returns for the expression of a single allele that was not
+    precomputed (e.g. the data given to plot_allele_distribution directly).
+
+    Args:
+        allele_data (Series / array) - The expression of the allele in every sample.
+
+        bins, grid_size - As AlleleDistributions takes them.
+    """
+
+    values = np.asarray(allele_data, dtype=np.float64).reshape(-1, 1)
+    statistics = describe_columns(values)
+    samples = int(statistics[STATISTICS.index('count'), 0])
+    bins = bins or int(np.ceil(np.log2(max(samples, 1)))) + 1
+
+    minimum, maximum = statistics[STATISTICS.index('min')], statistics[STATISTICS.index('max')]
+    low, high = np.where(minimum == maximum, minimum - 0.5, minimum), np.where(minimum == maximum, maximum + 0.5, maximum)
+
+    return {'counts': histogram_columns(bin_columns(values, low, high, bins), bins)[0],
+            'edges': np.linspace(low[0], high[0], bins + 1),
+            'grid': np.linspace(minimum[0], maximum[0], grid_size),
+            'density': kde_columns(values, minimum, maximum, np.nan_to_num(statistics[STATISTICS.index('std')]), grid_size)[0],
+            'samples': samples}
+
+
+def describe_columns(values):
+
+    """
+    Returns what describe() returns for each column of values (STATISTICS x columns), skipping the NaN values.
+    NaN for the statistics of columns without values (and for the std of columns with a single value), as describe() gives them.
+    """
+
+    valid = ~np.isnan(values)
+    counts = valid.sum(axis=0)
+
+    statistics = np.full((len(STATISTICS), values.shape[1]), np.nan)
+    statistics[0] = counts
+
+    if values.shape[0] == 0:
+        return statistics
+
+    missing = not valid.all()
+
+    with np.errstate(divide='ignore', invalid='ignore'): # Columns without values (or with a single one) give 0/0.
+        if missing:
+            means = np.where(valid, values, 0).sum(axis=0) / counts
+            statistics[1] = means
+            statistics[2] = np.sqrt((np.where(valid, values - means, 0) ** 2).sum(axis=0) / (counts - 1))
+        else: # The same, without copying the values.
+            statistics[1] = values.mean(axis=0)
+            if values.shape[0] > 1:
+                statistics[2] = values.std(axis=0, ddof=1)
+    statistics[2, counts < 2] = np.nan
+
+    # The quartiles are interpolated between the sorted values of each column (as np.percentile does, but sorting once is
+    # faster than its three partitions; the NaN values are sorted last), and the minimum and the maximum are the first
+    # and last of them.
+    ordered = np.sort(values, axis=0)
+    columns = np.arange(values.shape[1]) if missing else slice(None)
+    last = np.maximum(counts - 1, 0) if missing else values.shape[0] - 1 # (The same position in every column if none is missing.)
+
+    for row, quantile in zip((4, 5, 6), (0.25, 0.5, 0.75)):
+        position = quantile * last
+        lower = np.asarray(position).astype(np.intp)
+        upper = np.minimum(lower + 1, last)
+        statistics[row] = ordered[lower, columns] + (ordered[upper, columns] - ordered[lower, columns]) * (position - lower)
+    statistics[3], statistics[7] = ordered[0], ordered[last, columns]
+
+    statistics[1:, counts == 0] = np.nan
+
+    return statistics
+
+
+def bin_columns(values, lows, highs, bins):
+
+    """
+    Returns the bin of every value, for bins equal bins from lows to highs in each column (the highs fall in the last bin).
+    The NaN values are in no bin (-1).
+    """
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bin_indexes = np.floor((values - lows) / (highs - lows) * bins)
+
+    bin_indexes = np.clip(np.nan_to_num(bin_indexes), 0, bins - 1).astype(np.intp)
+    bin_indexes[np.isnan(values)] = -1
+
+    return bin_indexes
+
+
+def histogram_columns(bin_indexes, bins):
+
+    """
+    Returns the counts of each bin in each column of bin_indexes (as returned by bin_columns), as a columns x bins array.
+    """
+
+    columns = bin_indexes.shape[1]
+    cells = np.arange(columns) * bins + bin_indexes
+    counts = np.bincount(cells[bin_indexes >= 0], minlength=columns * bins)
+
+    return counts.reshape(columns, bins)
+
+
+def kde_columns(values, minimums, maximums, stds, grid_size):
+
+    """
+    Returns the Gaussian KDE (with Scott's bandwidth) of each column of values, evaluated on grid_size points
+    from its minimum to its maximum (columns x grid_size, float32). NaN for the columns whose values are all equal.
+    """
+
+    columns = values.shape[1]
+    valid = ~np.isnan(values)
+    samples = valid.sum(axis=0) # The NaN values are left out.
+    steps = (maximums - minimums) / (grid_size - 1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bandwidths = stds * samples ** (-1 / 5)
+
+        # Every value is split between the two points of the grid around it, in proportion to how close it is.
+        positions = np.clip(np.nan_to_num((values - minimums) / steps), 0, grid_size - 1)
+        lower = np.minimum(positions.astype(np.intp), grid_size - 2)
+        upper_weights = positions - lower
+
+        offsets = np.arange(columns) * grid_size
+        weights = np.bincount((lower + offsets).ravel(), ((1 - upper_weights) * valid).ravel(), minlength=columns * grid_size)
+        weights += np.bincount((lower + 1 + offsets).ravel(), (upper_weights * valid).ravel(), minlength=columns * grid_size)
+
+        # The convolution with the Gaussian kernel of each column, as a product of their Fourier transforms. The grid is
+        # padded (to four times its size) so that the kernels wrapping around its ends add nothing noticeable.
+        length = 4 * grid_size
+        frequencies = np.arange(length // 2 + 1) / length
+        transfers = np.exp(-2 * np.pi ** 2 * (bandwidths / steps)[:, None] ** 2 * frequencies ** 2)
+
+        smoothed = np.fft.irfft(np.fft.rfft(weights.reshape(columns, grid_size), length, axis=1) * transfers, length, axis=1)
+        density = np.maximum(smoothed[:, :grid_size], 0) / (samples[:, None] * steps[:, None])
+
+    density[~(bandwidths > 0) | ~(steps > 0)] = np.nan
+
+    return density.astype(np.float32)
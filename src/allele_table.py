@@ -0,0 +1,187 @@
+import pandas as pd
+import numpy as np
+
+"""
+This code keeps the result of clean_data (the mean expression of the significant alleles of each tumor)
+in a sparse form, instead of a DataFrame with a column for every significant allele and NaN everywhere else.
+
+Only the significant entries are stored: for every tumor (one after another, in the order of the rows of the
+table) the positions of its significant alleles among the columns, in increasing order, and their means, with
+the offset where each tumor starts (the compressed sparse row layout). The memory therefore grows with the
+number of significant alleles rather than with tumors x alleles, and the significant alleles of a tumor are
+read directly instead of being found by scanning its whole row for NaN (row.dropna()). The rows and columns are
+in the order of the DataFrame (clean_data(..., sparse=False) returns to_frame()), and QueryIndex, DataVisualization
+and print_data accept an AlleleTable anywhere they accept data.
+"""
+
+class AlleleTable:
+    """
+    This class holds the mean expression of the significant alleles of each tumor.
+    """
+
+    def __init__(self, index, columns, offsets, indexes, values):
+        """
+        Builds the table.
+
+        Args:
+           index (list / Index) - The tumors (the rows of the table).
+
+           columns (list / Index) - The alleles that are significant in at least one tumor (the columns of the table).
+
+           offsets (ndarray) - Where the entries of each tumor start in indexes and values (one more than the tumors).
+
+           indexes (ndarray) - The column of each entry (in increasing order within each tumor).
+
+           values (ndarray) - The mean expression of each entry.
+        """
+
+        self.index = pd.Index(index)
+        self.columns = pd.Index(columns)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.indexes = np.asarray(indexes, dtype=np.int32)
+        self.values = np.asarray(values, dtype=np.float64)
+
+        # The row of each tumor (a hash table rather than a search through the Index).
+        self.rows = {tumor: row for row, tumor in enumerate(self.index)}
+
+
+    def __len__(self):
+        """
+        Returns the number of tumors.
+        """
+
+        return len(self.index)
+
+
+    def nbytes(self):
+        """
+        Returns the memory (in bytes) used by the entries of the table.
+        """
+
+        return self.offsets.nbytes + self.indexes.nbytes + self.values.nbytes
+
+
+    def entries(self, tumor_type):
+        """
+        Returns the columns (in increasing order) and the mean expressions of the significant alleles of tumor_type.
+        """
+
+        row = self.rows[tumor_type] # Raises KeyError for a tumor that is not in the table, as data.loc does.
+        entries = slice(self.offsets[row], self.offsets[row + 1])
+
+        return self.indexes[entries], self.values[entries]
+
+
+    def tumor(self, tumor_type):
+        """
+        Returns the significant alleles of tumor_type with their mean expression (what data.loc[tumor_type].dropna() returns).
+
+        Args:
+            tumor_type (str) - The name of the tumor.
+
+        Return:
+            row (Series) - The mean expression (in values) of each significant allele (in index).
+        """
+
+        indexes, values = self.entries(tumor_type)
+
+        return pd.Series(values, index=self.columns[indexes], name=tumor_type)
+
+
+    def counts(self):
+        """
+        Returns the number of significant alleles of each tumor (what data.count(axis=1) returns).
+        """
+
+        return pd.Series(np.diff(self.offsets), index=self.index)
+
+
+    def to_frame(self):
+        """
+        Converts the table into the DataFrame clean_data returns (NaN for the alleles that are not significant).
+        """
+
+        if len(self) == 0:
+            return pd.DataFrame()
+
+        table = np.full((len(self.index), len(self.columns)), np.nan)
+        rows = np.repeat(np.arange(len(self.index)), np.diff(self.offsets))
+        table[rows, self.indexes] = self.values
+
+        return pd.DataFrame(table, index=self.index, columns=self.columns)
+
+
+def sparse_allele_table(alleles, rows):
+
+    """
+    Builds the table out of the significant alleles of each tumor, in the layout of the DataFrame clean_data returns.
+
+    The layout is the one pd.DataFrame.from_dict(dict_alleles, orient='index') gives: a column for every
+    allele that is significant in at least one tumor (in order of first appearance), and a row for every
+    tumor that has at least one significant allele (ordered by its first column, as from_dict builds the
+    index column by column).
+
+    Args:
+        alleles (Index) - The names of all the alleles in the dataset.
+
+        rows (list) - A (tumor, indexes, values) tuple for each tumor, where indexes are the positions
+                      (in alleles) of its significant alleles and values are their mean expressions.
+
+    Return:
+        table (AlleleTable) - The mean expression of each significant allele of each tumor.
+    """
+
+    rows = [(tumor, np.asarray(indexes), np.asarray(values, dtype=np.float64)) for tumor, indexes, values in rows if len(indexes) > 0]
+
+    if not rows:
+        return AlleleTable([], [], [0], [], [])
+
+    # The positions of the columns, in order of first appearance.
+    all_indexes = np.concatenate([indexes for _, indexes, _ in rows])
+    unique_indexes, first_appearance = np.unique(all_indexes, return_index=True)
+    column_indexes = unique_indexes[np.argsort(first_appearance, kind='stable')]
+
+    # The column of each allele in the table.
+    positions = np.empty(len(alleles), dtype=np.intp)
+    positions[column_indexes] = np.arange(len(column_indexes))
+
+    # Ordering the rows by the first column they appear in (keeping their own order for ties).
+    first_columns = [positions[indexes].min() for _, indexes, _ in rows]
+    rows = [rows[row] for row in np.argsort(first_columns, kind='stable')]
+
+    # The entries of each tumor, sorted by their column.
+    columns = [positions[indexes] for _, indexes, _ in rows]
+    orders = [np.argsort(row_columns, kind='stable') for row_columns in columns]
+
+    offsets = np.concatenate([[0], np.cumsum([len(row_columns) for row_columns in columns])])
+    indexes = np.concatenate([row_columns[order] for row_columns, order in zip(columns, orders)])
+    values = np.concatenate([values[order] for (_, _, values), order in zip(rows, orders)])
+
+    return AlleleTable([tumor for tumor, _, _ in rows], pd.Index(alleles)[column_indexes], offsets, indexes, values)
+
+
+def as_allele_table(data):
+
+    """
+    Returns data as an AlleleTable (data itself if it already is one).
+
+    Args:
+        data (DataFrame / AlleleTable) - The mean expression of each significant allele of each tumor (NaN elsewhere).
+
+    Return:
+        table (AlleleTable) - The same table in sparse form.
+    """
+
+    if isinstance(data, AlleleTable):
+        return data
+
+    if data is None or data.empty:
+        return AlleleTable([], [], [0], [], [])
+
+    # The entries of the rows, in order (np.nonzero goes through the table row by row).
+    significant = data.notna().to_numpy()
+    rows, indexes = np.nonzero(significant)
+
+    offsets = np.concatenate([[0], np.cumsum(significant.sum(axis=1))])
+
+    return AlleleTable(data.index, data.columns, offsets, indexes, data.to_numpy(dtype=np.float64)[rows, indexes])
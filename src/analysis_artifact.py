@@ -0,0 +1,289 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+
+try: # When src is on sys.path (as in the tests).
+    from data_extraction import analyze_data, significant_rows, validate_critical_alpha, validate_test, write_atomically
+    from group_statistics import build_allele_table
+    from instrumentation import span
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.data_extraction import analyze_data, significant_rows, validate_critical_alpha, validate_test, write_atomically
+    from src.group_statistics import build_allele_table
+    from src.instrumentation import span
+
+"""
+This code saves the whole result of clean_data to a file and loads it back, so that a later run can start
+from it instead of analysing the data again (python main.py --artifact analysis.npz).
+
+The file (a NumPy .npz archive) only holds the significant entries: for every tumor, the positions of its
+significant alleles, their mean expressions, P values and log2 fold changes from the healthy tissue, stored
+one tumor after another in single arrays, with the offset where each tumor starts (the compressed sparse row
+layout). The mean expressions of the healthy tissue (which keeps every allele) are stored as one dense array,
+the names of the alleles as a single block of text, and the parameters of the analysis (critical_alpha, the
+test, the correction...) and the CSV file it came from (its path, size and modification time) as JSON, so a
+file that no longer matches the data or the parameters is recognised and recomputed.
+"""
+
+# The version of the layout of the file (files of other versions are recomputed).
+ARTIFACT_VERSION = 1
+
+
+class AnalysisArtifact:
+    """
+    This class holds the significant alleles of every tumor, with their means, P values and fold changes.
+    """
+
+    def __init__(self, alleles, rows, parameters, source = None):
+        """
+        Builds the artifact.
+
+        Args:
+           alleles (Index) - The names of all the alleles in the dataset.
+
+           rows (list) - A (tumor, indexes, means, p_values) tuple for each tumor (as returned by significant_rows).
+
+           parameters (dict) - The parameters of the analysis (as returned by analyze_data).
+
+           source (dict) - The CSV file the analysis came from (as returned by dataset_key). None if unknown.
+        """
+
+        self.alleles = pd.Index(alleles)
+        self.parameters = dict(parameters)
+        self.source = source
+
+        # The tumors in the order of the rows, and the one whose row keeps every allele (the normal tissue).
+        self.tumors = [tumor for tumor, _, _, _ in rows]
+        self.normal = next((tumor for tumor, indexes, _, _ in rows if tumor == 'normal' and len(indexes) == len(self.alleles)), None)
+
+        # The mean expression of every allele in the healthy tissue (None if there is none).
+        self.normal_means = next((np.asarray(means, dtype=np.float64) for tumor, _, means, _ in rows if tumor == self.normal), None)
+
+        # The significant entries of the other tumors, one tumor after another (the normal tissue has none here).
+        sparse_rows = [row if row[0] != self.normal else (row[0], np.empty(0, dtype=np.int32), np.empty(0), np.empty(0)) for row in rows]
+
+        self.offsets = np.concatenate([[0], np.cumsum([len(indexes) for _, indexes, _, _ in sparse_rows])]).astype(np.int64)
+        self.indexes = np.concatenate([np.empty(0, dtype=np.int32)] + [np.asarray(indexes, dtype=np.int32) for _, indexes, _, _ in sparse_rows])
+        self.means = np.concatenate([np.empty(0)] + [np.asarray(means, dtype=np.float64) for _, _, means, _ in sparse_rows])
+        self.p_values = np.concatenate([np.empty(0)] + [np.asarray(p_values, dtype=np.float64) for _, _, _, p_values in sparse_rows])
+
+        # The log2 fold change of every significant entry from the healthy tissue (NaN where it is undefined).
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if self.normal_means is not None:
+                self.log2_fold_changes = np.log2(self.means / self.normal_means[self.indexes]).astype(np.float32)
+            else:
+                self.log2_fold_changes = np.full(len(self.means), np.nan, dtype=np.float32)
+
+
+    def tumor(self, tumor_type):
+        """
+        Returns the significant alleles of tumor_type.
+
+        Args:
+            tumor_type (str) - The name of the tumor.
+
+        Return:
+            result (DataFrame) - The mean expression, P value and log2 fold change (in columns) of each of its
+                                 significant alleles (in index). Empty if the tumor is not in the artifact.
+        """
+
+        if tumor_type == self.normal:
+            return pd.DataFrame({'mean': self.normal_means, 'p_value': np.nan, 'log2_fold_change': 0.0},
+                                index=self.alleles.rename('allele'))
+
+        if tumor_type not in self.tumors:
+            return pd.DataFrame({'mean': [], 'p_value': [], 'log2_fold_change': []}, index=pd.Index([], name='allele'))
+
+        row = self.tumors.index(tumor_type)
+        entries = slice(self.offsets[row], self.offsets[row + 1])
+
+        return pd.DataFrame({'mean': self.means[entries], 'p_value': self.p_values[entries],
+                             'log2_fold_change': self.log2_fold_changes[entries]},
+                            index=self.alleles[self.indexes[entries]].rename('allele'))
+
+
+    def rows(self):
+        """
+        Returns the (tumor, indexes, means, p_values) tuple of each tumor (as significant_rows returns them).
+        """
+
+        rows = []
+
+        for row, tumor in enumerate(self.tumors):
+            if tumor == self.normal:
+                rows.append((tumor, np.arange(len(self.alleles)), self.normal_means, np.full(len(self.alleles), np.nan)))
+            else:
+                entries = slice(self.offsets[row], self.offsets[row + 1])
+                rows.append((tumor, self.indexes[entries].astype(np.intp), self.means[entries], self.p_values[entries]))
+
+        return rows
+
+
+    def to_table(self, sparse = False):
+        """
+        Returns the table clean_data returns for the same data and parameters (an AlleleTable if sparse).
+        """
+
+        return build_allele_table(self.alleles, [(tumor, indexes, means) for tumor, indexes, means, _ in self.rows()], sparse)
+
+
+    def nbytes(self):
+        """
+        Returns the memory (in bytes) used by the arrays of the artifact.
+        """
+
+        arrays = [self.offsets, self.indexes, self.means, self.p_values, self.log2_fold_changes]
+
+        return sum(array.nbytes for array in arrays) + (self.normal_means.nbytes if self.normal_means is not None else 0)
+
+
+    def matches(self, parameters, source):
+        """
+        Returns whether the artifact was computed with parameters from the CSV file source (as returned by dataset_key).
+        An unknown source (None) never matches, since nothing shows that the artifact came from the same data.
+        """
+
+        return self.parameters == dict(parameters) and source is not None and self.source == source
+
+
+    def save(self, path):
+        """
+        Saves the artifact to path (a .npz file), written under a temporary name and then renamed (see
+        data_extraction.write_atomically), so that an interrupted or concurrent run never leaves a truncated file.
+        """
+
+        meta = {'version': ARTIFACT_VERSION, 'parameters': self.parameters, 'source': self.source,
+                'tumors': self.tumors, 'normal': self.normal}
+
+        # (Written to a file object, so that NumPy does not add a second .npz extension.)
+        write_atomically(path, lambda artifact_file: np.savez(
+            artifact_file,
+            meta=_encode_text(json.dumps(meta)),
+            alleles=_encode_text('\n'.join(map(str, self.alleles))),
+            offsets=self.offsets, indexes=self.indexes, means=self.means, p_values=self.p_values,
+            log2_fold_changes=self.log2_fold_changes,
+            normal_means=self.normal_means if self.normal_means is not None else np.empty(0)))
+
+
+def load_artifact(path):
+
+    """
+    Loads an artifact saved by AnalysisArtifact.save.
+
+    Args:
+        path (str) - The path of the file.
+
+    Return:
+        artifact (AnalysisArtifact) - The artifact. None if the file does not exist or cannot be read.
+    """
+
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with np.load(path) as arrays:
+            meta = json.loads(_decode_text(arrays['meta']))
+
+            if meta.get('version') != ARTIFACT_VERSION: # Written by another version of the code.
+                return None
+
+            artifact = AnalysisArtifact.__new__(AnalysisArtifact) # The arrays are read as they are, not rebuilt.
+            artifact.alleles = pd.Index(_decode_text(arrays['alleles']).split('\n') if arrays['alleles'].size else [])
+            artifact.parameters, artifact.source = meta['parameters'], meta['source']
+            artifact.tumors, artifact.normal = meta['tumors'], meta['normal']
+
+            for name in ('offsets', 'indexes', 'means', 'p_values', 'log2_fold_changes'):
+                setattr(artifact, name, arrays[name])
+
+            artifact.normal_means = arrays['normal_means'] if artifact.normal is not None else None
+
+        return artifact
+
+    except Exception as e: # A damaged (or foreign) file is recomputed rather than trusted.
+        print(f"\nThe analysis file {path} could not be read ({e}). It will be recomputed.")
+        return None
+
+
+def build_artifact(df, critical_alpha = 0.01, workers = None, test = 'anova', correction = None, permutations = 1000, source = None):
+
+    """
+    Runs the analysis of clean_data (with the same arguments) and keeps all of it as an AnalysisArtifact.
+
+    Args:
+        source (dict) - The CSV file df came from (as returned by dataset_key). Baseline is None.
+
+    Return:
+        artifact (AnalysisArtifact) - The analysis. None if df is empty.
+    """
+
+    analysis = analyze_data(df, critical_alpha, workers, test, correction, permutations)
+
+    if analysis is None:
+        return None
+
+    alleles, cancer_type, counts, means, p_values, parameters = analysis
+
+    with span('tabulate'):
+        rows = significant_rows(alleles, cancer_type, counts, means, p_values, parameters['critical_alpha'], parameters['correction'])
+
+    return AnalysisArtifact(alleles, rows, parameters, source)
+
+
+def load_or_build_artifact(path, df, critical_alpha = 0.01, workers = None, test = 'anova', correction = None,
+                           permutations = 1000, source = None):
+
+    """
+    Loads the artifact at path if it was computed from the same CSV file with the same parameters,
+    and otherwise runs the analysis and saves it to path.
+
+    Args:
+        path (str) - The path of the artifact.
+
+        df, critical_alpha, workers, test, correction, permutations - As clean_data takes them.
+
+        source (dict) - The CSV file df came from (as returned by dataset_key). If no value is used then the
+                        data cannot be recognised, so the analysis is always run again (and saved).
+
+    Return:
+        artifact (AnalysisArtifact) - The analysis. None if df is empty.
+    """
+
+    with span('load_artifact'):
+        artifact = load_artifact(path)
+
+    # The parameters are compared as the analysis uses them, so that an invalid value (replaced by its baseline
+    # value) still matches the artifact built with it instead of rebuilding it on every run.
+    critical_alpha = validate_critical_alpha(critical_alpha)
+    test, correction = validate_test(test, correction)
+
+    parameters = {'critical_alpha': critical_alpha, 'test': test, 'correction': correction, 'permutations': permutations}
+
+    if artifact is not None and artifact.matches(parameters, source):
+        print(f"\nAnalysis loaded from {path}.")
+        return artifact
+
+    artifact = build_artifact(df, critical_alpha, workers, test, correction, permutations, source)
+
+    if artifact is not None:
+        artifact.save(path)
+        print(f"\nAnalysis saved to {path}.")
+
+    return artifact
+
+
+def _encode_text(text):
+
+    """
+    Encodes text as an array of bytes (so that the .npz file needs no pickled objects).
+    """
+
+    return np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+
+
+def _decode_text(array):
+
+    """
+    Decodes an array of bytes written by _encode_text.
+    """
+
+    return array.tobytes().decode('utf-8')
@@ -0,0 +1,192 @@
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import os
+import re
+
+try: # When src is on sys.path (as in the tests).
+    from data_visualization import plot_tumor_expression, plot_allele_distribution, plot_correlation_heatmap, load_pyplot
+    from instrumentation import timed
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.data_visualization import plot_tumor_expression, plot_allele_distribution, plot_correlation_heatmap, load_pyplot
+    from src.instrumentation import timed
+
+"""
+This code renders the plots of DataVisualization for a list of tumors and alleles to image files,
+without any input() or plt.show(), and writes a summary table of the results (python main.py --batch).
+
+The data of every plot is computed first (by DataVisualization's queries), and the plots are then
+rendered with the non-interactive Agg backend, on a pool of processes if requested. Every process
+keeps one figure for each kind of plot and clears it between plots instead of creating a new one.
+"""
+
+# The figure (and axes) of each kind of plot in this process, reused from plot to plot.
+_figures = {}
+
+# The size of each kind of plot (the same sizes DataVisualization shows them in).
+FIGURE_SIZES = {'expression': (10, 6), 'correlation': (8, 6), 'distribution': (10, 5)}
+
+
+@timed('batch_report') # Timed when instrumentation is enabled (see instrumentation.py).
+def run_batch_report(visualization, tumors = (), alleles = (), output_directory = 'report', workers = None):
+
+    """
+    Saves the bar plots and correlation heatmaps of the tumors and the histograms of the alleles,
+    and writes a summary table of them (summary.csv).
+
+    Args:
+        visualization (DataVisualization) - The (non-interactive) visualization of the data.
+
+        tumors (list) - The tumors to report ('all' stands for every tumor but normal).
+
+        alleles (list) - The alleles to report ('all' stands for every allele).
+
+        output_directory (str) - The directory the files are saved in. If no value is used then baseline is 'report'.
+
+        workers (int) - The number of processes rendering the plots. If no value is used
+                        (or a value smaller than 2) then they are rendered in this process.
+
+    Return:
+        summary (DataFrame) - The summary table of the tumors and alleles that were reported.
+    """
+
+    if 'all' in tumors:
+        tumors = [tumor for tumor in visualization.cancer_type if tumor != 'normal']
+
+    if 'all' in alleles:
+        alleles = list(visualization.alleles)
+
+    # Skipping (and reporting) names that are not in the dataset.
+    unknown = [name for name in tumors if not visualization.index.has_tumor(name)]
+    unknown += [name for name in alleles if not visualization.index.has_allele(name)]
+    if unknown:
+        print(f"\nSkipped unknown tumors or alleles: {', '.join(unknown)}")
+
+    os.makedirs(output_directory, exist_ok=True)
+
+    jobs = [] # The plots to render, as (kind, name, path, plot data).
+    plots = visualization.plots # Without plots (main.py --no-plots) only the summary table is written.
+    summary = [] # A row of the summary table for every tumor and allele.
+
+    for tumor_type in tumors:
+        if not visualization.index.has_tumor(tumor_type):
+            continue
+
+        results = visualization.tumor_results(tumor_type)
+        tumor_allele_data, correlation_data, list_corr = results['ranking'], results['correlation_data'], results['list_corr']
+        files = []
+
+        if tumor_type != 'normal' and plots: # No need to plot results if the tissue is normal.
+            files.append(os.path.join(output_directory, f"tumor_{_file_name(tumor_type)}.png"))
+            jobs.append(('expression', tumor_type, files[-1], (tumor_allele_data, visualization.num_for_plot)))
+
+        if list_corr is not None and plots: # There are correlation values to show.
+            files.append(os.path.join(output_directory, f"correlation_{_file_name(tumor_type)}.png"))
+            jobs.append(('correlation', tumor_type, files[-1], correlation_data))
+
+        summary.append({'kind': 'tumor', 'name': tumor_type,
+                        'significant_alleles': len(visualization.query_tumor(tumor_type)),
+                        'top_alleles': ';'.join(tumor_allele_data.index),
+                        'correlated_alleles': ';'.join(sorted(list_corr or [])),
+                        'files': ';'.join(files)})
+
+    for allele in alleles:
+        if not visualization.index.has_allele(allele):
+            continue
+
+        results = visualization.allele_results(allele)
+        statistics = results['summary']
+        path = os.path.join(output_directory, f"allele_{_file_name(allele)}.png") if plots else ''
+
+        if plots:
+            jobs.append(('distribution', allele, path, visualization.distributions().distribution(allele)))
+
+        summary.append({'kind': 'allele', 'name': allele,
+                        'significant_tumors': ';'.join(results['expression'].index),
+                        'mean': statistics['mean'], 'std': statistics['std'],
+                        'min': statistics['min'], 'max': statistics['max'],
+                        'files': path})
+
+    # Rendering the plots.
+    if workers is not None and workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_use_agg_backend) as executor:
+            list(executor.map(render_plot, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    elif jobs: # matplotlib is only imported if there is something to plot.
+        _use_agg_backend()
+        for job in jobs:
+            render_plot(job)
+
+    summary = pd.DataFrame(summary).convert_dtypes() # Keeps the counts as integers despite the empty cells.
+    summary.to_csv(os.path.join(output_directory, 'summary.csv'), index=False)
+
+    print(f"\nSaved {len(jobs)} plots and the summary table to {output_directory}.")
+
+    return summary
+
+
+def render_plot(job):
+
+    """
+    Renders one plot to its file, on the figure this process keeps for its kind of plot.
+
+    Args:
+        job (tuple) - The kind of the plot ('expression', 'correlation' or 'distribution'),
+                      the name of the tumor or allele, the path of the file and the data of the plot.
+
+    Return:
+        path (str) - The path of the file.
+    """
+
+    kind, name, path, plot_data = job
+
+    figure, axes = _figure(kind)
+
+    if kind == 'correlation': # The heatmap adds a colorbar axes, so the whole figure is cleared.
+        figure.clear()
+        axes = figure.add_subplot()
+        _figures[kind] = (figure, axes)
+    else:
+        axes.clear()
+
+    if kind == 'expression':
+        plot_tumor_expression(axes, name, *plot_data)
+    elif kind == 'correlation':
+        plot_correlation_heatmap(axes, name, plot_data)
+    else:
+        plot_allele_distribution(axes, name, plot_data)
+
+    figure.tight_layout() # Adjust layout to prevent overlap for aesthetic reasons.
+    figure.savefig(path)
+
+    return path
+
+
+def _figure(kind):
+
+    """
+    Returns the figure and axes of the kind of plot in this process, creating them on first use.
+    """
+
+    if kind not in _figures:
+        _figures[kind] = load_pyplot('Agg').subplots(figsize=FIGURE_SIZES[kind])
+
+    return _figures[kind]
+
+
+def _use_agg_backend():
+
+    """
+    Selects the non-interactive Agg backend (which only renders to files) in this process.
+    """
+
+    import matplotlib # Imported on first use (see data_visualization.load_pyplot).
+
+    matplotlib.use('Agg')
+
+
+def _file_name(name):
+
+    """
+    Replaces the characters that are not safe in file names.
+    """
+
+    return re.sub(r'[^\w.-]', '_', str(name))
@@ -1,37 +1,89 @@
-from scipy.stats import f_oneway
 import pandas as pd
 import os
+import csv
+import io
+import json
+import re
+import tempfile
 import numpy as np
 
+try: # When src is on sys.path (as in the tests).
+    from group_statistics import build_allele_table
+    from allele_table import as_allele_table
+    from statistical_tests import TESTS, CORRECTIONS, tumor_tests, adjust_p_values
+    from parallel_statistics import parallel_tumor_anova
+    from expression_matrix import ExpressionMatrix, as_expression_matrix
+    from instrumentation import span, count, timed
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.group_statistics import build_allele_table
+    from src.allele_table import as_allele_table
+    from src.statistical_tests import TESTS, CORRECTIONS, tumor_tests, adjust_p_values
+    from src.parallel_statistics import parallel_tumor_anova
+    from src.expression_matrix import ExpressionMatrix, as_expression_matrix
+    from src.instrumentation import span, count, timed
+
 """
 This code extract data from a CSV file (named csv_name) and  
 uses statistical methods  to clean and modify the data. 
+
+Parsing the CSV text is by far the slowest part of loading it, so the first load writes a
+binary copy of it (a float32 .npy expression matrix plus a small .json with the samples, types
+and probe names) into a cache directory, and every later load memory-maps that copy instead. 
+
+With compact=True the data is returned as an ExpressionMatrix (see expression_matrix.py) instead of
+a DataFrame: a single float32 (or float16) array of the expression values and integer codes for the types.
 """
 
+# Name of the directory (placed next to the CSV file) that holds the binary copies of the CSV files.
+CACHE_DIRECTORY = '.expression_cache'
+
+# Type used to store the expression values (both in memory and in the cache).
+EXPRESSION_DTYPE = np.float32
+
+# The first two fields of a line of the CSV file (each of them quoted or not) and the comma after them.
+_FIRST_FIELDS = re.compile(rb'(?:"(?:[^"]|"")*"|[^,"\r\n]*),(?:"(?:[^"]|"")*"|[^,"\r\n]*),')
+
 # First function used in main.py
-def import_data(csv_name):
+@timed('import_data') # Timed when instrumentation is enabled (see instrumentation.py).
+def import_data(csv_name, use_cache = True, cache_directory = None, compact = False, dtype = None):
 
     """
     This function imports the data from the excel file and creates a variable that contains it (df).
 
     Args:
-        csv_name (str) - The name of the CSV file. 
+        csv_name (str) - The name of the CSV file (or its path, relative to the current directory). 
+
+        use_cache (bool) - Whether to load the data from (and save it to) the binary cache.
+                           If no value is used then baseline is True.
+
+        cache_directory (str) - The directory of the binary cache. If no value is used then 
+                                the cache is placed next to the CSV file (in CACHE_DIRECTORY).
+
+        compact (bool) - Whether to return the data as an ExpressionMatrix instead of a DataFrame.
+                         If no value is used then baseline is False.
+
+        dtype (type) - The type of the expression values of the ExpressionMatrix (np.float32 or np.float16).
+                       If no value is used then baseline is EXPRESSION_DTYPE.
 
     Return:
-        df (DataFrame)- Consists of the raw data of the file. 
+        df (DataFrame / ExpressionMatrix)- Consists of the raw data of the file. 
     """
     
 
-    # The directory of the file in which our code is placed. 
-    file_directory = os.getcwd()
-
-    # The directory of the excel we were using.
-    excel_directory = f"{file_directory}\{csv_name}.csv"
-   
     # Load the CSV file.
     try:
+        # The directory of the excel we were using.
+        excel_directory = csv_path(csv_name)
+
         # Data of the excel file. 
-        df = pd.read_csv(excel_directory)
+        if use_cache:
+            df = load_cached_data(excel_directory, cache_directory, compact)
+        else:
+            df = read_expression_csv(excel_directory)
+
+        if compact: # Converting the values to dtype copies them, so it is only done if it changes their type.
+            df = as_expression_matrix(df, dtype if dtype is not None else EXPRESSION_DTYPE)
+
         print("\nCSV file loaded successfully.")
 
         return df
@@ -42,88 +94,547 @@ def import_data(csv_name):
     except Exception as e: # General error. 
         print(f"\nAn error occurred while loading the CSV file: {e}")
 
+
+def csv_path(csv_name):
+
+    """
+    Returns the path of the CSV file csv_name (a name in the current directory, or a path, with or without the .csv extension).
+    """
+
+    # A name that is not a string or a path (e.g. None) cannot be the name of any file.
+    if not isinstance(csv_name, (str, os.PathLike)):
+        raise FileNotFoundError(f"No CSV file is named {csv_name!r}.")
+
+    csv_name = os.fspath(csv_name)
+
+    # The directory of the file in which our code is placed. 
+    file_directory = os.getcwd()
+
+    return os.path.join(file_directory, csv_name if csv_name.endswith('.csv') else f"{csv_name}.csv")
+
+
+def dataset_key(csv_name):
+
+    """
+    Returns the path, size and modification time of the CSV file csv_name, which change whenever the file does
+    (None if there is no such file).
+    """
+
+    try:
+        return file_key(csv_path(csv_name))
+    except FileNotFoundError:
+        return None
+
+
+def read_expression_csv(excel_directory):
+
+    """
+    Parses the CSV file, reading the expression values directly as EXPRESSION_DTYPE 
+    (instead of parsing them as float64 and converting them afterwards).
+
+    Args:
+        excel_directory (str) - The path of the CSV file.
+
+    Return:
+        df (DataFrame) - Consists of the raw data of the file.
+    """
+
+    with open(excel_directory, 'rb') as excel_file:
+        data = excel_file.read()
+
+    with span('parse_csv'):
+        return parse_expression_rows(data)
+
+
+def parse_expression_rows(data, header = True):
+
+    """
+    Parses the lines of a CSV file (its bytes) in a single pass over the expression values.
+
+    Giving a single dtype to all the parsed columns is several times faster than giving a dtype to each column
+    (and pd.read_csv(usecols=...) still tokenizes every column of the file), so the first two columns ('samples'
+    and 'type') are cut off each line, which is cheap since there are only a few hundred lines, and the
+    rest of the lines are parsed at once as EXPRESSION_DTYPE.
+
+    Args:
+        data (bytes) - The lines of the CSV file.
+
+        header (bool) - Whether the first line holds the names of the columns. Baseline is True.
+
+    Return:
+        df (DataFrame) - The first two columns and the expression values (with integer names if there is no header).
+    """
+
+    lines = [line for line in data.split(b'\n') if line.strip()]
+    matches = [_FIRST_FIELDS.match(line) for line in lines]
+
+    if not lines or None in matches: # Fewer than three columns (or an empty file): nothing to gain by splitting the lines.
+        return pd.read_csv(io.BytesIO(data), header=0 if header else None)
+
+    first_columns = pd.read_csv(io.BytesIO(b'\n'.join(line[:match.end() - 1] for line, match in zip(lines, matches))),
+                                header=0 if header else None)
+    df = pd.read_csv(io.BytesIO(b'\n'.join(line[match.end():] for line, match in zip(lines, matches))),
+                     header=0 if header else None, dtype=EXPRESSION_DTYPE)
+
+    if not header: # The columns are numbered as in the whole file.
+        df.columns = range(2, 2 + df.shape[1])
+
+    for position in reversed(range(first_columns.shape[1])):
+        df.insert(0, first_columns.columns[position], first_columns.iloc[:, position])
+
+    return df
+
+
+def read_header(excel_directory):
+
+    """
+    Returns the names of the columns of the CSV file (read with the csv module, since
+    pd.read_csv(nrows=0) builds an empty column for each of the ~54,000 alleles, which takes longer).
+
+    Args:
+        excel_directory (str) - The path of the CSV file.
+
+    Return:
+        columns (Index) - The names of the columns.
+    """
+
+    with open(excel_directory, newline='', encoding='utf-8') as excel_file:
+        return pd.Index(next(csv.reader(excel_file), []))
+
+
+def load_cached_data(excel_directory, cache_directory = None, compact = False):
+
+    """
+    Loads the data of the CSV file from its binary copy, creating (or recreating) the copy 
+    if it does not exist yet or if the CSV file has changed since it was written.
+
+    Args:
+        excel_directory (str) - The path of the CSV file.
+
+        cache_directory (str) - The directory of the binary cache. If no value is used then 
+                                the cache is placed next to the CSV file (in CACHE_DIRECTORY).
+
+        compact (bool) - Whether to return the data as an ExpressionMatrix instead of a DataFrame.
+
+    Return:
+        df (DataFrame / ExpressionMatrix) - Consists of the raw data of the file. The expression values are 
+                                            memory-mapped from the cache rather than read into memory.
+    """
+
+    # Identifies the current version of the CSV file (raises FileNotFoundError if there is no such file).
+    key = file_key(excel_directory)
+    values_path, meta_path = _cache_paths(excel_directory, cache_directory)
+
+    df = _read_cache(values_path, meta_path, key, compact)
+
+    if df is not None: # The CSV file has not changed since the cache was written.
+        count('expression_cache_hits')
+        return df
+
+    # There is no valid cache, so we parse the CSV file once and write it to the cache.
+    count('expression_cache_misses')
+    df = read_expression_csv(excel_directory)
+
+    with span('write_cache'):
+        write_cache(df, excel_directory, cache_directory)
+
+    return as_expression_matrix(df) if compact else df
+
+
+def write_cache(df, excel_directory, cache_directory = None):
+
+    """
+    Writes the binary copy of df: the expression values as a .npy file and the rest 
+    (the samples, the types, the names of the alleles and the key of the CSV file) as a .json file.
+
+    Args:
+        df (DataFrame) - Consists of the raw data of the file.
+
+        excel_directory (str) - The path of the CSV file df was read from.
+
+        cache_directory (str) - The directory of the binary cache. If no value is used then 
+                                the cache is placed next to the CSV file (in CACHE_DIRECTORY).
+    """
+
+    values_path, meta_path = _cache_paths(excel_directory, cache_directory)
+    os.makedirs(os.path.dirname(values_path), exist_ok=True)
+
+    meta = {'key': file_key(excel_directory),
+            'columns': [str(column) for column in df.columns[:2]], # The names of the first two columns ('samples' and 'type').
+            'samples': df.iloc[:, 0].tolist(),
+            'types': df.iloc[:, 1].tolist(),
+            'alleles': [str(allele) for allele in df.columns[2:]]}
+
+    # Both files are first written under a temporary name and then renamed, so that an interrupted 
+    # run never leaves a half written cache behind. The .json file is written last since it validates the cache.
+    values = np.ascontiguousarray(df.iloc[:, 2:].to_numpy(dtype=EXPRESSION_DTYPE))
+    write_atomically(values_path, lambda values_file: np.save(values_file, values))
+    write_atomically(meta_path, lambda meta_file: meta_file.write(json.dumps(meta).encode('utf-8')))
+
+
+def extend_cache(excel_directory, previous_key, new_rows, cache_directory = None):
+
+    """
+    Appends rows to the binary copy of the CSV file, if the copy is of the version of the file identified by
+    previous_key and the file was only appended to since then (as incremental_statistics.py checks), so that
+    the whole file is not parsed again because its size and modification time changed.
+
+    Args:
+        excel_directory (str) - The path of the CSV file (which must now end with new_rows).
+
+        previous_key (dict) - The key (as returned by file_key) of the file before new_rows were appended.
+
+        new_rows (DataFrame) - The appended rows: the samples, the types and the expression values.
+
+        cache_directory (str) - The directory of the binary cache. If no value is used then 
+                                the cache is placed next to the CSV file (in CACHE_DIRECTORY).
+
+    Return:
+        extended (bool) - Whether the copy was extended (False if there is no readable copy of that version of the file).
+    """
+
+    values_path, meta_path = _cache_paths(excel_directory, cache_directory)
+
+    try:
+        with open(meta_path, encoding='utf-8') as meta_file:
+            meta = json.load(meta_file)
+
+        if meta.get('key') != previous_key: # The copy is of another version of the file (or there is none).
+            return False
+
+        values = np.load(values_path, mmap_mode='r')
+
+        if values.shape != (len(meta['samples']), len(meta['alleles'])) or new_rows.shape[1] != values.shape[1] + 2:
+            return False
+
+    except (OSError, ValueError, EOFError, KeyError, TypeError, AttributeError): # There is no readable copy.
+        return False
+
+    # Both files are rewritten (as write_cache writes them), the .json file last since it validates the cache.
+    values = np.concatenate((values, new_rows.iloc[:, 2:].to_numpy(dtype=EXPRESSION_DTYPE)))
+    write_atomically(values_path, lambda values_file: np.save(values_file, values))
+
+    meta.update({'key': file_key(excel_directory),
+                 'samples': meta['samples'] + new_rows.iloc[:, 0].tolist(),
+                 'types': meta['types'] + new_rows.iloc[:, 1].tolist()})
+    write_atomically(meta_path, lambda meta_file: meta_file.write(json.dumps(meta).encode('utf-8')))
+
+    return True
+
+
+def write_atomically(path, write):
+
+    """
+    Writes a file with write(file) under a temporary name of its own in the same directory, and then renames it
+    to path (os.replace), so that no reader, nor another run writing the same file, ever sees it half written.
+    """
+
+    descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=f"{os.path.basename(path)}.", suffix='.tmp')
+
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            write(file)
+        os.replace(temporary_path, path)
+
+    except BaseException: # The temporary file is not left behind.
+        os.remove(temporary_path)
+        raise
+
+
+def file_key(path):
+
+    """
+    Returns the path, size and modification time of a file (e.g. the CSV file), which change whenever the file does.
+    """
+
+    stat = os.stat(path)
+
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _cache_paths(excel_directory, cache_directory = None):
+
+    """
+    Returns the paths of the .npy and .json files of the binary copy of the CSV file.
+    """
+
+    if cache_directory is None:
+        cache_directory = os.path.join(os.path.dirname(os.path.abspath(excel_directory)), CACHE_DIRECTORY)
+
+    name = os.path.splitext(os.path.basename(excel_directory))[0]
+
+    return os.path.join(cache_directory, f"{name}.npy"), os.path.join(cache_directory, f"{name}.json")
+
+
+def _read_cache(values_path, meta_path, key, compact = False):
+
+    """
+    Returns the data of the binary copy of the CSV file, or None if there is no copy of the current version of the
+    file or if the copy cannot be read (e.g. it was truncated or corrupted), so that the CSV file is parsed again.
+    """
+
+    if not (os.path.exists(values_path) and os.path.exists(meta_path)):
+        return None
+
+    try:
+        with open(meta_path, encoding='utf-8') as meta_file:
+            meta = json.load(meta_file)
+
+        if meta.get('key') != key: # The CSV file has changed since the cache was written.
+            return None
+
+        with span('load_cache'):
+            # mmap_mode='c' maps the file copy-on-write: nothing is read until it is used, 
+            # and changes made to df stay in memory instead of being written to the cache.
+            values = np.load(values_path, mmap_mode='c')
+
+            if values.shape != (len(meta['samples']), len(meta['alleles'])):
+                raise ValueError(f"the values are {values.shape[0]} x {values.shape[1]}, not samples x alleles")
+
+            return _matrix_from_cache(values, meta) if compact else _frame_from_cache(values, meta)
+
+    except (OSError, ValueError, EOFError, KeyError, TypeError, AttributeError, IndexError) as e: # A corrupt cache.
+        print(f"\nThe binary cache of the CSV file could not be read ({e}). The CSV file is parsed again.")
+
+
+def _frame_from_cache(values, meta):
+
+    """
+    Rebuilds df from the (memory-mapped) values of the binary copy of the CSV file without copying them.
+    """
+
+    df = pd.DataFrame(values, columns=meta['alleles'], copy=False)
+    df.insert(0, meta['columns'][1], meta['types'])
+    df.insert(0, meta['columns'][0], meta['samples'])
+
+    return df
+
+
+def _matrix_from_cache(values, meta):
+
+    """
+    Builds the ExpressionMatrix of the (memory-mapped) values of the binary copy of the CSV file without copying them.
+    """
+
+    return ExpressionMatrix(values, meta['alleles'], meta['samples'], meta['types'], meta['columns'])
+
     
 # Second function used in main.py
-def clean_data(df, critical_alpha = 0.01):
+@timed('clean_data')
+def clean_data(df, critical_alpha = 0.01, workers = None, test = 'anova', correction = None, permutations = 1000, sparse = False):
 
     """
-    Uses statistical methods (ANOVA) to drop out all the expression values in df that 
+    Uses statistical methods (ANOVA by default) to drop out all the expression values in df that 
     do not have a significant effect compared to the healthy tissue (used as control). 
 
+    The samples are grouped by their type once, and the ANOVA of every tumor is derived 
+    for all the alleles at once from the per-type counts, means and variances 
+    (see group_statistics.py), rather than masking df again for each tumor and allele.
+    The other tests and the corrections for multiple testing are in statistical_tests.py.
+
     Args:
-        df (DataFrame) - Consists of the raw data of the file.  
+        df (DataFrame / ExpressionMatrix) - Consists of the raw data of the file.  
 
         critical_alpha (float) - Significance threshold for identifying significant alleles. 
                                  Can be somewhere between 0 and 1. 
                                  If the user has not inserted a value for it or an invalid one,
                                  baseline value shall be o.o1.
 
+        workers (int) - The number of processes to run the ANOVA on (see parallel_statistics.py).
+                        If no value is used (or a value smaller than 2) then it runs in this process.
+
+        test (str) - The test comparing each tumor with the normal tissue: 'anova', 'welch', 'mannwhitney',
+                     'kruskal' or 'permutation'. If no value is used (or an invalid one) then baseline is 'anova'.
+
+        correction (str) - The correction of the P values for testing every allele: None, 'bonferroni' or 'bh'
+                           (Benjamini-Hochberg). If no value is used (or an invalid one) then baseline is None.
+
+        permutations (int) - The number of permutations of the 'permutation' test. Baseline is 1000.
+
+        sparse (bool) - Whether to return only the significant entries, as an AlleleTable (see allele_table.py),
+                        rather than a DataFrame that is NaN everywhere else. Baseline is False.
+
     Return:
-        data (DataFrame) - Modified df as it contains solely the mean expression of each 
-                           allele that had a significant effect over the normal tissue.
+        data (DataFrame / AlleleTable) - Modified df as it contains solely the mean expression of each 
+                                         allele that had a significant effect over the normal tissue.
+
+    """
+
+    analysis = analyze_data(df, critical_alpha, workers, test, correction, permutations)
+
+    if analysis is None: # If excel file is empty.
+        return
+
+    alleles, cancer_type, counts, means, p_values, parameters = analysis
+
+    # Converting the significant alleles of each tumor into a dataframe.
+    with span('tabulate'):
+        data = tabulate_significant_alleles(alleles, cancer_type, counts, means, p_values,
+                                            parameters['critical_alpha'], parameters['correction'], sparse)
+    
+    return data
+
+
+def analyze_data(df, critical_alpha = 0.01, workers = None, test = 'anova', correction = None, permutations = 1000):
 
     """
+    Runs the statistical analysis of clean_data (with the same arguments), without converting it into a dataframe.
 
-    if df.empty: # If excel file is empty. 
+    Return:
+        alleles (Index) - The names of all the alleles in the dataset.
+
+        cancer_type (list) - The types of each brain tumor.
+
+        counts, means, p_values (ndarray) - The number of samples of each tumor, and the mean and P value of each
+                                           allele in each tumor (as returned by tumor_tests). None if there is
+                                           no normal tissue to compare the tumors with.
+
+        parameters (dict) - The critical_alpha, test, correction and permutations used (after validation).
+
+        None if df is empty.
+    """
+
+    if len(df) == 0: # If excel file is empty. 
         print('\nCSV file is empty. Please add info.')
         return 
 
+    critical_alpha = validate_critical_alpha(critical_alpha)
+    test, correction = validate_test(test, correction)
+
+    # The expression values as a single array, and the type of each sample as an integer code (see expression_matrix.py).
+    matrix = as_expression_matrix(df)
+
+    # A list containing all the different alleles in the dataset. 
+    alleles = matrix.alleles
+
+    # A list containing the types of each brain tumor (in order of first appearance), and the type of each sample (as an index of that list).
+    cancer_type, codes = matrix.cancer_type, matrix.codes
+
+    # The normal type is used as a control group for every tumor.
+    normal = cancer_type.index('normal') if 'normal' in cancer_type else None
+
+    if normal is not None:
+
+        # The mean and the P value (comparing each tumor with the normal tissue) of every allele in every tumor. For the ANOVA,
+        # they are computed from the count, mean and sum of squared deviations of every allele in every tumor.
+        with span('tests', test=test):
+            if workers is not None and workers > 1:
+                counts, means, p_values = parallel_tumor_anova(matrix.values, codes, len(cancer_type), normal, workers,
+                                                               test=test, permutations=permutations, names=cancer_type)
+            else:
+                counts, means, p_values = tumor_tests(matrix.values, codes, len(cancer_type), normal, test, permutations, names=cancer_type)
+
+    else:
+        counts = means = p_values = None
+
+    parameters = {'critical_alpha': critical_alpha, 'test': test, 'correction': correction, 'permutations': permutations}
+
+    return alleles, cancer_type, counts, means, p_values, parameters
+
+
+def validate_critical_alpha(critical_alpha):
+
+    """
+    Returns critical_alpha, or the baseline value (0.01) if it is not valid.
+    """
+
     if type(critical_alpha) is not float or (critical_alpha >= 1 or critical_alpha <= 0): # In case critical alpha is not valid. 
         critical_alpha = 0.01
         print('\nInserted value of critical alpha is invalid. Baseline value (0.01) was used instead.')
 
+    return critical_alpha
 
-    # A dictionary that stores alleles (in values) that have a significant effect for each tumor type (in keys).
-    dict_alleles = {} # (Stores the mean values for each significant allele).
 
-    # A list containing the types of each brain tumor. 
-    cancer_type = list(df['type'].unique()) # unique() is used to refer to each tumor only once. 
-    
-    for tumor in cancer_type:
+def validate_test(test, correction):
+
+    """
+    Returns test and correction, or their baseline values ('anova' and None) if they are not valid.
+    """
 
-        # Get data for the current tumor type and normal type so we will be able to contrast them later in the ANOVA. 
-        # Both lines of code extract allele expression using .values and skipping the first two columns of the excel.
-        tumor_data = df[df['type'] == tumor].iloc[:, 2:].values 
-        normal_data = df[df['type'] == 'normal'].iloc[:, 2:].values                                                      
+    if test not in TESTS: # In case the test is not valid.
+        test = 'anova'
+        print(f"\nInserted test is invalid (choose one of: {', '.join(TESTS)}). Baseline test (anova) was used instead.")
 
-        
-        if len(tumor_data) > 1: # Making sure there is more than one sample for tumor for the ANOVA.
+    if correction not in CORRECTIONS: # In case the correction is not valid.
+        correction = None
+        print('\nInserted correction is invalid (choose bonferroni or bh). No correction was used instead.')
 
-            # Calculating F and P value using ANOVA. Comparing the healthy and sick tissues (thus using normal_data as a control group).
-            f_statistics, p_values = f_oneway(tumor_data, normal_data) 
+    return test, correction
 
-        else:
-            print(f'\nNot enough samples for {tumor}. Please insert more data into the excel file.')
-            continue # Start over. 
-        
 
-        # Filter significant alleles based on critical alpha storing their index.
-        indexes = np.where(p_values < critical_alpha)  
+def tabulate_significant_alleles(alleles, cancer_type, counts, means, p_values, critical_alpha, correction = None, sparse = False):
 
+    """
+    Keeps the mean expression of the alleles that are significant in each tumor (and of all the 
+    alleles in the normal tissue), and converts them into a dataframe.
+
+    Args:
+        alleles (Index) - The names of all the alleles in the dataset.
+
+        cancer_type (list) - The types of each brain tumor.
+
+        counts, means, p_values (ndarray) - The number of samples of each tumor, and the mean and ANOVA 
+                                           P value of each allele in each tumor (as returned by tumor_tests).
+                                           None if there is no normal tissue to compare the tumors with.
+
+        critical_alpha (float) - Significance threshold for identifying significant alleles. 
+
+        correction (str) - The correction of the P values of each tumor (see statistical_tests.adjust_p_values).
+                           Baseline is None.
+
+        sparse (bool) - Whether to return the table as an AlleleTable (see allele_table.py). Baseline is False.
+
+    Return:
+        data (DataFrame / AlleleTable) - Contains solely the mean expression of each allele that 
+                                         had a significant effect over the normal tissue.
+    """
+
+    rows = significant_rows(alleles, cancer_type, counts, means, p_values, critical_alpha, correction)
+
+    return build_allele_table(alleles, [(tumor, indexes, tumor_means) for tumor, indexes, tumor_means, _ in rows], sparse)
+
+
+def significant_rows(alleles, cancer_type, counts, means, p_values, critical_alpha, correction = None):
+
+    """
+    Finds the significant alleles of each tumor (and keeps all the alleles of the normal tissue), with the
+    same arguments as tabulate_significant_alleles.
+
+    Return:
+        rows (list) - A (tumor, indexes, means, p_values) tuple for each tumor with enough samples, where indexes
+                      are the positions (in alleles) of its significant alleles, in increasing order, and means and
+                      p_values are their mean expressions and (corrected) P values (NaN for the normal tissue).
+    """
+
+    # Adjusting the P values of each tumor for testing all its alleles at once (if requested).
+    if p_values is not None:
+        p_values = adjust_p_values(p_values, correction)
+
+    # The significant alleles of each tumor type, stored as (tumor, indexes of the alleles, mean values of the alleles, P values).
+    rows = [] 
+
+    for tumor_index, tumor in enumerate(cancer_type):
+
+        if counts is None or counts[tumor_index] <= 1: # Making sure there is more than one sample for tumor for the ANOVA.
+            print(f'\nNot enough samples for {tumor}. Please insert more data into the excel file.')
+            continue # Start over. 
 
-        # A list containing all the different alleles in the dataset. 
-        alleles = df.columns[2:] # Skips the first two columns. 
-  
 
         if tumor != 'normal': # If the tumor is not normal (i.e. the brain is not healthy).
 
-            # Adding the unhealthy tumor expression values.
-            dict_alleles[tumor] = {allele: # The name of the allele (as keys).
-                                    df.loc[df['type'] == tumor, allele].mean() # Locating the mean value of 'allele' in 'tumor' (as values).
-                                    for allele in alleles[indexes]} # Iterating 'allele' as through all the significant expressions.
+            # Filter significant alleles based on critical alpha storing their index.
+            indexes = np.flatnonzero(p_values[tumor_index] < critical_alpha)
 
+            count('probes_tested', int(np.count_nonzero(~np.isnan(p_values[tumor_index]))), tumor=tumor)
+            count('probes_significant', len(indexes), tumor=tumor)
 
-        else: # If the tumor is normal (i.e. the brain is healthy).
-            
-            # Adding the normal expression values.
-            dict_alleles[tumor] = {allele: # The name of the allele (as keys).
-                                    df.loc[df['type'] == tumor, allele].mean() # Locating the mean value of 'allele' in 'tumor' (as values).
-                                    for allele in alleles} # Iterating 'allele' as through all the possible expressions.
+        else: # If the tumor is normal (i.e. the brain is healthy), all the possible expressions are kept.
+            indexes = np.arange(len(alleles))
+
+        # Adding the mean expression values (and the P values) of the alleles.
+        rows.append((tumor, indexes, means[tumor_index, indexes], p_values[tumor_index, indexes]))
   
-    # Converting dict_alleles into a dataframe.
-    data = pd.DataFrame.from_dict(dict_alleles, orient='index') 
-    
-    return data
+    return rows
 
 
 # Optional
@@ -133,22 +644,26 @@ def print_data(data):
     This function prints the entire data from the excel after the statistical analysis.
 
     Args:
-        data (DataFrame) - Contains the mean expression of each allele that 
-                           had a significant effect over the normal tissue.
+        data (DataFrame / AlleleTable) - Contains the mean expression of each allele that 
+                                         had a significant effect over the normal tissue.
     """
 
-    if data.empty:
+    table = as_allele_table(data) # Only the significant entries, so the rows need no scan for NaN.
+
+    if len(table) == 0:
         print('\nNo data recieved.')
 
-    for tumor, row in data.iterrows():# Iterate over the DataFrame rows and print the formatted output.
+    for tumor in table.index:# Iterate over the tumors and print the formatted output.
         if tumor != 'normal':
             
             print(f"Tumor: {tumor}.")  # Print the tumor type.
 
-            allele_num = len(row.dropna()) 
+            row = table.tumor(tumor) # The significant alleles of the tumor.
+
+            allele_num = len(row) 
             print(f"Number of alleles having a significant play: {allele_num}")  # Print the total count of significant alleles.
 
-            allele_list = ', '.join(f"'{allele}'" for allele in row.dropna().index)  # Get the list of alleles with non-NaN values.
+            allele_list = ', '.join(f"'{allele}'" for allele in row.index)  # Get the list of alleles with significant values.
 
             if allele_num > 0:
                print(f"Significant alleles: {allele_list}\n")  # Print the list of significant alleles.
@@ -1,36 +1,84 @@
-import seaborn as sns
-import matplotlib.pyplot as plt
+import io
 import os
+import sys
+import threading
+import pandas as pd
 import numpy as np
 import random
 
+try: # When src is on sys.path (as in the tests).
+    from query_index import QueryIndex, RANKINGS
+    from correlation_network import correlation_edges
+    from result_cache import ResultCache
+    from expression_matrix import as_expression_matrix
+    from instrumentation import span
+    from resampling import fold_change_intervals
+    from probe_search import ProbeSearch
+    from allele_distributions import AlleleDistributions, distribution_of
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.query_index import QueryIndex, RANKINGS
+    from src.correlation_network import correlation_edges
+    from src.result_cache import ResultCache
+    from src.expression_matrix import as_expression_matrix
+    from src.instrumentation import span
+    from src.resampling import fold_change_intervals
+    from src.probe_search import ProbeSearch
+    from src.allele_distributions import AlleleDistributions, distribution_of
+
 class DataVisualization:
     """
     This class uses the data of the allele's expression  
     in each brain tumor and plots it to the user. 
     """
     
-    def __init__(self, data, df, num_for_plot = 5, corr_threshold = 0.7):
+    def __init__(self, data, df, num_for_plot = 5, corr_threshold = 0.7, interactive = True,
+                 cache_entries = 128, cache_bytes = 64 * 1024 ** 2, plots = True, rank_by = 'difference', resamples = 0,
+                 annotation = None):
         """
         Initializes the class and prepares data for visualization.
 
         Args: 
-           data (DataFrame) - Modified df as it contains solely the mean expression of each 
-                              allele that had a significant effect over the normal tissue
+           data (DataFrame / AlleleTable) - Modified df as it contains solely the mean expression of each 
+                                            allele that had a significant effect over the normal tissue
 
-           df (DataFrame)- Consists of the raw data of the file.
+           df (DataFrame / ExpressionMatrix)- Consists of the raw data of the file.
 
            num_for_plot (int) - The number of top alleles that we allow to be plotted for each tumor.
                                 Can only be a natural number. If no value is used then baseline is 5.
 
            corr_threshold (float) - Threshold for determining significant correlations. If no value is 
                                     used then baseline value is 0.7.
+
+           interactive (bool) - Whether to run the interface with the user. If False, the class only prepares
+                                the data, to be queried with query_allele and query_tumor. Baseline is True.
+
+           cache_entries (int) - The maximum number of analysis results kept for repeated queries. Baseline is 128.
+
+           cache_bytes (int) - The maximum total size (in bytes) of the results kept. Baseline is 64 MB.
+
+           plots (bool) - Whether to draw the plots. If False, the analyses are only printed (and matplotlib
+                          and seaborn are never imported). Baseline is True.
+
+           rank_by (str) - How the top alleles of a tumor are chosen: by their absolute 'difference' from the
+                           healthy tissue, their 'log2_fold_change' or their t 'statistic' (see query_index.py).
+                           If no value is used (or an invalid one) then baseline is 'difference'.
+
+           resamples (int) - The number of bootstrap resamples (and permutations) of the confidence intervals and
+                             P values printed with the fold changes of an allele (see resampling.py). Baseline is 0 (none).
+
+           annotation (GeneAnnotation) - The gene of each probe (see gene_annotation.py), so that genes can be looked
+                                         up by their symbol. If no value is used then only probes can be looked up.
         """
 
         self.data = data
-        self.df = df
+        self.plots = plots
+        # The raw data as a single array of expression values and integer codes for the types (see expression_matrix.py).
+        self.matrix = as_expression_matrix(df)
         self.num_for_plot = num_for_plot
         self.corr_threshold = corr_threshold
+        self.rank_by = rank_by
+        self.resamples = resamples
+        self.annotation = annotation
         
         # In case the programmer has inserted an invalid value for num_for_plot
         if type(self.num_for_plot) is not int or self.num_for_plot < 2:
@@ -42,189 +90,496 @@ class DataVisualization:
         if type(self.corr_threshold) is not float or abs(self.corr_threshold) > 1:
             self.corr_threshold = 0.7
             print('\nInserted value of threshold for correlation was invalid. Baseline value (0.7) was used instead.')
+
+        # In case the programmer has inserted an invalid ranking
+        if self.rank_by not in RANKINGS:
+            self.rank_by = 'difference'
+            print(f"\nInserted ranking is invalid (choose one of: {', '.join(RANKINGS)}). Baseline ranking (difference) was used instead.")
+
+        # In case the programmer has inserted an invalid number of resamples
+        if type(self.resamples) is not int or self.resamples < 0:
+            self.resamples = 0
+            print('\nInserted number of resamples is invalid. Baseline value (0) was used instead.')
         
+        # The lookups for the alleles and the tumors, built once (see query_index.py).
+        with span('query_index'): # Timed when instrumentation is enabled (see instrumentation.py).
+            self.index = QueryIndex(data, self.matrix)
+
         # A list containing all the different alleles in the dataset. 
-        self.alleles = df.columns[2:]
+        self.alleles = self.index.alleles
 
         # A list containing the types of each brain tumor. 
-        self.cancer_type = list(df['type'].unique())
+        self.cancer_type = self.index.cancer_type
 
         # Contains the mean expression (in values) for each allele (in keys) in the healthy tissue.
-        self.normal_means = df[df['type'] == 'normal'][self.alleles].mean().to_dict() # Converts the variable into a dict.
+        self.normal_means = dict(zip(self.alleles, self.index.normal_means))
+
+        # The results of the analyses of tumors and alleles, kept for repeated queries (see result_cache.py).
+        self.cache = ResultCache(cache_entries, cache_bytes)
+
+        # The index of the names that can be searched (see probe_search.py), built on the first search.
+        self.search_index = None
+
+        # The statistics, histograms and KDE of every allele (see allele_distributions.py), computed on the first analysis of an allele.
+        self.allele_distributions = None
+        # (Built once even when several threads ask for it at the same time, e.g. in interactive_session.py and query_server.py.)
+        self.distributions_lock = threading.Lock()
+
+        if interactive:
+            try:
+                self.user_interface() # Run the interface with the user.
+            except StopIteration:
+                pass
+
+
+    def query_allele(self, allele):
+        """
+        Returns the expression of allele in every tumor in which it is significant, without plotting
+        (see QueryIndex.query_allele).
+
+        Args: 
+            allele (str) - The name of the allele.
+        """
+
+        return self.index.query_allele(allele)
+
+
+    def query_tumor(self, tumor_type, top = None, rank_by = None):
+        """
+        Returns the significant alleles of tumor_type, from the largest difference from the healthy tissue 
+        (or by another ranking), without plotting (see QueryIndex.query_tumor).
+
+        Args: 
+            tumor_type (str) - The name of the tumor.
+
+            top (int) - The number of alleles to return. If no value is used then all of them are returned.
+
+            rank_by (str) - The ranking of the alleles (see query_index.RANKINGS). If no value is used then self.rank_by is used.
+        """
+
+        return self.index.query_tumor(tumor_type, top, rank_by or self.rank_by)
+
+
+    def tumor_results(self, tumor_type):
+        """
+        Returns the analysis of the tumor type (computed once for each num_for_plot and corr_threshold, then cached).
+
+        Args: 
+            tumor_type (str) - The name of the tumor.
+
+        Return:
+            results (dict) - 'ranking': the top num_for_plot alleles (as returned by query_tumor),
+                             'correlation_data' and 'list_corr': their correlations (as returned by tumor_correlations).
+        """
+
+        def compute():
+            with span('tumor_results', tumor=tumor_type):
+                ranking = self.index.query_tumor(tumor_type, self.num_for_plot, self.rank_by)
+                correlation_data, list_corr = self.tumor_correlations(tumor_type, list(ranking.index))
+
+            return {'ranking': ranking, 'correlation_data': correlation_data, 'list_corr': list_corr}
+
+        return self.cache.get_or_compute(('tumor', tumor_type, self.num_for_plot, self.corr_threshold, self.rank_by), compute)
+
+
+    def allele_results(self, allele):
+        """
+        Returns the analysis of the allele (computed once, then cached).
+
+        Args: 
+            allele (str) - The name of the allele.
+
+        Return:
+            results (dict) - 'expression': its expression in the tumors (as returned by query_allele),
+                             'summary': the statistical summary of its expression in all the samples (describe()),
+                             and, if resamples is not 0, 'intervals': the confidence intervals and P values of
+                             its fold changes (as returned by resampling.fold_change_intervals).
+        """
+
+        def compute():
+            with span('allele_results'):
+                results = {'expression': self.index.query_allele(allele), 'summary': self.distributions().summary(allele)}
+
+                if self.resamples:
+                    significant = {tumor: [allele] for tumor in results['expression'].index}
+                    results['intervals'] = fold_change_intervals(self.matrix, significant, self.resamples, self.resamples, workers=1)
+
+                return results
+
+        return self.cache.get_or_compute(('allele', allele), compute)
+
+
+    def render_png(self, kind, name):
+        """
+        Renders one of the plots to PNG bytes without showing it (rendered once, then cached).
+
+        Args: 
+            kind (str) - 'expression' (the bar plot of a tumor), 'correlation' (the heatmap of a tumor) 
+                         or 'distribution' (the histogram of an allele).
+
+            name (str) - The name of the tumor or allele.
+
+        Return:
+            png (bytes) - The plot as a PNG image. None if there is nothing to plot (or plots is False).
+        """
+
+        if not self.plots:
+            return None
+
+        def compute():
+            with span('render_png', kind=kind):
+                return render()
+
+        def render():
+            from matplotlib.figure import Figure # Imported on first use, like pyplot (see load_pyplot).
+
+            # A standalone figure (not managed by pyplot), so it never opens a window.
+            figure = Figure(figsize={'expression': (10, 6), 'correlation': (8, 6), 'distribution': (10, 5)}[kind])
+            axes = figure.add_subplot()
+
+            if kind == 'distribution':
+                plot_allele_distribution(axes, name, self.distributions().distribution(name))
+            else:
+                results = self.tumor_results(name)
+
+                if kind == 'expression':
+                    plot_tumor_expression(axes, name, results['ranking'], self.num_for_plot)
+                elif results['list_corr'] is not None:
+                    plot_correlation_heatmap(axes, name, results['correlation_data'])
+                else:
+                    return None
+
+            figure.tight_layout() # Adjust layout to prevent overlap for aesthetic reasons.
+
+            buffer = io.BytesIO()
+            figure.savefig(buffer, format='png')
+
+            return buffer.getvalue()
+
+        return self.cache.get_or_compute(('png', kind, name, self.num_for_plot, self.corr_threshold, self.rank_by), compute)
+
+
+    def cache_stats(self):
+        """
+        Returns the counters (entries, bytes, hits, misses and evictions) of the cache of results.
+        """
+
+        return self.cache.stats()
+
+
+    def correlation_network(self, tumor_type, significant_only = True, block_size = 2048):
+        """
+        Finds every pair of alleles that is highly correlated (at least corr_threshold) in the samples of 
+        the tumor type, without being limited to the top num_for_plot alleles (see correlation_network.py).
+
+        Args: 
+            tumor_type (str) - The name of the tumor.
+
+            significant_only (bool) - Whether to correlate only the significant alleles of the tumor 
+                                      (True, the baseline) or all the alleles of the dataset.
+
+            block_size (int) - The number of alleles on each side of a tile of the computation.
+
+        Return:
+            edges (DataFrame) - The correlated pairs of alleles ('allele_a', 'allele_b' and 'correlation').
+        """
+
+        if significant_only:
+            alleles = list(self.query_tumor(tumor_type).index)
+        else:
+            alleles = list(self.alleles)
+
+        tumor_samples = self.matrix.group_values(tumor_type, alleles)
+
+        return correlation_edges(tumor_samples, alleles, self.corr_threshold, block_size)
+
+
+    def suggest(self, text, limit = 10):
+        """
+        Finds the alleles, tumors and genes whose name looks like text: the names starting with it, containing
+        it or within a few typos of it, from the closest (see probe_search.py).
+
+        Args: 
+            text (str) - What the user typed (regardless of case).
+
+            limit (int) - The number of suggestions. Baseline is 10.
+
+        Return:
+            suggestions (list) - A (name, kind, match) tuple for each suggestion, where kind is 'allele', 'tumor' or 'gene'.
+        """
+
+        if self.search_index is None:
+            with span('probe_search'):
+                genes = list(self.annotation.gene_probes) if self.annotation is not None else None
+                self.search_index = ProbeSearch(self.alleles, genes, self.cancer_type)
+
+        return self.search_index.search(text, limit)
+
+
+    def distributions(self):
+        """
+        Returns the statistics, histograms and KDE of the expression of every allele, computed for all
+        the alleles at once on the first call (see allele_distributions.py). The session and the server
+        call it in the background when they start, so that the first analysis of an allele does not wait for it.
+        """
+
+        if self.allele_distributions is None:
+            with self.distributions_lock: # The other threads wait for the first one instead of computing them again.
+                if self.allele_distributions is None:
+                    self.allele_distributions = AlleleDistributions(self.matrix)
+
+        return self.allele_distributions
+
+
+    def resolve(self, text):
+        """
+        Returns what text names, regardless of case: ('allele', name), ('tumor', name) or ('gene', symbol).
+        (None, None) if it is not the name of any of them.
+        """
 
-        try:
-            self.user_interface() # Run the interface with the user.
-        except StopIteration:
-            pass
+        if self.index.has_allele(text):
+            return 'allele', text
+
+        if self.index.has_tumor(text):
+            return 'tumor', text
+
+        if self.annotation is not None and self.annotation.symbol(text) is not None:
+            return 'gene', self.annotation.symbol(text)
+
+        # The names with capital letters (e.g. 'AFFX-BioB-5_at'), which the lowercase input never matches exactly.
+        suggestions = self.suggest(text, 1)
+        if suggestions and suggestions[0][2] == 'exact':
+            name, kind, _ = suggestions[0]
+            return kind, name
+
+        return None, None
 
 
     def user_interface(self):
         """
         Providing user interface for allele and tumor analysis.
-        The program asks the user to type either one of three options: 
+        The program asks the user to type either one of four options: 
 
         1. The name of the allele (which will execute analyze_allele_expression).
         2. The name of the tumor (which will execute analyze_tumor).
-        3. 'Exit', which simply ends the program. 
+        3. The symbol of a gene, if there is an annotation (which will execute analyze_gene).
+        4. 'Exit', which simply ends the program. 
+
+        Anything else is searched for, and the closest names are suggested by number (typing the number analyzes it).
         """
+
+        random_alleles = random.sample(list(self.alleles), self.num_for_plot) # Randomly select num_for_plot alleles (once).
+
+        # The suggestions of the last search, which the user can pick by their number.
+        suggestions = []
+
         while True:  # The program will run perpetually until we tell it to stop (by typing 'exit').
 
             print("\nTissues available:", ", ".join(self.cancer_type))
-            random_alleles = random.sample(list(self.alleles), self.num_for_plot) # Randomly select num_for_plot alleles.
             print("Example of available genes:", ", ".join(random_alleles))
 
             # Get user's choice for analysis.
             allele_or_tumor = input("\nEnter allele, tumor type, or 'exit' to quit: ").strip().lower()
 
-            if allele_or_tumor in self.alleles: # If the user has inserted an allele to the program.
-                self.analyze_allele_expression(allele_or_tumor)
-
-            elif allele_or_tumor in self.cancer_type: # If the user has inserted a type of cancer to the program.
-                self.analyze_tumor(allele_or_tumor)
-
-            elif allele_or_tumor == 'exit': # If the user wants to end the program. 
+            if allele_or_tumor == 'exit': # If the user wants to end the program. 
                 os.system('cls') # Clears the terminal. 
                 raise StopIteration()  # Exit the program. 
 
-            else: # If the user types something unfamiliar to the program.
-                print("\nInvalid choice. Please try again.")
-                self.user_interface() # Running the program again to give the user another chance to type something relevant. 
+            if allele_or_tumor.isdigit() and 1 <= int(allele_or_tumor) <= len(suggestions): # If the user picked a suggestion.
+                allele_or_tumor = suggestions[int(allele_or_tumor) - 1][0]
+
+            kind, name = self.resolve(allele_or_tumor)
+
+            if kind == 'allele': # If the user has inserted an allele to the program.
+                self.analyze_allele_expression(name)
+
+            elif kind == 'tumor': # If the user has inserted a type of cancer to the program.
+                self.analyze_tumor(name)
+
+            elif kind == 'gene': # If the user has inserted a gene symbol.
+                self.analyze_gene(name)
+
+            else: # If the user types something unfamiliar to the program, the closest names are suggested (and the loop goes on).
+                suggestions = self.suggest(allele_or_tumor)
+                print_suggestions(suggestions)
 
 
     # Reclled from user_interface() based on user's dicision.
-    def analyze_allele_expression(self, allele):
+    def analyze_gene(self, gene):
+        """
+        Analyzes a gene: its own expression if the data is at gene level (see gene_annotation.aggregate_genes),
+        and otherwise the expression of each of its probes in the tumors where the probe is significant.
+
+        Args: 
+            gene (str) - The symbol of the gene (regardless of case).
+        """
+
+        symbol = self.annotation.symbol(gene)
+
+        if self.index.has_allele(symbol): # The probes of each gene were collapsed into the gene.
+            self.analyze_allele_expression(symbol)
+            return
+
+        probes = [probe for probe in self.annotation.probes(symbol) if self.index.has_allele(probe)]
+        print(f"\nGene '{symbol}' is measured by {len(probes)} probes: {', '.join(probes)}.")
+
+        expression = {probe: self.query_allele(probe) for probe in probes}
+        expression = {probe: result for probe, result in expression.items() if not result.empty}
+
+        if not expression:
+            print(f"None of the probes of '{symbol}' is significant in any tumor types.")
+            return
+
+        print(pd.concat(expression, names=['probe']).round(3).to_string())
+
+
+    def analyze_allele_expression(self, allele, results = None, block = True):
         """
         Analyzes a specific allele's expression levels across tumor types.
 
         Args: 
             allele (str) - The name of the allele the user has inserted to the program.
-        """
 
-        os.system('cls') # Clears the terminal. 
+            results (dict) - The analysis of the allele, if it was already computed (as returned by allele_results).
 
-        # Find tumor types where the allele expression is available (i.e., no values of NaN).
-        tumors_with_allele = self.data[allele].dropna().index # dropna() is used to include only data without NaN. 
-                                                            # index() is used in order to include only the names of the tumors.
-                                                            # (which is the index in that case) and exclude the level of expression. 
+            block (bool) - Whether to wait for the plot to be closed (True, the baseline), or to show it and
+                           return at once (as the interactive session of interactive_session.py does).
+        """
+
+        if block:
+            os.system('cls') # Clears the terminal. 
 
-        tumors_with_allele = tumors_with_allele[tumors_with_allele != 'normal'] # Exclude 'normal' type.
+        # The expression of the allele in the tumor types where it is significant (excluding 'normal' type),
+        # and a statistical summary of its expression (both cached for repeated queries).
+        if results is None:
+            results = self.allele_results(allele)
+        allele_expression = results['expression']
 
-        # Check if the allele is present in any tumor types. If not, then it will call main() again and will start over.
-        if tumors_with_allele.empty: 
+        # Check if the allele is present in any tumor types. If not, then it returns to the interface with the user.
+        if allele_expression.empty: 
             print(f"Allele '{allele}' is not significant in any tumor types.")
-            self.user_interface() # Call the main function if the allele is not found in any tumor.
+            return
 
 
         # Printing a subtitle for which alleles are we analysing.
         print(f"Analysis for allele '{allele}':\n")
 
         # Loop through each tumor type where the allele is present and analyze the expression level compared to the healthy tissue. 
-        for tumor_type in tumors_with_allele:
-            tumor_expression = self.data.loc[tumor_type, allele] # Retrieve the tumor expression value for the allele from data. 
+        for tumor_type, row in allele_expression.iterrows():
+
+            # Print the difference in expression between the tumor and normal tissue.
+            print(f"Tumor Type: {tumor_type}, Tumor Expression: {round(row['tumor_expression'], 3)}, "
+                  f"It is different than the healthy tissue by: {round(row['percent_of_normal'], 3)}%.")
+
+            # With the uncertainty of the difference, if it was resampled.
+            if results.get('intervals') is not None and (tumor_type, allele) in results['intervals'].index:
+                interval = results['intervals'].loc[(tumor_type, allele)]
+                print(f"    95% confidence interval: {round(interval['ci_low'], 3)}% - {round(interval['ci_high'], 3)}%, "
+                      f"permutation P value: {round(interval['p_value'], 4)}.")
 
-            # Calculate and print the difference in expression between the tumor and normal tissue.
-            print(f"Tumor Type: {tumor_type}, Tumor Expression: {round(tumor_expression, 3)}, "
-                  f"It is different than the healthy tissue by: {round((tumor_expression / self.normal_means[allele]) * 100 , 3)}%.")
+        # The statistical summary of the allele's data (mean, std, etc.), as describe() gives it.
+        print(results['summary'])
 
-        # Describe the allele's data to get a statistical summary (mean, std, etc.).
-        allele_data = self.df[allele]
-        print(allele_data.describe())
+        if not self.plots: # Only the text output is wanted.
+            return
 
         # Plotting the distribution of allele expression.
-        plt.figure(figsize=(10, 5))
-        sns.histplot(allele_data, kde=True, color='blue') # Generate a histogram with a KDE curve.
-        plt.title(f"Distribution of Expression Levels for allele: {allele}") 
-        plt.xlabel("Expression Level")  
-        plt.ylabel("Frequency")  
-        plt.show()
+        plt = load_pyplot()
+        figure, axes = plt.subplots(figsize=(10, 5))
+        plot_allele_distribution(axes, allele, self.distributions().distribution(allele))
+        plt.show(block=block)
+
+
+    def tumor_correlations(self, tumor_type, top_alleles):
+        """
+        Computes the correlations among the top alleles in the tumor type, and finds the alleles 
+        that have a significant correlation (at least corr_threshold) with one another.
+
+        Args: 
+            tumor_type (str) - The name of the tumor.
+
+            top_alleles (list) - The alleles to correlate.
+
+        Return:
+            correlation_data (DataFrame) - The correlation matrix of the top alleles.
+
+            list_corr (list) - The alleles that are significantly correlated with at least one other allele.
+                               None if there are not enough alleles or correlation values to check.
+        """
+
+        # Compute correlation matrix.
+        correlation_data = pd.DataFrame(self.matrix.group_values(tumor_type, top_alleles), columns=top_alleles).corr()
+
+        if (len(top_alleles) < 2 or # Must be at least two in order to show correlation between at least two alleles. 
+            not np.any(np.isfinite(correlation_data))): # Verifying whether there are correlation values at all.
+                                                        #isfinite() checks for valid numeric values (excluding NaN or Inf).
+            return correlation_data, None
+
+        # The pairs of the upper triangle (without the diagonal), read directly from the correlation matrix.
+        rows, columns = np.triu_indices(len(top_alleles), 1)
+
+        # The pairs with correlation >= corr_threshold (NaN correlations never are).
+        correlated = np.abs(correlation_data.to_numpy()[rows, columns]) >= self.corr_threshold
+
+        # The alleles in at least one such pair, in the order of top_alleles.
+        list_corr = [top_alleles[position] for position in np.unique(np.concatenate([rows[correlated], columns[correlated]]))]
+
+        return correlation_data, list_corr
 
 
     # Reclled from user_interface() based on user's dicision.
-    def analyze_tumor(self, tumor_type):
+    def analyze_tumor(self, tumor_type, results = None, block = True):
         """
         Analyzes a specific tumor type and creates graphs for allele expression and correlation.
         Shows the top alleles with the most difference from their normal expression.
 
         Args: 
             tumor_type (str) - The name of the cancer the user has inserted to the program.
-        """
 
-        os.system('cls') # Clears the terminal. 
-        
-        # Retrieve the allele expression data for the specified tumor type (typed by the user).
-        tumor_allele_data = self.data.loc[tumor_type].dropna() # Excludes all values of NaN.
+            results (dict) - The analysis of the tumor, if it was already computed (as returned by tumor_results).
 
-         # Contains the absolute difference in expression between tumor and normal tissues.
-        differences = {allele: abs(tumor_allele_data[allele] - self.normal_means[allele]) for allele in tumor_allele_data.index}
+            block (bool) - Whether to wait for the plots to be closed (True, the baseline), or to show them and
+                           return at once (as the interactive session of interactive_session.py does).
+        """
 
-         # Get the top alleles with the largest expression differences. 
-        top_alleles = sorted(differences, key=differences.get, reverse=True)[:self.num_for_plot]
+        if block:
+            os.system('cls') # Clears the terminal. 
+        
+        # Retrieve the top alleles with the largest expression differences for the specified tumor type (typed by the user),
+        # and the correlations among them (both cached for repeated queries).
+        # They are already sorted by their absolute difference in expression between tumor and normal tissues (see query_index.py).
+        if results is None:
+            results = self.tumor_results(tumor_type)
+        tumor_allele_data = results['ranking']
 
 
-              # Create a bar plot comparing tumor vs normal expression levels for the top alleles.
-        
-        expression_data = [] # List to store expression values.
-        labels = [] # List to store allele labels.
+        # The plots are drawn with pyplot, which is only imported when they are wanted (see load_pyplot).
+        plt = load_pyplot() if self.plots else None
 
-        for allele in top_alleles:
-            # Add tumor and normal expression values to the data for plotting.
+        if tumor_type != 'normal' and plt is not None: # No need to plot results if the tissue is normal. 
 
-            # In both expression_data and labels, extend is used in order to insert the data of the tumor and normal 
-            # one after another. So for example if the expression data for the normal tissue is [1,2,3] and the sick 
-            # tissue is [4,5,6], then the new list shall be: [1,4,2,5,3,6].
-            expression_data.extend([tumor_allele_data[allele], self.normal_means[allele]])
-            labels.extend([f'{allele}\nTumor', f'{allele}\nNormal'])
-        
-        if tumor_type != 'normal': # No need to plot results if the tissue is normal. 
-            plt.figure(figsize=(10, 6))
-
-            # Plot bars for tumor and normal expression levels.
-            bars = plt.bar(range(len(expression_data)), expression_data) # First variable includes the range of how many different levels of expression we have (both normal and sick).
-                                                                    # Second variable includes the data of the expression for both the sick and normal.
-           
-            # Coloring the bars according to whether they are sick or normal. 
-            for i in range(0, len(bars), 2): # The jumps of 2 are necessary for only that way we will color a different bar each new iteration.
-
-                bars[i].set_color('royalblue') # Set color for tumor bars.
-                bars[i+1].set_color('lightgreen') # Set color for normal bars.
-            
-            # Plotting the results. 
-            plt.xticks(range(len(labels)), labels, rotation=45) # Customize x-axis labels and rotating them 45 degrees.
-            plt.title(f"Top {self.num_for_plot} Alleles with Most Difference in Expression for {tumor_type}")  
-            plt.ylabel("Expression Level")  
-            plt.tight_layout() # Adjust layout to prevent overlap for aesthetic reasons.
+            # Create a bar plot comparing tumor vs normal expression levels for the top alleles.
+            figure, axes = plt.subplots(figsize=(10, 6))
+            plot_tumor_expression(axes, tumor_type, tumor_allele_data, self.num_for_plot)
+            figure.tight_layout() # Adjust layout to prevent overlap for aesthetic reasons.
         
 
             # Create a heatmap to visualize correlations among the top alleles in the tumor type.
 
-        correlation_data = self.df[self.df['type'] == tumor_type][top_alleles].corr() # Compute correlation matrix.
+        correlation_data, list_corr = results['correlation_data'], results['list_corr']
 
-        if (len(top_alleles) >= 2 and # Must be at least two in order to show correlation between at least two alleles. 
-             np.any(np.isfinite(correlation_data))):# Verifying whether there are correlation values at all.
-                                                    #isfinite() checks for valid numeric values (excluding NaN or Inf).
+        if list_corr is not None: # There are correlation values to show.
             
             """
             Printing to the user the alleles who have a significant correlation 
             between one another in the formation of the tumor:
             """
 
-            # Create a copy of the correlation matrix
-            corr_lower = correlation_data.copy()
-
-            # Apply a mask to keep only the lower triangle and remove the diagonal.
-            corr_lower.values[np.triu_indices_from(corr_lower)] = np.nan
-
-            # Extract components with correlation >= corr_threshold.
-            significant_pairs = corr_lower[abs(corr_lower) >= self.corr_threshold].stack().index.tolist()
-
-            # Get unique component names.
-            list_corr = list(set([item for sublist in significant_pairs for item in sublist]))
-            
             if len(list_corr) > 0 and tumor_type != 'normal':
                 print(f"\nMost significant alleles that are highly correlated in the formation of {tumor_type}:\n")
 
                 for allele in list_corr:
-                    print(f"{allele} - Changed expression from normal by {round((tumor_allele_data[allele] / self.normal_means[allele])*100, 3)}%")
+                    print(f"{allele} - Changed expression from normal by {round(tumor_allele_data.loc[allele, 'percent_of_normal'], 3)}%")
             
             elif tumor_type == 'normal':
                 pass
@@ -237,13 +592,145 @@ class DataVisualization:
 
                  # Plotting the full (unfiltered) correlation results. 
 
-            plt.figure(figsize=(8, 6))
-            sns.heatmap(correlation_data, annot=True, cmap='coolwarm', center=0) # Plot heatmap.
-            plt.title(f"Allele Correlation Heatmap - {tumor_type}") # Set heatmap title.
-            plt.tight_layout() # Adjust layout to prevent overlap for aesthetic reasons.
+            if plt is not None:
+                figure, axes = plt.subplots(figsize=(8, 6))
+                plot_correlation_heatmap(axes, tumor_type, correlation_data)
+                figure.tight_layout() # Adjust layout to prevent overlap for aesthetic reasons.
 
         else:
             print(f'\nNot enough data in excel file to show correlation between alleles in {tumor_type}.')
         
-        plt.show()
-        os.system('cls') # Clears the terminal. 
\ No newline at end of file
+        if plt is not None:
+            plt.show(block=block)
+
+        if block:
+            os.system('cls') # Clears the terminal. 
+
+
+
+def load_pyplot(backend = None):
+    """
+    Imports matplotlib.pyplot on first use: together with seaborn it takes most of the start-up time of the
+    program, and runs that do not plot (e.g. main.py --no-plots) never import them at all.
+
+    Args:
+        backend (str) - The backend selected before pyplot is imported (e.g. 'Agg', which only renders to files).
+                        If no value is used then matplotlib picks one (an interactive one if there is a display).
+
+    Return:
+        plt (module) - matplotlib.pyplot.
+    """
+
+    if backend is not None and 'matplotlib.pyplot' not in sys.modules:
+        import matplotlib
+        matplotlib.use(backend)
+
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+def print_suggestions(suggestions):
+    """
+    Prints the suggestions of DataVisualization.suggest, numbered so that the user can pick one by its number.
+    """
+
+    if not suggestions:
+        print("\nInvalid choice. Please try again.")
+        return
+
+    print("\nNo exact match. Did you mean:")
+    for number, (name, kind, match) in enumerate(suggestions, 1):
+        print(f"  {number}. {name} ({kind}, {match})")
+    print("Type the number of a suggestion to analyze it.")
+
+
+# The plots of the class, drawn on a given axes so that they can be shown (by DataVisualization) 
+# or saved (by batch_report.py, which reuses the same axes for many plots).
+
+def plot_tumor_expression(axes, tumor_type, tumor_allele_data, num_for_plot):
+    """
+    Plots a bar plot comparing tumor vs normal expression levels for the top alleles.
+
+    Args: 
+        axes (Axes) - The axes to plot on.
+
+        tumor_type (str) - The name of the tumor.
+
+        tumor_allele_data (DataFrame) - The top alleles of the tumor (as returned by query_tumor).
+
+        num_for_plot (int) - The number of top alleles that were plotted.
+    """
+
+    expression_data = [] # List to store expression values.
+    labels = [] # List to store allele labels.
+
+    for allele, row in tumor_allele_data.iterrows():
+        # Add tumor and normal expression values to the data for plotting.
+
+        # In both expression_data and labels, extend is used in order to insert the data of the tumor and normal 
+        # one after another. So for example if the expression data for the normal tissue is [1,2,3] and the sick 
+        # tissue is [4,5,6], then the new list shall be: [1,4,2,5,3,6].
+        expression_data.extend([row['tumor_expression'], row['normal_expression']])
+        labels.extend([f'{allele}\nTumor', f'{allele}\nNormal'])
+
+    # Plot bars for tumor and normal expression levels.
+    bars = axes.bar(range(len(expression_data)), expression_data) # First variable includes the range of how many different levels of expression we have (both normal and sick).
+                                                                  # Second variable includes the data of the expression for both the sick and normal.
+   
+    # Coloring the bars according to whether they are sick or normal. 
+    for i in range(0, len(bars), 2): # The jumps of 2 are necessary for only that way we will color a different bar each new iteration.
+
+        bars[i].set_color('royalblue') # Set color for tumor bars.
+        bars[i+1].set_color('lightgreen') # Set color for normal bars.
+    
+    # Plotting the results. 
+    axes.set_xticks(range(len(labels)), labels, rotation=45) # Customize x-axis labels and rotating them 45 degrees.
+    axes.set_title(f"Top {num_for_plot} Alleles with Most Difference in Expression for {tumor_type}")  
+    axes.set_ylabel("Expression Level")  
+
+
+def plot_allele_distribution(axes, allele, allele_data):
+    """
+    Plots the distribution of allele expression as a histogram with a KDE curve.
+
+    Args: 
+        axes (Axes) - The axes to plot on.
+
+        allele (str) - The name of the allele.
+
+        allele_data (dict / Series / array) - The precomputed distribution of the allele (as returned by
+                                              AlleleDistributions.distribution), or its expression in every sample.
+    """
+
+    # Only drawn here: the histogram and the KDE are precomputed (see allele_distributions.py).
+    distribution = allele_data if isinstance(allele_data, dict) else distribution_of(allele_data)
+    edges = distribution['edges']
+
+    axes.bar(edges[:-1], distribution['counts'], width=np.diff(edges), align='edge', color='blue', alpha=0.4, edgecolor='white')
+
+    # The KDE is scaled to the counts of the bins (as seaborn's histplot(..., kde=True) draws it).
+    if not np.isnan(distribution['density']).any():
+        axes.plot(distribution['grid'], distribution['density'] * distribution['samples'] * (edges[1] - edges[0]), color='blue')
+
+    axes.set_title(f"Distribution of Expression Levels for allele: {allele}") 
+    axes.set_xlabel("Expression Level")  
+    axes.set_ylabel("Frequency")  
+
+
+def plot_correlation_heatmap(axes, tumor_type, correlation_data):
+    """
+    Plots the full (unfiltered) correlation matrix of the top alleles as a heatmap.
+
+    Args: 
+        axes (Axes) - The axes to plot on.
+
+        tumor_type (str) - The name of the tumor.
+
+        correlation_data (DataFrame) - The correlation matrix of the top alleles.
+    """
+
+    import seaborn as sns
+
+    sns.heatmap(correlation_data, annot=True, cmap='coolwarm', center=0, ax=axes) # Plot heatmap.
+    axes.set_title(f"Allele Correlation Heatmap - {tumor_type}") # Set heatmap title.
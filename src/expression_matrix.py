@@ -0,0 +1,169 @@
+import pandas as pd
+import numpy as np
+
+try: # When src is on sys.path (as in the tests).
+    from group_statistics import group_samples
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.group_statistics import group_samples
+
+"""
+This code keeps the raw data of the file in a compact form, instead of a DataFrame with a column for every allele.
+
+The expression values are stored as a single contiguous 2-D array (samples x alleles) of float32
+(or float16, to halve it again), the names of the alleles in a separate Index, and the type of each
+sample as a small integer code (a categorical), so that selecting the samples of a tumor is an integer
+comparison rather than a comparison of strings. clean_data, QueryIndex and DataVisualization accept an
+ExpressionMatrix anywhere they accept df.
+"""
+
+class ExpressionMatrix:
+    """
+    This class holds the expression values, the alleles, the samples and the types of the samples of the file.
+    """
+
+    def __init__(self, values, alleles, samples, types, columns = ('samples', 'type')):
+        """
+        Builds the matrix.
+
+        Args:
+           values (ndarray) - The expression values (samples x alleles). Kept as they are if they are
+                              already a contiguous array (e.g. memory-mapped from the cache).
+
+           alleles (list / Index) - The names of the alleles (the columns of values).
+
+           samples (list / ndarray) - The name of each sample (the rows of values).
+
+           types (list / ndarray) - The type of each sample.
+
+           columns (tuple) - The names of the samples and type columns of the file. Baseline is ('samples', 'type').
+        """
+
+        self.values = np.ascontiguousarray(values)
+        self.alleles = pd.Index(alleles)
+        self.samples = np.asarray(samples)
+        self.columns = tuple(columns)
+
+        # A list containing the types of each brain tumor (in order of first appearance), and the type of each sample
+        # (as an index of that list, in the smallest integer type that fits; -1 for samples without a type).
+        self.cancer_type, codes = group_samples(types)
+        self.codes = codes.astype(np.int8 if len(self.cancer_type) < 128 else np.int32)
+
+        # The position of each type in self.cancer_type.
+        self.type_codes = {tumor: code for code, tumor in enumerate(self.cancer_type)}
+
+
+    def __len__(self):
+        """
+        Returns the number of samples.
+        """
+
+        return len(self.samples)
+
+
+    def sample_types(self):
+        """
+        Returns the type of each sample, as a categorical.
+        """
+
+        return pd.Categorical.from_codes(self.codes, categories=self.cancer_type)
+
+
+    def nbytes(self):
+        """
+        Returns the memory (in bytes) used by the expression values and the codes of the types.
+        """
+
+        return self.values.nbytes + self.codes.nbytes
+
+
+    def allele(self, allele):
+        """
+        Returns the expression of allele in every sample (a view of values, not a copy).
+
+        Args:
+            allele (str) - The name of the allele.
+
+        Return:
+            allele_data (Series) - The expression of the allele, named after it.
+        """
+
+        return pd.Series(self.values[:, self.alleles.get_loc(allele)], name=allele, copy=False)
+
+
+    def group_values(self, tumor_type, alleles = None):
+        """
+        Returns the expression values of the samples of tumor_type.
+
+        Args:
+            tumor_type (str) - The name of the tumor.
+
+            alleles (list) - The alleles to return. If no value is used then all of them are returned.
+
+        Return:
+            values (ndarray) - The expression values (samples of the tumor x alleles).
+                               Empty if the tumor is not in the dataset.
+        """
+
+        rows = self.codes == self.type_codes.get(tumor_type, -2) # -2 is never the code of a sample.
+
+        if alleles is None:
+            return self.values[rows]
+
+        return self.values[np.ix_(rows, self.alleles.get_indexer(alleles))]
+
+
+    def select_alleles(self, alleles):
+        """
+        Returns a new matrix with only the given alleles (in their order), e.g. the alleles shared with another dataset.
+
+        Args:
+            alleles (list / Index) - The alleles to keep (all of them must be alleles of the matrix).
+
+        Return:
+            matrix (ExpressionMatrix) - The same samples, with only the given alleles (a copy of their values).
+        """
+
+        positions = self.alleles.get_indexer(alleles)
+
+        if np.any(positions < 0): # Selecting a missing allele would silently read another one.
+            raise KeyError(f"Alleles not in the matrix: {list(pd.Index(alleles)[positions < 0][:5])}")
+
+        return ExpressionMatrix(self.values[:, positions], self.alleles[positions], self.samples, self.sample_types(), self.columns)
+
+
+    def to_frame(self):
+        """
+        Converts the matrix back into the DataFrame import_data returns (the samples, the types and the alleles as columns).
+        """
+
+        df = pd.DataFrame(self.values, columns=self.alleles, copy=False)
+        df.insert(0, self.columns[1], np.asarray(self.sample_types(), dtype=object))
+        df.insert(0, self.columns[0], self.samples)
+
+        return df
+
+
+def as_expression_matrix(df, dtype = None):
+
+    """
+    Returns df as an ExpressionMatrix (df itself if it already is one).
+
+    Args:
+        df (DataFrame / ExpressionMatrix) - Consists of the raw data of the file.
+
+        dtype (type) - The type of the expression values (e.g. np.float32 or np.float16).
+                       If no value is used then the type of the values of df is kept.
+
+    Return:
+        matrix (ExpressionMatrix) - The raw data of the file in compact form.
+    """
+
+    if isinstance(df, ExpressionMatrix):
+        if dtype is None or df.values.dtype == dtype:
+            return df
+
+        return ExpressionMatrix(df.values.astype(dtype), df.alleles, df.samples, df.sample_types(), df.columns)
+
+    # The first two columns of df are the samples and their types, and the rest are the alleles.
+    return ExpressionMatrix(df.iloc[:, 2:].to_numpy(dtype=dtype), df.columns[2:],
+                            df.iloc[:, 0].to_numpy(), df.iloc[:, 1].to_numpy(), df.columns[:2])
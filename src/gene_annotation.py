@@ -0,0 +1,247 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+
+try: # When src is on sys.path (as in the tests).
+    from expression_matrix import ExpressionMatrix, as_expression_matrix
+    from data_extraction import file_key, CACHE_DIRECTORY
+    from instrumentation import span, timed
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.expression_matrix import ExpressionMatrix, as_expression_matrix
+    from src.data_extraction import file_key, CACHE_DIRECTORY
+    from src.instrumentation import span, timed
+
+"""
+This code maps the Affymetrix probe IDs of the dataset (e.g. '1007_s_at', the alleles of the other modules)
+to the genes they measure, and collapses the probes of each gene into a single gene-level value
+(python main.py --annotation GPL570.annot --genes mean).
+
+The annotation is read from a local file of the platform of the dataset, e.g. the GEO annotation file
+GPL570.annot (or the table of its SOFT file), which has a probe ID column ('ID') and a gene symbol column
+('Gene symbol'). No annotation is bundled with the project: the file is downloaded once from GEO and passed
+with --annotation. The two columns are kept in a binary cache next to the file (as import_data does for the
+CSV file), so later runs skip parsing it. The lookups are hash tables in both directions (probe -> gene and
+gene -> probes, the genes regardless of case since user_interface lowercases its input).
+
+aggregate_genes collapses the probes of every gene at once: the probes are sorted by the code of their
+gene, so each gene is a contiguous run of columns, and the runs are reduced with np.add.reduceat (mean),
+np.maximum.reduceat (max) or by keeping the probe of each gene with the largest variance. The result is an
+ExpressionMatrix with a column for each gene, which clean_data and DataVisualization take as they take df.
+"""
+
+# The ways aggregate_genes collapses the probes of a gene.
+AGGREGATIONS = ('mean', 'max', 'most_variable')
+
+# The names the gene symbol column has in the annotation files of GEO.
+GENE_COLUMNS = ('Gene symbol', 'Gene Symbol', 'GENE_SYMBOL', 'Symbol', 'gene_symbol')
+
+# Separates the genes of probes that measure several genes (e.g. 'HLA-DQA1 /// HLA-DQA2').
+GENE_SEPARATOR = ' /// '
+
+
+class GeneAnnotation:
+    """
+    This class holds the gene of each probe and the probes of each gene.
+    """
+
+    def __init__(self, probes, genes):
+        """
+        Builds the lookups.
+
+        Args:
+           probes (list) - The probe IDs.
+
+           genes (list) - The gene symbol of each probe ('' or None for probes without a gene). Probes of several
+                          genes ('A /// B') are given the first one.
+        """
+
+        # The gene of each probe (only the probes that have one).
+        self.probe_genes = {}
+
+        # The probes of each gene, in the order of the file.
+        self.gene_probes = {}
+
+        for probe, gene in zip(probes, genes):
+            gene = gene.split(GENE_SEPARATOR)[0].strip() if isinstance(gene, str) else ''
+            if not gene:
+                continue
+
+            self.probe_genes[probe] = gene
+            self.gene_probes.setdefault(gene, []).append(probe)
+
+        # The symbol of each gene by its lowercase name.
+        self.symbols = {gene.lower(): gene for gene in self.gene_probes}
+
+
+    def __len__(self):
+        """
+        Returns the number of probes that have a gene.
+        """
+
+        return len(self.probe_genes)
+
+
+    def gene(self, probe):
+        """
+        Returns the gene symbol of probe (None if it has none).
+        """
+
+        return self.probe_genes.get(probe)
+
+
+    def symbol(self, name):
+        """
+        Returns the gene symbol whose name is name, regardless of case (None if there is no such gene).
+        """
+
+        return self.symbols.get(str(name).lower())
+
+
+    def probes(self, gene):
+        """
+        Returns the probes of gene (regardless of case). Empty if there is no such gene.
+        """
+
+        return list(self.gene_probes.get(self.symbol(gene), []))
+
+
+def load_annotation(path, cache_directory = None):
+
+    """
+    Loads the annotation of the probes from a local annotation file of the platform (e.g. GPL570.annot).
+
+    Args:
+        path (str) - The path of the annotation file (tab separated, with an 'ID' and a gene symbol column,
+                     after any header lines starting with '#', '!' or '^').
+
+        cache_directory (str) - The directory of the binary cache. If no value is used then the cache is
+                                placed next to the file (in data_extraction.CACHE_DIRECTORY).
+
+    Return:
+        annotation (GeneAnnotation) - The annotation. None if the file does not exist or has no such columns.
+    """
+
+    if not os.path.exists(path):
+        print(f"\nThe annotation file {path} was not found. Download the annotation of the platform (e.g. GPL570.annot) from GEO.")
+        return None
+
+    key = file_key(path)
+    cache_path = os.path.join(cache_directory or os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIRECTORY),
+                              f"{os.path.basename(path)}.json")
+
+    # The probe and gene columns of the file, from the cache if the file has not changed since it was written.
+    if os.path.exists(cache_path):
+        with open(cache_path, encoding='utf-8') as cache_file:
+            cached = json.load(cache_file)
+
+        if cached.get('key') == key:
+            with span('load_annotation_cache'):
+                return GeneAnnotation(cached['probes'], cached['genes'])
+
+    with span('parse_annotation'):
+        columns = read_annotation_columns(path)
+
+    if columns is None:
+        print(f"\nThe annotation file {path} has no 'ID' and gene symbol columns.")
+        return None
+
+    probes, genes = columns
+
+    # Written under a temporary name and then renamed, so that an interrupted run never leaves a half written cache.
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(f"{cache_path}.tmp", 'w', encoding='utf-8') as cache_file:
+        json.dump({'key': key, 'probes': probes, 'genes': genes}, cache_file)
+    os.replace(f"{cache_path}.tmp", cache_path)
+
+    return GeneAnnotation(probes, genes)
+
+
+def read_annotation_columns(path):
+
+    """
+    Reads the probe IDs and the gene symbols of an annotation file.
+
+    Return:
+        probes, genes (list) - The probe ID and the gene symbol ('' if none) of each row. None if the file has no such columns.
+    """
+
+    # The number of header lines before the table (comments of .annot files, and the headers of SOFT files).
+    with open(path, encoding='utf-8', errors='replace') as annotation_file:
+        skipped, line = 0, ''
+        for line in annotation_file:
+            if not line.startswith(('#', '!', '^')):
+                break
+            skipped += 1
+
+        header = line.rstrip('\r\n').split('\t')
+
+    gene_column = next((column for column in GENE_COLUMNS if column in header), None)
+
+    if 'ID' not in header or gene_column is None:
+        return None
+
+    # Only the two columns are parsed (the files have many long columns), and as strings.
+    table = pd.read_csv(path, sep='\t', skiprows=skipped, usecols=['ID', gene_column], dtype=str,
+                        keep_default_na=False, encoding_errors='replace')
+
+    # Leaving out the footer of SOFT files ('!platform_table_end').
+    table = table[~table['ID'].str.startswith(('#', '!', '^'))]
+
+    return table['ID'].tolist(), table[gene_column].tolist()
+
+
+@timed('aggregate_genes')
+def aggregate_genes(df, annotation, method = 'mean'):
+
+    """
+    Collapses the probes of each gene into a single value for each sample.
+
+    Args:
+        df (DataFrame / ExpressionMatrix) - Consists of the raw data of the file (a column for each probe).
+
+        annotation (GeneAnnotation) - The gene of each probe.
+
+        method (str) - 'mean' (the mean of the probes), 'max' (the largest of the probes) or 'most_variable'
+                       (the probe with the largest variance across the samples). If no value is used
+                       (or an invalid one) then baseline is 'mean'.
+
+    Return:
+        genes (ExpressionMatrix) - The raw data with a column for each gene (in order of the first appearance of
+                                   its probes). The probes without a gene are left out. None if no probe has a gene.
+    """
+
+    matrix = as_expression_matrix(df)
+
+    if method not in AGGREGATIONS: # In case the programmer has inserted an invalid method.
+        method = 'mean'
+        print(f"\nInserted aggregation is invalid (choose one of: {', '.join(AGGREGATIONS)}). Baseline aggregation (mean) was used instead.")
+
+    # The code of the gene of each probe (-1 for probes without a gene), in order of first appearance.
+    codes, genes = pd.factorize(pd.Series([annotation.gene(probe) for probe in matrix.alleles], dtype=object))
+
+    if len(genes) == 0:
+        print('\nNone of the probes of the dataset has a gene in the annotation.')
+        return None
+
+    # The probes sorted by their gene (keeping their order within a gene), so each gene is a contiguous run.
+    mapped = np.flatnonzero(codes >= 0)
+    order = mapped[np.argsort(codes[mapped], kind='stable')]
+    starts = np.flatnonzero(np.r_[True, np.diff(codes[order]) != 0])
+
+    with span('reduce', method=method):
+        if method == 'mean':
+            sizes = np.diff(np.r_[starts, len(order)])
+            values = np.add.reduceat(matrix.values[:, order], starts, axis=1, dtype=np.float64) / sizes
+
+        elif method == 'max':
+            values = np.maximum.reduceat(matrix.values[:, order], starts, axis=1)
+
+        else: # The probe of each gene with the largest variance (the first of them if several are equal).
+            variances = matrix.values[:, order].var(axis=0, dtype=np.float64)
+            ranked = np.lexsort((-variances, codes[order]))
+            chosen = order[ranked[np.r_[0, np.flatnonzero(np.diff(codes[order][ranked]) != 0) + 1]]]
+            values = matrix.values[:, chosen]
+
+    return ExpressionMatrix(values.astype(matrix.values.dtype, copy=False), pd.Index(genes), matrix.samples,
+                            matrix.sample_types(), matrix.columns)
@@ -0,0 +1,180 @@
+from scipy.special import fdtrc
+import pandas as pd
+import numpy as np
+
+try: # When src is on sys.path (as in the tests).
+    from allele_table import sparse_allele_table
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.allele_table import sparse_allele_table
+
+"""
+This code computes the statistics clean_data needs for all the alleles at once.
+
+Instead of masking the samples of every tumor (and of the normal tissue) again for each tumor
+and each allele, the samples are grouped by their type once, and the count, mean and sum of
+squared deviations of every allele in every group are computed with a single NumPy reduction.
+These are sufficient statistics for the ANOVA, so the F and P values of all the alleles
+are then derived from them directly.
+"""
+
+def group_samples(types):
+
+    """
+    Groups the samples by their type.
+
+    Args:
+        types (Series / array) - The type of each sample (the 'type' column of df).
+
+    Return:
+        cancer_type (list) - The types of each brain tumor, in order of first appearance (as unique() returns them).
+
+        codes (ndarray) - The position in cancer_type of the type of each sample.
+    """
+
+    codes, uniques = pd.factorize(np.asarray(types))
+
+    return list(uniques), codes
+
+
+def sufficient_statistics(values, codes, num_groups):
+
+    """
+    Computes the count, mean and sum of squared deviations from the mean of every allele in every group.
+
+    Args:
+        values (ndarray) - The expression values (samples x alleles).
+
+        codes (ndarray) - The group of each sample (as returned by group_samples).
+
+        num_groups (int) - The number of groups.
+
+    Return:
+        counts (ndarray) - The number of samples in each group (groups).
+
+        means (ndarray) - The mean expression of each allele in each group (groups x alleles).
+
+        squares (ndarray) - The sum of squared deviations from the mean of each allele in each group (groups x alleles).
+    """
+
+    values = np.asarray(values)
+    codes = np.asarray(codes)
+
+    if np.any(codes < 0): # Samples without a type (coded -1 by group_samples) do not belong to any group.
+        values, codes = values[codes >= 0], codes[codes >= 0]
+
+    counts = np.bincount(codes, minlength=num_groups)
+    means = np.zeros((num_groups, values.shape[1]))
+    squares = np.zeros((num_groups, values.shape[1]))
+
+    present = np.flatnonzero(counts) # Groups without samples keep a count, mean and sum of zero.
+    if len(present) == 0:
+        return counts, means, squares
+
+    # Sorting the samples by their group once, so that every group is a contiguous block of rows.
+    order = np.argsort(codes, kind='stable')
+    sorted_values = values[order].astype(np.float64, copy=False)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[present] # The first row of each group.
+
+    means[present] = np.add.reduceat(sorted_values, starts, axis=0) / counts[present, None]
+
+    deviations = sorted_values - np.repeat(means[present], counts[present], axis=0)
+    squares[present] = np.add.reduceat(deviations ** 2, starts, axis=0)
+
+    return counts, means, squares
+
+
+def anova_from_statistics(counts, means, squares, group, control):
+
+    """
+    Computes the one-way ANOVA between two groups (the same test as f_oneway(group_data, control_data))
+    for all the alleles at once.
+
+    Args:
+        counts, means, squares (ndarray) - The statistics of the groups (as returned by sufficient_statistics).
+
+        group (int) - The index of the tested group (for example a tumor).
+
+        control (int) - The index of the control group (the normal tissue).
+
+    Return:
+        f_statistics (ndarray) - The F value of each allele.
+
+        p_values (ndarray) - The P value of each allele (NaN where the test is undefined).
+    """
+
+    group_count, control_count = counts[group], counts[control]
+    total_count = group_count + control_count
+
+    with np.errstate(divide='ignore', invalid='ignore'): # Constant alleles give 0/0 (NaN) or x/0 (inf), as in f_oneway.
+
+        grand_means = (group_count * means[group] + control_count * means[control]) / total_count
+
+        # Variance between the groups (1 degree of freedom) and within the groups (total_count - 2 degrees of freedom).
+        between = group_count * (means[group] - grand_means) ** 2 + control_count * (means[control] - grand_means) ** 2
+        within = (squares[group] + squares[control]) / (total_count - 2)
+
+        f_statistics = between / within
+
+    p_values = fdtrc(1, total_count - 2, f_statistics)
+
+    return f_statistics, p_values
+
+
+def tumor_anova(values, codes, num_groups, control):
+
+    """
+    Computes the ANOVA of every group against the control group, for all the alleles at once.
+
+    Args:
+        values (ndarray) - The expression values (samples x alleles).
+
+        codes (ndarray) - The group of each sample (as returned by group_samples).
+
+        num_groups (int) - The number of groups.
+
+        control (int) - The index of the control group (the normal tissue).
+
+    Return:
+        counts (ndarray) - The number of samples in each group (groups).
+
+        means (ndarray) - The mean expression of each allele in each group (groups x alleles).
+
+        p_values (ndarray) - The P value of each allele in each group (groups x alleles). NaN for 
+                             groups with less than two samples, which cannot be tested.
+    """
+
+    counts, means, squares = sufficient_statistics(values, codes, num_groups)
+    p_values = np.full(means.shape, np.nan)
+
+    for group in range(num_groups):
+        if counts[group] > 1 and counts[control] > 0:
+            p_values[group] = anova_from_statistics(counts, means, squares, group, control)[1]
+
+    return counts, means, p_values
+
+
+def build_allele_table(alleles, rows, sparse = False):
+
+    """
+    Builds the table clean_data returns out of the significant alleles of each tumor.
+
+    The layout is the one pd.DataFrame.from_dict(dict_alleles, orient='index') gives: a column for every
+    allele that is significant in at least one tumor (in order of first appearance), and a row for every
+    tumor that has at least one significant allele (ordered by its first column, as from_dict builds the
+    index column by column), with NaN everywhere else.
+
+    Args:
+        alleles (Index) - The names of all the alleles in the dataset.
+
+        rows (list) - A (tumor, indexes, values) tuple for each tumor, where indexes are the positions
+                      (in alleles) of its significant alleles and values are their mean expressions.
+
+        sparse (bool) - Whether to return the table in sparse form (see allele_table.py). Baseline is False.
+
+    Return:
+        data (DataFrame / AlleleTable) - Contains solely the mean expression of each significant allele of each tumor.
+    """
+
+    table = sparse_allele_table(alleles, rows)
+
+    return table if sparse else table.to_frame()
@@ -0,0 +1,401 @@
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+
+try: # When src is on sys.path (as in the tests).
+    from data_extraction import (CACHE_DIRECTORY, csv_path, read_header, read_expression_csv, clean_data,
+                                 validate_critical_alpha, validate_test, tabulate_significant_alleles, parse_expression_rows,
+                                 file_key, write_cache, extend_cache, write_atomically)
+    from group_statistics import group_samples, sufficient_statistics, anova_from_statistics
+    from statistical_tests import welch_from_statistics
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.data_extraction import (CACHE_DIRECTORY, csv_path, read_header, read_expression_csv, clean_data,
+                                     validate_critical_alpha, validate_test, tabulate_significant_alleles, parse_expression_rows,
+                                     file_key, write_cache, extend_cache, write_atomically)
+    from src.group_statistics import group_samples, sufficient_statistics, anova_from_statistics
+    from src.statistical_tests import welch_from_statistics
+
+"""
+This code keeps the per-type statistics of the CSV file (the count, mean and sum of squared deviations
+of every allele in every type) in a store next to the data, so that when new samples are appended to the
+file, only the new rows are read and merged into the statistics, instead of analysing the whole file again.
+
+The store remembers where in the file the samples it has seen end. An update reads the file from there,
+computes the statistics of the new rows, and merges them with the stored ones (with the pairwise formula
+of Chan et al., which stays accurate where sums of squares would lose precision). The table of significant
+alleles is then derived from the statistics alone, so this works for the tests that only depend on them
+('anova' and 'welch'). verify_statistics recomputes everything from scratch and compares the results.
+
+Samples must be appended as whole lines at the end of the file; if anything before the end of the
+samples already seen is changed, the store is rebuilt from the whole file. The store keeps a hash of every
+byte it has seen, so any such change is noticed (hashing the file is much faster than parsing it).
+
+The rows read by an update are also written to (or appended to) the binary copy of the file that import_data
+loads (see data_extraction.py), so that loading the samples afterwards (as main.py does for the user
+interface) does not parse the whole file again because it was appended to.
+"""
+
+# The tests whose P values only depend on the statistics of the groups.
+INCREMENTAL_TESTS = ('anova', 'welch')
+
+# The number of bytes of the file hashed at a time.
+_HASHED_BLOCK = 1024 ** 2
+
+
+def update_statistics(csv_name, cache_directory = None):
+
+    """
+    Brings the statistics store of the CSV file up to date, reading only the samples appended since the last update
+    (or the whole file if there is no store yet, or if the file was changed rather than appended to).
+
+    Args:
+        csv_name (str) - The name of the CSV file.
+
+        cache_directory (str) - The directory of the store (and of the binary copy of the file). If no value is
+                                used then they are placed next to the CSV file (in CACHE_DIRECTORY).
+
+    Return:
+        store (dict) - The statistics: 'alleles', 'cancer_type', 'counts', 'means', 'squares', 'rows' (the number
+                       of samples), 'offset' (the position in the file where they end) and 'key' (the file_key of
+                       the file when it ended there, None otherwise). None if the file is missing.
+    """
+
+    try:
+        excel_directory = csv_path(csv_name)
+    except FileNotFoundError: # If the name cannot be the name of a file (e.g. None).
+        excel_directory = None
+
+    if excel_directory is None or not os.path.exists(excel_directory): # If the excel file is not in the same directory as the code.
+        print(f"\nError: File {csv_name} not found. Ensure the file is in the correct directory.")
+        return
+
+    store_path = _store_path(excel_directory, cache_directory)
+    store = load_statistics(store_path)
+
+    # The hash of the part of the file already seen, continued below with the new samples.
+    hasher = None if store is None else _seen_part_hash(excel_directory, store)
+
+    if store is not None and hasher is None:
+        print("\nThe CSV file was changed (not only appended to). Its statistics are computed again.")
+        store = None
+
+    if store is None: # The whole file is read once.
+        rows = read_expression_csv(excel_directory)
+        store = {'alleles': np.asarray(rows.columns[2:], dtype=str), 'cancer_type': [],
+                 'counts': np.zeros(0, dtype=np.int64), 'means': np.zeros((0, rows.shape[1] - 2)),
+                 'squares': np.zeros((0, rows.shape[1] - 2)), 'rows': 0, 'key': None}
+        offset = os.path.getsize(excel_directory)
+        hasher, start = None, 0
+
+    else: # Only the new rows are read.
+        rows, offset = read_new_samples(excel_directory, store)
+        start = store['offset']
+
+    if len(rows) > 0:
+        merge_samples(store, rows.iloc[:, 1], rows.iloc[:, 2:].to_numpy())
+
+    previous_key, key = store['key'], file_key(excel_directory)
+
+    # The binary copy of the file is brought up to date with the rows just read, if they are all the file holds
+    # (a last line still being written is left for the next update). When the store is rebuilt, the copy is written
+    # anew; otherwise it is extended if it is of the version of the file the store saw last.
+    if key['size'] != offset:
+        key = None
+    elif start == 0:
+        write_cache(rows, excel_directory, cache_directory)
+    elif previous_key is not None:
+        extend_cache(excel_directory, previous_key, rows, cache_directory)
+
+    store['offset'] = offset
+    store['key'] = key
+    store['checksum'] = _hash_file(excel_directory, start, offset, hasher).hexdigest()
+
+    save_statistics(store, store_path)
+
+    return store
+
+
+def read_new_samples(excel_directory, store):
+
+    """
+    Reads the samples appended to the CSV file after store['offset'].
+
+    Return:
+        rows (DataFrame) - The new samples: their names, their types and their expression values (as EXPRESSION_DTYPE),
+                           in columns numbered as in the file.
+
+        offset (int) - The position in the file where the new samples end.
+    """
+
+    with open(excel_directory, 'rb') as excel_file:
+        excel_file.seek(store['offset'])
+        new_rows = excel_file.read()
+
+    # A last line without its end of line may still be being written, so it is left for the next update.
+    new_rows = new_rows[:new_rows.rfind(b'\n') + 1]
+
+    if not new_rows.strip(): # Nothing was appended.
+        return pd.DataFrame(columns=range(len(store['alleles']) + 2)), store['offset']
+
+    # As in read_expression_csv, the alleles are parsed with a single dtype and the first two columns on their own.
+    return parse_expression_rows(new_rows, header=False), store['offset'] + len(new_rows)
+
+
+def merge_samples(store, types, values):
+
+    """
+    Merges the statistics of new samples into the store (in place).
+
+    Args:
+        store (dict) - The statistics (as returned by update_statistics).
+
+        types (Series / array) - The type of each new sample.
+
+        values (ndarray) - The expression values of the new samples (samples x alleles).
+    """
+
+    # The types of the new samples, in order of first appearance; the ones seen for the first time are added at the end.
+    new_types, new_codes = group_samples(types)
+    for tumor in new_types:
+        if tumor not in store['cancer_type']:
+            store['cancer_type'].append(tumor)
+
+    num_groups = len(store['cancer_type'])
+    # (The -1 at the end keeps the samples without a type, coded -1, out of every group.)
+    codes = np.array([store['cancer_type'].index(tumor) for tumor in new_types] + [-1])[new_codes]
+
+    # The statistics of the new samples.
+    new_counts, new_means, new_squares = sufficient_statistics(values, codes, num_groups)
+
+    # Types seen for the first time start with no samples.
+    missing = num_groups - len(store['counts'])
+    counts = np.concatenate((store['counts'], np.zeros(missing, dtype=np.int64)))
+    means = np.concatenate((store['means'], np.zeros((missing, values.shape[1]))))
+    squares = np.concatenate((store['squares'], np.zeros((missing, values.shape[1]))))
+
+    store['counts'], store['means'], store['squares'] = merge_statistics(counts, means, squares, new_counts, new_means, new_squares)
+    store['rows'] += len(types)
+
+
+def merge_statistics(counts, means, squares, new_counts, new_means, new_squares):
+
+    """
+    Merges the statistics of two sets of samples of the same groups (Chan et al.'s pairwise formula).
+
+    Args:
+        counts, means, squares (ndarray) - The statistics of the first set (as returned by sufficient_statistics).
+
+        new_counts, new_means, new_squares (ndarray) - The statistics of the second set.
+
+    Return:
+        counts, means, squares (ndarray) - The statistics of both sets together.
+    """
+
+    total_counts = counts + new_counts
+
+    with np.errstate(divide='ignore', invalid='ignore'): # Groups without samples in either set give 0/0.
+        weights = np.where(total_counts > 0, new_counts / total_counts, 0)[:, None]
+
+    deltas = new_means - means
+
+    merged_means = means + deltas * weights
+    merged_squares = squares + new_squares + deltas ** 2 * (counts[:, None] * weights)
+
+    return total_counts, merged_means, merged_squares
+
+
+def incremental_clean_data(csv_name, critical_alpha = 0.01, test = 'anova', correction = None, cache_directory = None):
+
+    """
+    Gives the same data as clean_data(import_data(csv_name), ...), from the statistics store
+    (updated first with the samples appended since the last run).
+
+    Args:
+        csv_name (str) - The name of the CSV file.
+
+        critical_alpha (float) - Significance threshold for identifying significant alleles. Baseline is 0.01.
+
+        test (str) - 'anova' or 'welch' (the tests that only depend on the statistics). Baseline is 'anova'.
+
+        correction (str) - The correction of the P values (as in clean_data). Baseline is None.
+
+        cache_directory (str) - The directory of the store. If no value is used then it is next to the CSV file.
+
+    Return:
+        data (DataFrame) - Contains solely the mean expression of each allele that
+                           had a significant effect over the normal tissue.
+    """
+
+    critical_alpha = validate_critical_alpha(critical_alpha)
+    test, correction = validate_test(test, correction)
+
+    if test not in INCREMENTAL_TESTS: # The other tests need every sample, not only the statistics.
+        print(f"\nThe {test} test cannot be updated incrementally. Baseline test (anova) was used instead.")
+        test = 'anova'
+
+    store = update_statistics(csv_name, cache_directory)
+
+    if store is None:
+        return
+
+    if store['rows'] == 0: # If excel file is empty.
+        print('\nCSV file is empty. Please add info.')
+        return
+
+    return table_from_statistics(store, critical_alpha, test, correction)
+
+
+def table_from_statistics(store, critical_alpha = 0.01, test = 'anova', correction = None):
+
+    """
+    Derives the table of significant alleles (as clean_data returns it) from the statistics of the store.
+    """
+
+    cancer_type, counts, means, squares = store['cancer_type'], store['counts'], store['means'], store['squares']
+    alleles = pd.Index(store['alleles'])
+
+    if 'normal' not in cancer_type: # There is no control group to compare the tumors with.
+        return tabulate_significant_alleles(alleles, cancer_type, None, None, None, critical_alpha)
+
+    normal = cancer_type.index('normal')
+    p_values = np.full(means.shape, np.nan)
+
+    for group in range(len(cancer_type)):
+        if counts[group] > 1 and counts[normal] > 0:
+            if test == 'welch':
+                p_values[group] = welch_from_statistics(counts, means, squares, group, normal)
+            else:
+                p_values[group] = anova_from_statistics(counts, means, squares, group, normal)[1]
+
+    return tabulate_significant_alleles(alleles, cancer_type, counts, means, p_values, critical_alpha, correction)
+
+
+def verify_statistics(csv_name, critical_alpha = 0.01, test = 'anova', correction = None, cache_directory = None):
+
+    """
+    Checks that the incrementally updated results are the same as analysing the whole file from scratch:
+    the same significant alleles in every tumor, and the same statistics (up to rounding).
+
+    Return:
+        identical (bool) - Whether the results are the same. None if the file is missing.
+    """
+
+    incremental = incremental_clean_data(csv_name, critical_alpha, test, correction, cache_directory)
+    if incremental is None:
+        return
+
+    store = load_statistics(_store_path(csv_path(csv_name), cache_directory))
+
+    # The whole file, analysed from scratch.
+    df = read_expression_csv(csv_path(csv_name))
+    full = clean_data(df, critical_alpha, test=test if test in INCREMENTAL_TESTS else 'anova', correction=correction)
+
+    cancer_type, codes = group_samples(df['type'])
+    counts, means, squares = sufficient_statistics(df.iloc[:, 2:].to_numpy(), codes, len(cancer_type))
+
+    same_types = cancer_type == store['cancer_type'] and np.array_equal(counts, store['counts'])
+    same_alleles = (list(incremental.index) == list(full.index) and list(incremental.columns) == list(full.columns) and
+                    np.allclose(incremental.to_numpy(), full.to_numpy(), rtol=1e-9, atol=0, equal_nan=True))
+
+    if same_types:
+        mean_error = np.max(np.abs(means - store['means']), initial=0)
+        square_error = np.max(np.abs(squares - store['squares']) / np.maximum(np.abs(squares), 1), initial=0)
+    else:
+        mean_error = square_error = np.inf
+
+    identical = same_types and same_alleles and mean_error < 1e-9 and square_error < 1e-9
+
+    print(f"\nSamples: {store['rows']} ({df.shape[0]} in the file). Types and counts match: {same_types}. "
+          f"Significant alleles match: {same_alleles}.")
+    print(f"Largest difference of the means: {mean_error:.3g}, of the sums of squared deviations (relative): {square_error:.3g}.")
+    print("The incremental results are identical to a full recompute." if identical else
+          "The incremental results DIFFER from a full recompute.")
+
+    return identical
+
+
+def load_statistics(store_path):
+
+    """
+    Loads the statistics store, or returns None if there is none.
+    """
+
+    if not os.path.exists(store_path):
+        return None
+
+    with np.load(store_path, allow_pickle=False) as arrays:
+        return {'alleles': arrays['alleles'], 'cancer_type': arrays['cancer_type'].tolist(),
+                'counts': arrays['counts'], 'means': arrays['means'], 'squares': arrays['squares'],
+                'rows': int(arrays['rows']), 'offset': int(arrays['offset']), 'checksum': str(arrays['checksum']),
+                # (Stores written before the key was kept have none, so their binary copy is not extended.)
+                'key': json.loads(str(arrays['key'])) if 'key' in arrays else None}
+
+
+def save_statistics(store, store_path):
+
+    """
+    Saves the statistics store (written under a temporary name of its own and then renamed, as write_cache does).
+    """
+
+    os.makedirs(os.path.dirname(store_path), exist_ok=True)
+
+    write_atomically(store_path, lambda store_file: np.savez(
+        store_file, alleles=store['alleles'], cancer_type=np.asarray(store['cancer_type'], dtype=str),
+        counts=store['counts'], means=store['means'], squares=store['squares'], rows=store['rows'],
+        offset=store['offset'], checksum=store['checksum'], key=json.dumps(store['key'])))
+
+
+def _store_path(excel_directory, cache_directory = None):
+
+    """
+    Returns the path of the statistics store of the CSV file.
+    """
+
+    if cache_directory is None:
+        cache_directory = os.path.join(os.path.dirname(os.path.abspath(excel_directory)), CACHE_DIRECTORY)
+
+    name = os.path.splitext(os.path.basename(excel_directory))[0]
+
+    return os.path.join(cache_directory, f"{name}.statistics.npz")
+
+
+def _hash_file(excel_directory, start, end, hasher = None):
+
+    """
+    Returns a SHA-256 hasher of the bytes of the CSV file from start to end (continuing hasher, if one is given).
+    """
+
+    hasher = hashlib.sha256() if hasher is None else hasher
+
+    with open(excel_directory, 'rb') as excel_file:
+        excel_file.seek(start)
+
+        while start < end:
+            block = excel_file.read(min(_HASHED_BLOCK, end - start))
+            if not block: # The file is shorter than end.
+                break
+
+            hasher.update(block)
+            start += len(block)
+
+    return hasher
+
+
+def _seen_part_hash(excel_directory, store):
+
+    """
+    Returns the hasher of the part of the CSV file the store has seen if that part is still the same (so the file
+    was only appended to), or None if it was changed.
+    """
+
+    if os.path.getsize(excel_directory) < store['offset']:
+        return None
+
+    if list(read_header(excel_directory)[2:]) != list(store['alleles']):
+        return None
+
+    hasher = _hash_file(excel_directory, 0, store['offset'])
+
+    return hasher if hasher.hexdigest() == store['checksum'] else None
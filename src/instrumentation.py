@@ -0,0 +1,313 @@
+import cProfile
+import pstats
+import threading
+import tracemalloc
+import time
+import functools
+import json
+import io
+
+"""
+This code measures where the time (and optionally the memory) of a run goes (python main.py --profile).
+
+The stages of import_data, clean_data and DataVisualization are wrapped in spans (with span('name'): ...,
+or @timed('name') for a whole function) and count how often things happen (count('name', value)). While instrumentation is disabled, which is the
+baseline, span() returns a shared object that does nothing and count() returns at once, so the cost of the
+hooks is a function call. Once enabled, every span records its calls and time (and, with memory=True,
+the peak memory traced by tracemalloc while it ran), spans opened inside other spans are recorded under
+their path (e.g. 'clean_data/tests'), and a cProfile capture of the whole run can be added (profile=True).
+The results can be printed as a table (summary_table) or exported as JSON (export_json).
+"""
+
+# The recorder of the current run (None while instrumentation is disabled).
+_recorder = None
+
+
+class _Recorder:
+    """
+    This class collects the spans, the counters and the profile of a run.
+    """
+
+    def __init__(self, memory = False, profile = False):
+        """
+        Starts the recording (and tracemalloc and cProfile, if requested).
+        """
+
+        self.memory = memory
+        self.started = time.perf_counter()
+
+        # The statistics of the spans and the values of the counters, by (path, labels).
+        self.spans = {}
+        self.counters = {}
+
+        self.lock = threading.Lock()
+        self.local = threading.local() # The stack of open spans of each thread.
+
+        self.started_tracemalloc = memory and not tracemalloc.is_tracing()
+        if self.started_tracemalloc:
+            tracemalloc.start()
+
+        self.profiler = cProfile.Profile() if profile else None
+        if self.profiler is not None:
+            self.profiler.enable()
+
+
+    def stack(self):
+        """
+        Returns the stack of the spans open in this thread.
+        """
+
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+
+        return self.local.stack
+
+
+    def stop(self):
+        """
+        Stops tracemalloc and cProfile (if this recorder started them).
+        """
+
+        if self.profiler is not None:
+            self.profiler.disable()
+
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+
+
+class _Span:
+    """
+    This class is one span of a stage (used as a context manager).
+    """
+
+    def __init__(self, recorder, name, labels):
+        self.recorder = recorder
+        self.name = name
+        self.labels = labels
+
+
+    def __enter__(self):
+        stack = self.recorder.stack()
+        self.path = '/'.join([span.name for span in stack] + [self.name])
+
+        if self.recorder.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack: # The peak so far belongs to the enclosing span, which keeps it before it is reset.
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.start_memory, self.peak = current, current
+
+        stack.append(self)
+        self.start = time.perf_counter()
+
+        return self
+
+
+    def __exit__(self, *exception):
+        seconds = time.perf_counter() - self.start
+        stack = self.recorder.stack()
+        stack.pop()
+
+        memory = None
+        if self.recorder.memory:
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            memory = self.peak - self.start_memory # The most memory allocated at once while the span ran.
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, self.peak)
+
+        key = (self.path, tuple(sorted(self.labels.items())))
+
+        with self.recorder.lock:
+            statistics = self.recorder.spans.setdefault(key, {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'peak_bytes': None})
+            statistics['calls'] += 1
+            statistics['seconds'] += seconds
+            statistics['max_seconds'] = max(statistics['max_seconds'], seconds)
+            if memory is not None:
+                statistics['peak_bytes'] = max(statistics['peak_bytes'] or 0, memory)
+
+        return False # Exceptions are not swallowed.
+
+
+class _NoSpan:
+    """
+    This class is the span used while instrumentation is disabled: it does nothing.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def enable_instrumentation(memory = False, profile = False):
+
+    """
+    Starts recording spans and counters (replacing any earlier recording).
+
+    Args:
+        memory (bool) - Whether to record the peak memory of every span with tracemalloc (slows the run down).
+
+        profile (bool) - Whether to capture a cProfile profile of the run as well.
+    """
+
+    global _recorder
+
+    disable_instrumentation()
+    _recorder = _Recorder(memory, profile)
+
+
+def disable_instrumentation():
+
+    """
+    Stops recording, and returns the report of the recording (None if nothing was recorded).
+    """
+
+    global _recorder
+
+    if _recorder is None:
+        return None
+
+    result = report()
+    _recorder.stop()
+    _recorder = None
+
+    return result
+
+
+def is_enabled():
+
+    """
+    Returns whether spans and counters are being recorded.
+    """
+
+    return _recorder is not None
+
+
+def span(name, **labels):
+
+    """
+    Returns a context manager that records the time (and memory) of the stage inside it.
+
+    Args:
+        name (str) - The name of the stage.
+
+        labels - Details that tell spans of the same stage apart (e.g. tumor='glioblastoma').
+    """
+
+    if _recorder is None:
+        return _NO_SPAN
+
+    return _Span(_recorder, name, labels)
+
+
+def timed(name):
+
+    """
+    Returns a decorator that runs the whole function in a span named name.
+    """
+
+    def decorator(function):
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _recorder is None: # Disabled: the function is called as it is.
+                return function(*args, **kwargs)
+
+            with _Span(_recorder, name, {}):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name, value = 1, **labels):
+
+    """
+    Adds value to the counter name (e.g. the number of probes tested).
+    """
+
+    if _recorder is None:
+        return
+
+    key = (name, tuple(sorted(labels.items())))
+
+    with _recorder.lock:
+        _recorder.counters[key] = _recorder.counters.get(key, 0) + value
+
+
+def report(top_functions = 25):
+
+    """
+    Returns the recording so far as a dict: 'spans', 'counters', the total 'seconds' and, with cProfile, the
+    top_functions functions with the most cumulative time in 'profile'. None if instrumentation is disabled.
+    """
+
+    if _recorder is None:
+        return None
+
+    with _recorder.lock:
+        spans = [dict(path=path, labels=dict(labels), **statistics) for (path, labels), statistics in _recorder.spans.items()]
+        counters = [{'name': name, 'labels': dict(labels), 'value': value} for (name, labels), value in _recorder.counters.items()]
+
+    result = {'seconds': time.perf_counter() - _recorder.started, 'spans': spans, 'counters': counters}
+
+    if _recorder.profiler is not None:
+        output = io.StringIO()
+        _recorder.profiler.disable()
+        pstats.Stats(_recorder.profiler, stream=output).sort_stats('cumulative').print_stats(top_functions)
+        _recorder.profiler.enable()
+        result['profile'] = output.getvalue()
+
+    return result
+
+
+def summary_table(result = None):
+
+    """
+    Formats a report (the current one if no value is used) as a table of the spans and the counters.
+    """
+
+    result = result if result is not None else report()
+
+    if result is None:
+        return 'Instrumentation is disabled.'
+
+    lines = [f"{'stage':<48} {'calls':>7} {'total s':>10} {'max s':>10} {'peak MB':>9}"]
+
+    for statistics in sorted(result['spans'], key=lambda statistics: (statistics['path'], str(statistics['labels']))):
+        labels = ', '.join(f"{key}={value}" for key, value in statistics['labels'].items())
+        stage = statistics['path'] + (f" [{labels}]" if labels else '')
+        peak = '' if statistics['peak_bytes'] is None else f"{statistics['peak_bytes'] / 1024 ** 2:.1f}"
+
+        lines.append(f"{stage:<48} {statistics['calls']:>7} {statistics['seconds']:>10.4f} {statistics['max_seconds']:>10.4f} {peak:>9}")
+
+    if result['counters']:
+        lines.append('')
+        lines.append(f"{'counter':<48} {'value':>7}")
+        for counter in sorted(result['counters'], key=lambda counter: (counter['name'], str(counter['labels']))):
+            labels = ', '.join(f"{key}={value}" for key, value in counter['labels'].items())
+            lines.append(f"{counter['name'] + (f' [{labels}]' if labels else ''):<48} {counter['value']:>7}")
+
+    lines.append(f"\nTotal: {result['seconds']:.3f} s")
+
+    if 'profile' in result:
+        lines.append(result['profile'])
+
+    return '\n'.join(lines)
+
+
+def export_json(path, result = None):
+
+    """
+    Writes a report (the current one if no value is used) to a JSON file.
+    """
+
+    result = result if result is not None else report()
+
+    with open(path, 'w', encoding='utf-8') as output_file:
+        json.dump(result, output_file, indent=2, default=str)
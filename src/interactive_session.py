@@ -0,0 +1,241 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import sys
+import queue
+import time
+
+try: # When src is on sys.path (as in the tests).
+    from data_visualization import print_suggestions
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.data_visualization import print_suggestions
+
+"""
+This code runs the user interface of DataVisualization without blocking it (python main.py --session).
+
+The session is driven by a single queue of events: the lines the user types (read by a background thread,
+so the next query can be typed while the previous one is computing) and the analyses that finished
+(computed by a pool of worker threads). The main thread only takes the next event from the queue and
+either dispatches a query or shows a result, and the plots are shown without blocking, so there is never
+more than one level of calls however many queries or invalid entries are typed.
+
+When the session starts, the distributions of every allele (which the analysis of any allele needs) and the
+analyses of every tumor are prefetched in the background, since they are the likely next queries; a query whose analysis is already being computed waits for it instead of computing
+it again, and one that already finished is answered from DataVisualization's cache at once.
+"""
+
+class InteractiveSession:
+    """
+    This class runs the queries of the user on a pool of threads and shows their results as they finish.
+    """
+
+    def __init__(self, visualization, workers = 2, prefetch = True, input_function = input):
+        """
+        Prepares the session.
+
+        Args:
+           visualization (DataVisualization) - The (non-interactive) visualization of the data.
+
+           workers (int) - The number of threads computing the analyses. Baseline is 2.
+
+           prefetch (bool) - Whether to compute the distributions of the alleles and the analyses of every tumor
+                             in the background when the session starts. Baseline is True.
+
+           input_function (function) - Reads a line typed by the user (input by default).
+        """
+
+        self.visualization = visualization
+        self.workers = max(1, workers or 1)
+        self.prefetch = prefetch
+        self.input_function = input_function
+
+        # The lines typed by the user and the finished analyses, in the order they happened.
+        self.events = queue.Queue()
+
+        # The analyses being computed, by (kind, name), so that a query never computes one twice.
+        self.pending = {}
+
+        # The time each query (kind, name) took from being typed to its result being shown.
+        self.latencies = []
+
+        # The suggestions of the last search, which the user can pick by their number.
+        self.suggestions = []
+
+        self.executor = None
+
+
+    def run(self):
+        """
+        Runs the session until the user types 'exit' (or the input ends).
+        """
+
+        visualization = self.visualization
+
+        print("\nTissues available:", ", ".join(visualization.cancer_type))
+        print("Type an allele or a tumor type at any time (even while a result is computing), or 'exit' to quit.")
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='query') as executor:
+            self.executor = executor
+
+            if self.prefetch: # The distributions of the alleles and the analyses of the tumors are the likely next queries.
+                executor.submit(visualization.distributions)
+
+                for tumor_type in visualization.cancer_type:
+                    self.submit('tumor', tumor_type)
+
+            threading.Thread(target=self.read_input, daemon=True).start()
+
+            while True:
+                event = self.next_event()
+
+                if event is None: # Nothing happened yet.
+                    continue
+
+                if event[0] == 'input':
+                    if not self.dispatch(*event[1:]):
+                        break
+                else:
+                    self.show(*event[1:])
+
+            # The analyses that were not started yet are not needed anymore.
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        self.executor = None
+
+
+    def read_input(self):
+        """
+        Reads the lines the user types (on a background thread) and puts them on the queue of events.
+        """
+
+        while True:
+            try:
+                line = self.input_function("\nEnter allele, tumor type, or 'exit' to quit: ")
+            except EOFError: # The input ended, as if the user typed 'exit'.
+                line = 'exit'
+
+            self.events.put(('input', line.strip().lower(), time.perf_counter()))
+
+            if line.strip().lower() == 'exit':
+                return
+
+
+    def next_event(self, timeout = 0.1):
+        """
+        Returns the next event, or None if none came within timeout seconds. While waiting, the open plots
+        keep responding (plt.pause runs their event loop).
+        """
+
+        try:
+            return self.events.get_nowait()
+        except queue.Empty:
+            pass
+
+        # pyplot is only imported once a plot was drawn (see data_visualization.load_pyplot).
+        plt = sys.modules.get('matplotlib.pyplot')
+
+        if plt is not None and plt.get_fignums(): # There are plots on the screen.
+            plt.pause(timeout)
+            timeout = 0
+
+        try:
+            return self.events.get(timeout=timeout) if timeout else self.events.get_nowait()
+        except queue.Empty:
+            return None
+
+
+    def dispatch(self, line, typed_at = None):
+        """
+        Dispatches a line the user typed: starts (or joins) the analysis of an allele or a tumor.
+
+        Return:
+            running (bool) - False if the user typed 'exit'.
+        """
+
+        visualization = self.visualization
+
+        if line == 'exit':
+            return False
+
+        if line.isdigit() and 1 <= int(line) <= len(self.suggestions): # If the user picked a suggestion.
+            line = self.suggestions[int(line) - 1][0]
+
+        kind, name = visualization.resolve(line)
+
+        if kind in ('allele', 'tumor'):
+            self.submit(kind, name, notify=True, typed_at=typed_at)
+
+        elif kind == 'gene': # Only printed (the probes of the gene are already analysed).
+            visualization.analyze_gene(name)
+
+        elif line: # If the user types something unfamiliar to the program, the closest names are suggested.
+            self.suggestions = visualization.suggest(line)
+            print_suggestions(self.suggestions)
+
+        return True
+
+
+    def submit(self, kind, name, notify = False, typed_at = None):
+        """
+        Starts the analysis of an allele or a tumor on the pool (unless it is already being computed).
+
+        Args:
+            kind (str) - 'allele' or 'tumor'.
+
+            name (str) - The name of the allele or the tumor.
+
+            notify (bool) - Whether to show the result when it is ready (False for prefetching).
+
+            typed_at (float) - When the query was typed (time.perf_counter()), to measure its latency.
+
+        Return:
+            future (Future) - The analysis.
+        """
+
+        key = (kind, name)
+        future = self.pending.get(key)
+
+        if future is None:
+            compute = self.visualization.allele_results if kind == 'allele' else self.visualization.tumor_results
+            future = self.executor.submit(compute, name)
+            self.pending[key] = future
+
+            # Finished analyses are kept in DataVisualization's cache, so they are no longer pending.
+            future.add_done_callback(lambda _: self.pending.pop(key, None))
+
+        if notify:
+            typed_at = typed_at if typed_at is not None else time.perf_counter()
+            future.add_done_callback(lambda finished: self.events.put(('result', kind, name, finished, typed_at)))
+
+        return future
+
+
+    def show(self, kind, name, future, typed_at):
+        """
+        Shows the result of an analysis (on the main thread, which draws the plots) without blocking.
+        """
+
+        try:
+            results = future.result()
+        except Exception as e: # The analysis failed; the session goes on.
+            print(f"\nAn error occurred while analysing {name}: {e}")
+            return
+
+        if kind == 'allele':
+            self.visualization.analyze_allele_expression(name, results, block=False)
+        else:
+            self.visualization.analyze_tumor(name, results, block=False)
+
+        self.latencies.append((kind, name, time.perf_counter() - typed_at))
+
+
+    def latency_stats(self):
+        """
+        Returns the number of queries shown and their median and largest latency (in seconds).
+        """
+
+        latencies = sorted(latency for _, _, latency in self.latencies)
+
+        if not latencies:
+            return {'queries': 0, 'median': None, 'max': None}
+
+        return {'queries': len(latencies), 'median': latencies[len(latencies) // 2], 'max': latencies[-1]}
@@ -0,0 +1,229 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import pandas as pd
+import os
+
+try: # When src is on sys.path (as in the tests).
+    from data_extraction import import_data, clean_data
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.data_extraction import import_data, clean_data
+
+"""
+This code analyses several expression series (GEO datasets, one CSV file each) at once
+(python main.py --datasets Brain_GSE50161 Brain_GSE... ).
+
+Each dataset is loaded (with import_data, so from its binary cache after the first time) only when it is
+first needed, on a pool of threads, so the datasets load in parallel rather than one after another. The
+datasets are then aligned on the probes (alleles) they all share, by joining their indexes of probe IDs,
+and clean_data analyses each of them (also in parallel) on exactly the same alleles. The results are
+combined into one table, indexed by (dataset, tumor), and replicated_alleles finds the alleles of each
+tumor that are significant in every dataset that has the tumor.
+"""
+
+class DatasetCollection:
+    """
+    This class loads several datasets lazily (each the first time it is needed) and in parallel.
+    """
+
+    def __init__(self, csv_names, workers = None, cache_directory = None):
+        """
+        Prepares the collection (no dataset is loaded yet).
+
+        Args:
+           csv_names (list) - The names (or paths) of the CSV files, as import_data takes them.
+
+           workers (int) - The number of threads loading and analysing the datasets. If no value is used
+                           then there is one for each dataset (up to the number of CPUs, and at least 2).
+
+           cache_directory (str) - The directory of the binary cache (see import_data).
+        """
+
+        self.names = list(dict.fromkeys(csv_names)) # Without duplicates, in their order.
+        self.workers = workers or max(2, min(len(self.names), os.cpu_count() or 1))
+        self.cache_directory = cache_directory
+
+        # The loading of each dataset (a Future), by name, started the first time it is needed.
+        self.loading = {}
+        self.lock = threading.Lock()
+        self.executor = None
+
+
+    def load(self, name):
+        """
+        Starts loading the dataset name (unless it is already loading or loaded), and returns its Future.
+        """
+
+        with self.lock:
+            if name not in self.loading:
+                if self.executor is None:
+                    self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='dataset')
+
+                self.loading[name] = self.executor.submit(import_data, name, cache_directory=self.cache_directory, compact=True)
+
+            return self.loading[name]
+
+
+    def dataset(self, name):
+        """
+        Returns the dataset name as an ExpressionMatrix (None if it could not be loaded), loading it if needed.
+        """
+
+        return self.load(name).result()
+
+
+    def datasets(self):
+        """
+        Loads every dataset in parallel and returns the ones that could be loaded, by name (in the order of names).
+        """
+
+        for name in self.names: # All of them start loading before any is waited for.
+            self.load(name)
+
+        loaded = {name: self.dataset(name) for name in self.names}
+
+        return {name: matrix for name, matrix in loaded.items() if matrix is not None}
+
+
+    def close(self):
+        """
+        Stops the threads of the collection (the datasets already loaded are kept).
+        """
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+
+def shared_alleles(matrices):
+
+    """
+    Returns the alleles (probe IDs) that every dataset has, joining their indexes (an inner join).
+
+    Args:
+        matrices (dict) - The datasets (ExpressionMatrix), by name.
+
+    Return:
+        alleles (Index) - The shared alleles, in the order of the first dataset.
+    """
+
+    alleles = None
+
+    for matrix in matrices.values():
+        alleles = matrix.alleles if alleles is None else alleles.intersection(matrix.alleles, sort=False)
+
+    return alleles if alleles is not None else pd.Index([])
+
+
+def align_datasets(matrices, alleles = None):
+
+    """
+    Restricts every dataset to the same alleles, in the same order.
+
+    Args:
+        matrices (dict) - The datasets (ExpressionMatrix), by name.
+
+        alleles (Index) - The alleles to keep. If no value is used then the alleles shared by all of them are kept.
+
+    Return:
+        aligned (dict) - The aligned datasets, by name.
+    """
+
+    alleles = shared_alleles(matrices) if alleles is None else pd.Index(alleles)
+
+    # A dataset that already has exactly these alleles is kept as it is (without a copy).
+    return {name: matrix if matrix.alleles.equals(alleles) else matrix.select_alleles(alleles)
+            for name, matrix in matrices.items()}
+
+
+def compare_datasets(collection, critical_alpha = 0.01, test = 'anova', correction = None):
+
+    """
+    Runs clean_data on every dataset of the collection, on the alleles they all share, and combines the results.
+
+    Args:
+        collection (DatasetCollection / list) - The datasets (or the names of their CSV files).
+
+        critical_alpha (float) - Significance threshold for identifying significant alleles. Baseline is 0.01.
+
+        test (str) - The test comparing each tumor with the normal tissue (see clean_data). Baseline is 'anova'.
+
+        correction (str) - The correction of the P values (see clean_data). Baseline is None.
+
+    Return:
+        combined (DataFrame) - The mean expression of the significant alleles (in columns) of each tumor of each
+                               dataset (in index, as (dataset, tumor)), as clean_data returns them for one dataset.
+                               None if no dataset could be loaded or they share no alleles.
+    """
+
+    if not isinstance(collection, DatasetCollection): # A collection of its own, closed once the analysis is done.
+        collection = DatasetCollection(collection)
+        try:
+            return compare_datasets(collection, critical_alpha, test, correction)
+        finally:
+            collection.close()
+
+    matrices = collection.datasets()
+
+    if not matrices:
+        print('\nNone of the datasets could be loaded.')
+        return None
+
+    alleles = shared_alleles(matrices)
+
+    if len(alleles) == 0:
+        print('\nThe datasets do not share any alleles.')
+        return None
+
+    print(f"\n{len(alleles)} alleles are shared by the {len(matrices)} datasets.")
+
+    aligned = align_datasets(matrices, alleles)
+
+    # Analysing the datasets in parallel (on the threads of the collection), since NumPy releases the GIL.
+    results = {name: collection.executor.submit(clean_data, matrix, critical_alpha, None, test, correction)
+               for name, matrix in aligned.items()}
+    results = {name: result.result() for name, result in results.items()}
+    results = {name: data for name, data in results.items() if data is not None}
+
+    if not results:
+        return None
+
+    # The tables are stacked under the name of their dataset. Each of them only has the columns of its own significant
+    # alleles (in its own order), so pd.concat aligns them by name and the alleles missing from a dataset are NaN there.
+    return pd.concat(results, names=['dataset', 'tumor'])
+
+
+def replicated_alleles(combined, min_datasets = None):
+
+    """
+    Finds the alleles of each tumor that are significant in every dataset that has the tumor (or in at least min_datasets of them).
+
+    Args:
+        combined (DataFrame) - The combined results (as returned by compare_datasets).
+
+        min_datasets (int) - The number of datasets an allele must be significant in. If no value is used
+                             then it must be significant in all the datasets that have the tumor.
+
+    Return:
+        replicated (DataFrame) - For each tumor (other than normal, in index): the number of datasets that have it,
+                                 the number of its significant alleles in each dataset, and the number of
+                                 replicated alleles and their names (in columns).
+    """
+
+    rows = {}
+
+    for tumor, table in combined.groupby(level='tumor', sort=False):
+        if tumor == 'normal': # Every allele is kept for the normal tissue, so there is nothing to replicate.
+            continue
+
+        significant = table.notna().to_numpy()
+        required = len(table) if min_datasets is None else min(min_datasets, len(table))
+        replicated = table.columns[significant.sum(axis=0) >= required]
+
+        row = {'datasets': len(table)}
+        row.update({f"significant_in_{dataset}": int(count) for dataset, count in
+                    zip(table.index.get_level_values('dataset'), significant.sum(axis=1))})
+        row.update({'replicated': len(replicated), 'replicated_alleles': ';'.join(map(str, replicated))})
+        rows[tumor] = row
+
+    # Keeps the counts as integers despite the datasets that do not have the tumor (empty cells).
+    return pd.DataFrame.from_dict(rows, orient='index').rename_axis('tumor').convert_dtypes()
@@ -0,0 +1,142 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+
+try: # When src is on sys.path (as in the tests).
+    from statistical_tests import tumor_tests
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.statistical_tests import tumor_tests
+
+"""
+This code runs the ANOVA (or another test of statistical_tests.py) of clean_data on several processes
+(clean_data(df, critical_alpha, workers=N)).
+
+Every chunk of alleles is an independent task, which computes the count, mean and sum of squared deviations
+of every group once and derives the tests of all the tumors against the normal tissue from them (as
+statistical_tests.tumor_tests does for the whole matrix). The expression values are copied once into shared
+memory, which every process maps, so the tasks only send the bounds of their chunk instead of pickling the data.
+The results are written back by the position of their chunk, so the output does not depend on the order in
+which the tasks finish.
+
+Starting the processes and copying the values into shared memory costs more than the tests of a small
+matrix take in a single process, so matrices with fewer than PARALLEL_MIN_VALUES values are tested in
+this process. Measured for 130 samples and 5 types with the ANOVA, starting the pool and copying the
+values costs about 0.04 s, while the tests take about 37 ns for every value in a single process (0.26 s for
+54,675 alleles), so from about 2,000,000 values even two workers save more than the start-up costs.
+"""
+
+# The shared memory and the expression values as seen by each process (set by _attach_values when the process starts).
+_shared_memory = None
+_shared_values = None
+
+# The number of expression values (samples x alleles) from which the tests are run on the pool of processes.
+PARALLEL_MIN_VALUES = 2_000_000
+
+
+def parallel_tumor_anova(values, codes, num_groups, control, workers, chunk_size = None,
+                         test = 'anova', permutations = 1000, seed = 0, min_values = PARALLEL_MIN_VALUES, names = None):
+
+    """
+    Computes the same counts, means and P values as statistical_tests.tumor_tests on a pool of processes.
+
+    Args:
+        values (ndarray) - The expression values (samples x alleles).
+
+        codes (ndarray) - The group of each sample (as returned by group_samples).
+
+        num_groups (int) - The number of groups.
+
+        control (int) - The index of the control group (the normal tissue).
+
+        workers (int) - The number of processes.
+
+        chunk_size (int) - The number of alleles in each task. If no value is used then the
+                           alleles are split evenly between the processes.
+
+        test (str) - The name of the test (one of statistical_tests.TESTS). Baseline is 'anova'.
+
+        permutations (int) - The number of permutations of the 'permutation' test. Baseline is 1000.
+
+        seed (int) - The seed of the permutations. Baseline is 0.
+
+        min_values (int) - The number of expression values from which the pool is used (smaller matrices are
+                           tested in this process). Baseline is PARALLEL_MIN_VALUES.
+
+        names (list) - The name of each group, which labels the time of each of them when the tests are run in
+                       this process (as in tumor_tests). If no value is used then they are labelled by their index.
+
+    Return:
+        counts (ndarray) - The number of samples in each group (groups).
+
+        means (ndarray) - The mean expression of each allele in each group (groups x alleles).
+
+        p_values (ndarray) - The P value of each allele in each group (groups x alleles). NaN for
+                             groups with less than two samples, which cannot be tested.
+    """
+
+    values = np.asarray(values)
+    codes = np.asarray(codes)
+    num_alleles = values.shape[1]
+
+    if workers < 2 or values.size < min_values: # Not worth starting the processes.
+        return tumor_tests(values, codes, num_groups, control, test, permutations, seed, names)
+
+    counts = np.bincount(codes[codes >= 0], minlength=num_groups)
+    means = np.zeros((num_groups, num_alleles))
+    p_values = np.full((num_groups, num_alleles), np.nan)
+
+    if chunk_size is None:
+        chunk_size = -(-num_alleles // workers) # Rounding up.
+    chunk_size = max(1, chunk_size)
+
+    chunks = [(start, min(start + chunk_size, num_alleles)) for start in range(0, num_alleles, chunk_size)]
+
+    # Copying the expression values into shared memory, once.
+    memory = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes))
+
+    try:
+        shared = np.ndarray(values.shape, dtype=values.dtype, buffer=memory.buf)
+        shared[:] = values
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_values,
+                                 initargs=(memory.name, values.shape, values.dtype.str)) as executor:
+
+            futures = [executor.submit(_chunk_tests, codes, num_groups, control, start, stop, test, permutations, seed)
+                       for start, stop in chunks]
+
+            for (start, stop), future in zip(chunks, futures):
+                means[:, start:stop], p_values[:, start:stop] = future.result()
+
+        del shared # The view must be released before the memory is closed.
+
+    finally:
+        memory.close()
+        memory.unlink()
+
+    return counts, means, p_values
+
+
+def _attach_values(name, shape, dtype):
+
+    """
+    Maps the shared expression values in a newly started process.
+    """
+
+    global _shared_values, _shared_memory
+
+    # The pool's processes share the resource tracker of this process, so the memory stays 
+    # registered once and is released by parallel_tumor_anova (not when a process exits).
+    _shared_memory = shared_memory.SharedMemory(name=name)
+
+    _shared_values = np.ndarray(shape, dtype=np.dtype(dtype), buffer=_shared_memory.buf)
+
+
+def _chunk_tests(codes, num_groups, control, start, stop, test = 'anova', permutations = 1000, seed = 0):
+
+    """
+    Computes the means and the P values (of the ANOVA or another test) of every group against the control group for one chunk of alleles.
+    """
+
+    _, means, p_values = tumor_tests(_shared_values[:, start:stop], codes, num_groups, control, test, permutations, seed)
+
+    return means, p_values
@@ -0,0 +1,218 @@
+import numpy as np
+
+"""
+This code finds the alleles (probe IDs), genes and tumors whose name looks like what the user typed, so that
+the prompt of DataVisualization can suggest them instead of only recognising an exact name.
+
+The names are indexed once, lowercase and sorted (with the position of each of them in the sorted order):
+
+    exact      - A hash table of the names.
+    prefix     - The names starting with the query are a contiguous run of the sorted names, found with two
+                 binary searches (np.searchsorted), so they cost O(log n) however many names there are.
+    substring  - The names containing the query, found by a single vectorized scan of the names (np.char.find).
+    fuzzy      - The names within a few typos of the query (insertions, deletions, substitutions and swaps
+                 of two neighbouring letters): the edit distance from the query to every name of a close
+                 enough length and letters is computed at once, one letter of the query at a time over a NumPy array of
+                 the codes of the letters of the names (the dynamic programming of the distance, vectorized
+                 over the names instead of looping over them).
+
+The suggestions are ranked exact, prefix, substring and then fuzzy (by their distance), and within each of
+these by length and name, so the closest and shortest names come first.
+"""
+
+# The kinds of matches, from the best to the worst.
+MATCHES = ('exact', 'prefix', 'substring', 'fuzzy')
+
+
+class ProbeSearch:
+    """
+    This class holds the index of the names that can be searched.
+    """
+
+    def __init__(self, alleles, genes = None, tumors = None):
+        """
+        Builds the index.
+
+        Args:
+           alleles (list / Index) - The names of the alleles (probe IDs).
+
+           genes (list) - The gene symbols (e.g. the genes of a GeneAnnotation). If no value is used then there are none.
+
+           tumors (list) - The names of the tumors. If no value is used then there are none.
+        """
+
+        # The name and kind of every entry (a name that is both an allele and a gene is kept as an allele).
+        self.names, self.kinds = [], []
+        seen = set()
+
+        for kind, names in (('allele', alleles), ('tumor', tumors), ('gene', genes)):
+            for name in (names if names is not None else []):
+                name = str(name)
+                if name.lower() in seen:
+                    continue
+
+                seen.add(name.lower())
+                self.names.append(name)
+                self.kinds.append(kind)
+
+        keys = [name.lower() for name in self.names]
+
+        # The entries sorted by their lowercase name, and the lowercase names in that order.
+        self.order = np.argsort(np.array(keys, dtype=str), kind='stable')
+        self.keys = np.array(keys, dtype=str)[self.order]
+
+        # The entry of each lowercase name.
+        self.entries = {key: entry for entry, key in enumerate(keys)}
+
+        # The length of each sorted name, and the Unicode codes of its letters (padded with zeros).
+        self.lengths = np.char.str_len(self.keys).astype(np.int64)
+        self.codes = self.keys.view(np.uint32).reshape(len(self.keys), self.keys.itemsize // 4)
+
+        # The letters of the names, and how many times each of them is in each name (a row for each letter, so
+        # that the counts of the letters of a query are contiguous).
+        self.letters, letter_indexes = np.unique(self.codes, return_inverse=True)
+        cells = letter_indexes.reshape(self.codes.shape) * len(self.keys) + np.arange(len(self.keys))[:, None]
+        self.histograms = np.bincount(cells.ravel(), minlength=len(self.letters) * len(self.keys)).astype(np.int16).reshape(len(self.letters), len(self.keys))
+
+
+    def __len__(self):
+        """
+        Returns the number of names in the index.
+        """
+
+        return len(self.names)
+
+
+    def exact(self, query):
+        """
+        Returns the (name, kind) whose name is query, regardless of case (None if there is none).
+        """
+
+        entry = self.entries.get(str(query).strip().lower())
+
+        return None if entry is None else (self.names[entry], self.kinds[entry])
+
+
+    def prefix(self, query):
+        """
+        Returns the positions (in the sorted names) of the names starting with query (lowercase).
+        """
+
+        start, end = np.searchsorted(self.keys, [query, query + '\U0010ffff'])
+
+        return np.arange(start, end)
+
+
+    def substring(self, query):
+        """
+        Returns the positions (in the sorted names) of the names containing query (lowercase).
+        """
+
+        return np.flatnonzero(np.char.find(self.keys, query) >= 0)
+
+
+    def fuzzy(self, query, max_distance):
+        """
+        Returns the positions (in the sorted names) of the names within max_distance edits of query (lowercase),
+        and their distances.
+        """
+
+        length = len(query)
+
+        # Every edit changes the counts of the letters by at most 2 in total (and the length by at most 1), so only
+        # the names whose length and counts of letters are close enough to those of the query can be within max_distance.
+        # The difference of the counts is only summed over the letters of the query: the letters of a name that are
+        # not in the query are the rest of its length.
+        letters = np.frombuffer(query.encode('utf-32-le'), dtype=np.uint32)
+        query_letters, query_counts = np.unique(letters, return_counts=True)
+        rows = np.searchsorted(self.letters, query_letters).clip(max=len(self.letters) - 1)
+        known = self.letters[rows] == query_letters
+
+        counts = self.histograms[rows[known]]
+        shared = counts.sum(axis=0)
+        differences = np.abs(counts - query_counts[known][:, None]).sum(axis=0) + (self.lengths - shared) + query_counts[~known].sum()
+
+        positions = np.flatnonzero((np.abs(self.lengths - length) <= max_distance) & (differences <= 2 * max_distance))
+
+        if len(positions) == 0 or length == 0:
+            return positions, np.empty(0, dtype=np.int64)
+
+        width = min(length + max_distance, self.codes.shape[1])
+        codes = self.codes[positions, :width]
+
+        # The distance from the first i letters of the query to the first j letters of every name (a row for each i).
+        previous, row = None, np.broadcast_to(np.arange(width + 1), (len(positions), width + 1)).copy()
+
+        for i in range(1, length + 1):
+            current = np.empty_like(row)
+            current[:, 0] = i
+            different = codes != letters[i - 1]
+
+            # Substitutions (or matches) and deletions can be taken at once; insertions depend on the column before.
+            best = np.minimum(row[:, :-1] + different, row[:, 1:] + 1)
+
+            if i > 1: # Two neighbouring letters swapped.
+                swapped = (codes[:, 1:] == letters[i - 2]) & (codes[:, :-1] == letters[i - 1])
+                best[:, 1:] = np.where(swapped, np.minimum(best[:, 1:], previous[:, :-2] + 1), best[:, 1:])
+
+            for j in range(1, width + 1):
+                current[:, j] = np.minimum(best[:, j - 1], current[:, j - 1] + 1)
+
+            previous, row = row, current
+
+        distances = row[np.arange(len(positions)), np.minimum(self.lengths[positions], width)]
+        close = distances <= max_distance
+
+        return positions[close], distances[close]
+
+
+    def search(self, query, limit = 10, max_distance = None):
+        """
+        Finds the names that look like query.
+
+        Args:
+            query (str) - What the user typed (regardless of case).
+
+            limit (int) - The number of suggestions. Baseline is 10.
+
+            max_distance (int) - The number of typos allowed in fuzzy matches. If no value is used then it
+                                 is 1 for queries of up to 5 letters and 2 for longer ones.
+
+        Return:
+            suggestions (list) - A (name, kind, match) tuple for each suggestion, from the best to the worst,
+                                 where kind is 'allele', 'gene' or 'tumor' and match is one of MATCHES.
+        """
+
+        query = str(query).strip().lower()
+
+        if not query or len(self.keys) == 0:
+            return []
+
+        if max_distance is None:
+            max_distance = 1 if len(query) <= 5 else 2
+
+        # The found names (their sorted positions), with their kind of match and distance from the query.
+        prefix = self.prefix(query)
+        matches = np.ones(len(prefix), dtype=np.int64)
+        if query in self.entries: # The name itself sorts first among the names starting with it.
+            matches[0] = 0
+        found = [(prefix, matches, np.zeros(len(prefix), dtype=np.int64))]
+
+        # Substrings (which include the prefixes) and typos are only looked for if there are not enough better suggestions.
+        if len(prefix) < limit:
+            substring = self.substring(query)
+            found.append((substring, np.full(len(substring), 2), np.zeros(len(substring), dtype=np.int64)))
+
+            if len(substring) < limit:
+                positions, distances = self.fuzzy(query, max_distance)
+                found.append((positions, np.full(len(positions), 3), distances))
+
+        positions, matches, distances = (np.concatenate(arrays) for arrays in zip(*found))
+
+        # Ranked by match, distance, length and name (the sorted position), keeping the best rank of each name.
+        ranked = np.lexsort((positions, self.lengths[positions], distances, matches))
+        _, first = np.unique(positions[ranked], return_index=True)
+        ranked = ranked[np.sort(first)][:limit]
+
+        return [(self.names[self.order[position]], self.kinds[self.order[position]], MATCHES[match])
+                for position, match in zip(positions[ranked].tolist(), matches[ranked].tolist())]
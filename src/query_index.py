@@ -0,0 +1,289 @@
+import pandas as pd
+import numpy as np
+
+try: # When src is on sys.path (as in the tests).
+    from expression_matrix import as_expression_matrix
+    from allele_table import as_allele_table
+    from group_statistics import sufficient_statistics
+    from statistical_tests import welch_statistics
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.expression_matrix import as_expression_matrix
+    from src.allele_table import as_allele_table
+    from src.group_statistics import sufficient_statistics
+    from src.statistical_tests import welch_statistics
+
+"""
+This code builds the lookups behind DataVisualization once, when the class is created.
+
+The names of the alleles and of the tumors are kept in hash tables (instead of being searched for in
+a pandas Index), and for every tumor the expression of its significant alleles, their difference and
+log2 fold change from the healthy tissue are computed in advance as aligned arrays. A query for an
+allele or a tumor then only reads the precomputed arrays.
+
+The alleles of a tumor can be ranked by (the absolute value of) their difference, their log2 fold change
+or Welch's t statistic against the healthy tissue (RANKINGS). The top N of a ranking are selected with
+np.argpartition, in linear time, and only those N are sorted; the full ranking is sorted once and kept.
+"""
+
+# The orders query_tumor can rank the alleles of a tumor in (from the largest absolute value).
+RANKINGS = ('difference', 'log2_fold_change', 'statistic')
+
+# The columns of the results of query_tumor.
+TUMOR_COLUMNS = ('tumor_expression', 'normal_expression', 'difference', 'log2_fold_change', 'statistic', 'percent_of_normal')
+
+class QueryIndex:
+    """
+    This class holds the precomputed lookups for the alleles and the tumors of data and df.
+    """
+
+    def __init__(self, data, df):
+        """
+        Builds the lookups.
+
+        Args:
+           data (DataFrame / AlleleTable) - Modified df as it contains solely the mean expression of each
+                                            allele that had a significant effect over the normal tissue.
+
+           df (DataFrame / ExpressionMatrix) - Consists of the raw data of the file.
+        """
+
+        matrix = as_expression_matrix(df)
+
+        # The raw data, kept (without a copy) for the t statistics of each tumor, computed when it is first queried.
+        self.matrix = matrix
+        self.t_statistics = {}
+
+        # A list containing all the different alleles in the dataset.
+        self.alleles = matrix.alleles
+
+        # The position of each allele in self.alleles (a hash table rather than a search through the Index).
+        self.allele_positions = {allele: position for position, allele in enumerate(self.alleles)}
+
+        # A list containing the types of each brain tumor, and the same types as a hash table.
+        self.cancer_type = list(matrix.cancer_type)
+        self.tumor_set = set(self.cancer_type)
+
+        # Contains the mean expression of each allele (in the order of self.alleles) in the healthy tissue.
+        # (Accumulated in float64 whatever the type of the values; NaN if there is no healthy tissue.)
+        normal_values = matrix.group_values('normal')
+        self.normal_means = normal_values.mean(axis=0, dtype=np.float64) if len(normal_values) else np.full(len(self.alleles), np.nan)
+
+        # The precomputed arrays of each tumor (in keys), aligned with one another (in the order of the columns of data).
+        self.tumors = {}
+
+        # The full rankings already sorted, by (tumor, ranking).
+        self.orders = {}
+
+        # The tumors (other than normal) in which each allele (in keys) is significant, in the order of data.
+        self.allele_tumors = {}
+
+        # Only the significant entries of data (see allele_table.py), so no row is scanned for NaN.
+        table = as_allele_table(data)
+
+        # The positions (in self.alleles) of the columns of data. -1 for columns that are not alleles of df.
+        column_positions = self.alleles.get_indexer(table.columns)
+        allele_names = list(self.alleles) # Indexing a list is much faster than indexing an Index one item at a time.
+
+        for tumor in table.index:
+
+            # The significant alleles of the tumor (keeping only the ones that are alleles of df).
+            indexes, values = table.entries(tumor)
+            positions = column_positions[indexes]
+            known = positions >= 0
+            positions = positions[known]
+
+            tumor_means = values[known]
+            normal_means = self.normal_means[positions]
+
+            with np.errstate(divide='ignore', invalid='ignore'): # Non-positive means have no log (NaN).
+                log2_fold_changes = np.log2(tumor_means / normal_means)
+
+            self.tumors[tumor] = {'positions': positions,
+                                  'tumor_means': tumor_means,
+                                  'normal_means': normal_means,
+                                  'differences': np.abs(tumor_means - normal_means), # The absolute difference from the healthy tissue.
+                                  'log2_fold_changes': log2_fold_changes}
+
+            if tumor != 'normal':
+                for position, tumor_mean in zip(positions, tumor_means):
+                    self.allele_tumors.setdefault(allele_names[position], []).append((tumor, tumor_mean))
+
+
+    def has_allele(self, allele):
+        """
+        Returns whether allele is one of the alleles of the dataset.
+        """
+
+        return allele in self.allele_positions
+
+
+    def has_tumor(self, tumor_type):
+        """
+        Returns whether tumor_type is one of the types of the dataset.
+        """
+
+        return tumor_type in self.tumor_set
+
+
+    def query_allele(self, allele):
+        """
+        Returns the expression of allele in every tumor (other than normal) in which it is significant.
+
+        Args:
+            allele (str) - The name of the allele.
+
+        Return:
+            result (DataFrame) - The tumor expression, the normal expression and the tumor expression as a
+                                 percentage of the normal one (in columns) for each tumor (in index).
+                                 Empty if the allele is not significant in any tumor.
+        """
+
+        tumors = self.allele_tumors.get(allele, [])
+        normal_mean = self.normal_means[self.allele_positions[allele]] if allele in self.allele_positions else np.nan
+
+        tumor_means = np.array([tumor_mean for _, tumor_mean in tumors], dtype=np.float64)
+
+        return pd.DataFrame({'tumor_expression': tumor_means,
+                             'normal_expression': np.full(len(tumors), normal_mean),
+                             'percent_of_normal': tumor_means / normal_mean * 100},
+                            index=pd.Index([tumor for tumor, _ in tumors], name='tumor'))
+
+
+    def query_tumor(self, tumor_type, top = None, rank_by = 'difference'):
+        """
+        Returns the significant alleles of tumor_type, from the largest difference from the healthy tissue
+        (or the largest absolute log2 fold change or t statistic).
+
+        Args:
+            tumor_type (str) - The name of the tumor.
+
+            top (int) - The number of alleles to return. If no value is used then all of them are returned.
+
+            rank_by (str) - The ranking of the alleles (one of RANKINGS). If no value is used (or an invalid one)
+                            then baseline is 'difference'.
+
+        Return:
+            result (DataFrame) - The tumor expression, the normal expression, their absolute difference, the log2
+                                 fold change, Welch's t statistic and the tumor expression as a percentage of the
+                                 normal one (in columns) for each allele (in index). Empty if the tumor has no
+                                 significant alleles.
+        """
+
+        arrays = self.tumors.get(tumor_type)
+
+        if arrays is None: # The tumor has no significant alleles (or does not exist).
+            return pd.DataFrame({column: np.empty(0) for column in TUMOR_COLUMNS}, index=pd.Index([], name='allele'))
+
+        order = self.ranking(tumor_type, rank_by, top)
+        tumor_means, normal_means = arrays['tumor_means'][order], arrays['normal_means'][order]
+
+        return pd.DataFrame({'tumor_expression': tumor_means,
+                             'normal_expression': normal_means,
+                             'difference': arrays['differences'][order],
+                             'log2_fold_change': arrays['log2_fold_changes'][order],
+                             'statistic': self.tumor_statistics(tumor_type)[order],
+                             'percent_of_normal': tumor_means / normal_means * 100},
+                            index=pd.Index(self.alleles[arrays['positions'][order]], name='allele'))
+
+
+    def ranking(self, tumor_type, rank_by = 'difference', top = None):
+        """
+        Returns the positions (in the arrays of tumor_type) of its top alleles, from the largest score.
+
+        Args:
+            tumor_type (str) - The name of the tumor (one of self.tumors).
+
+            rank_by (str) - The ranking of the alleles (one of RANKINGS). Baseline is 'difference'.
+
+            top (int) - The number of alleles to return. If no value is used then all of them are returned.
+        """
+
+        if rank_by not in RANKINGS: # In case the ranking is not valid.
+            print(f"\nInserted ranking is invalid (choose one of: {', '.join(RANKINGS)}). Baseline ranking (difference) was used instead.")
+            rank_by = 'difference'
+
+        key = (tumor_type, rank_by)
+
+        if key in self.orders: # The full ranking was already sorted.
+            return self.orders[key][:top]
+
+        arrays = self.tumors[tumor_type]
+
+        if rank_by == 'difference':
+            scores = arrays['differences']
+        elif rank_by == 'log2_fold_change':
+            scores = np.abs(arrays['log2_fold_changes'])
+        else:
+            scores = np.abs(self.tumor_statistics(tumor_type))
+
+        order = top_k(scores, top)
+
+        if top is None or top >= len(scores): # Kept, so the full ranking is only sorted once.
+            self.orders[key] = order
+
+        return order
+
+
+    def tumor_statistics(self, tumor_type):
+        """
+        Returns Welch's t statistic of every significant allele of tumor_type (in the order of its arrays)
+        against the healthy tissue, computed the first time it is needed. NaN where it is undefined.
+        """
+
+        t_statistics = self.t_statistics.get(tumor_type)
+
+        if t_statistics is None:
+            matrix = self.matrix
+            positions = self.tumors[tumor_type]['positions']
+
+            # Only the samples of the tumor and of the healthy tissue, and only the significant alleles, are read.
+            group = np.flatnonzero(matrix.codes == matrix.type_codes.get(tumor_type, -2)) # -2 is never the code of a sample.
+            control = np.flatnonzero(matrix.codes == matrix.type_codes.get('normal', -2))
+            values = matrix.values[np.ix_(np.concatenate([group, control]), positions)]
+            codes = np.repeat([0, 1], [len(group), len(control)])
+
+            counts, means, squares = sufficient_statistics(values, codes, 2)
+            t_statistics = welch_statistics(counts, means, squares, 0, 1)[0]
+
+            self.t_statistics[tumor_type] = t_statistics
+
+        return t_statistics
+
+
+def top_k(scores, top = None):
+
+    """
+    Returns the indexes of the top largest scores, from the largest. Equal scores keep their order, and NaN
+    scores come last (the same order as a stable sort of -scores), but only the top scores are sorted:
+    np.argpartition finds them in linear time.
+
+    Args:
+        scores (ndarray) - The scores.
+
+        top (int) - The number of indexes to return. If no value is used then all of them are returned.
+
+    Return:
+        order (ndarray) - The indexes of the top scores.
+    """
+
+    keys = -np.asarray(scores, dtype=np.float64)
+
+    if top is None or top >= len(keys): # Everything is returned, so everything is sorted.
+        return np.argsort(keys, kind='stable')
+
+    if top <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    # The key of the top-th score: the scores before it are certainly in the top, and so are
+    # the first of the scores equal to it (in their order), as many as are needed.
+    threshold = keys[np.argpartition(keys, top - 1)[top - 1]]
+
+    if np.isnan(threshold): # There are fewer than top (non-NaN) scores, so the rest are NaN.
+        above, equal = np.flatnonzero(~np.isnan(keys)), np.flatnonzero(np.isnan(keys))
+    else:
+        above, equal = np.flatnonzero(keys < threshold), np.flatnonzero(keys == threshold)
+
+    chosen = np.concatenate([above, equal[:top - len(above)]])
+    chosen.sort()
+
+    return chosen[np.argsort(keys[chosen], kind='stable')]
@@ -0,0 +1,289 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+from collections import deque
+import numpy as np
+import threading
+import json
+import time
+
+try: # When src is on sys.path (as in the tests).
+    from result_cache import ResultCache
+    from query_index import RANKINGS
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.result_cache import ResultCache
+    from src.query_index import RANKINGS
+
+"""
+This code serves the analyses of DataVisualization over HTTP on the local machine (python main.py --serve),
+so that several analysts can query the same dataset, loaded and cleaned once and held in memory once.
+
+Every request is handled on its own thread (ThreadingHTTPServer). The analyses come from DataVisualization
+(and its cache of results), the encoded responses are cached as well, and the time taken by every request
+is recorded for each endpoint. The endpoints (all GET) are:
+
+    /                                    - The tumors, the number of alleles and the endpoints.
+    /alleles/<allele>                    - The expression of the allele in the tumors and its summary (analyze_allele_expression).
+    /tumors/<tumor>?top=N&rank_by=R      - The top N alleles of the tumor, from the largest difference from normal (analyze_tumor),
+                                           or from the largest log2_fold_change or statistic (R, see query_index.RANKINGS).
+    /tumors/<tumor>/correlations         - The correlated alleles among the top ones (analyze_tumor), or with ?all=1,
+                                           every correlated pair of its significant alleles (correlation_network).
+    /plots/<kind>/<name>.png             - A plot as a PNG image (kind: expression, correlation or distribution).
+    /search?q=TEXT&limit=N               - The N alleles, tumors and genes whose name is closest to TEXT (prefix,
+                                           substring or a few typos, see probe_search.py).
+    /stats                               - The latency of every endpoint and the counters of the caches.
+"""
+
+# The number of latencies kept for each endpoint (the most recent ones).
+LATENCY_WINDOW = 1000
+
+
+class QueryServer(ThreadingHTTPServer):
+    """
+    This class is the HTTP server: it holds the visualization, the cache of responses and the latencies.
+    """
+
+    daemon_threads = True # The threads of the requests do not keep the program alive.
+
+    def __init__(self, visualization, host = '127.0.0.1', port = 8000, cache_entries = 1024, cache_bytes = 128 * 1024 ** 2):
+        """
+        Creates the server (it starts serving when serve_forever() is called).
+
+        Args:
+           visualization (DataVisualization) - The (non-interactive) visualization of the data.
+
+           host (str) - The address to listen on. Baseline is '127.0.0.1' (only this machine).
+
+           port (int) - The port to listen on (0 picks a free one). Baseline is 8000.
+
+           cache_entries, cache_bytes (int) - The bounds of the cache of responses. Baseline is 1024 responses and 128 MB.
+        """
+
+        super().__init__((host, port), QueryHandler)
+
+        self.visualization = visualization
+        self.responses = ResultCache(cache_entries, cache_bytes)
+
+        # The latencies (in seconds) of the most recent requests of each endpoint.
+        self.latencies = {}
+        self.latency_lock = threading.Lock()
+
+        # Matplotlib is not thread-safe, so the plots are rendered one at a time.
+        self.render_lock = threading.Lock()
+
+
+    def record_latency(self, endpoint, seconds):
+        """
+        Records the time taken by a request of endpoint.
+        """
+
+        with self.latency_lock:
+            self.latencies.setdefault(endpoint, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+
+    def latency_stats(self):
+        """
+        Returns the number of requests and the median, 95th percentile and largest latency (in milliseconds) of each endpoint.
+        """
+
+        with self.latency_lock:
+            latencies = {endpoint: np.array(values) for endpoint, values in self.latencies.items()}
+
+        return {endpoint: {'requests': len(values),
+                           'median_ms': float(np.median(values) * 1000),
+                           'p95_ms': float(np.percentile(values, 95) * 1000),
+                           'max_ms': float(values.max() * 1000)}
+                for endpoint, values in latencies.items()}
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    This class handles one request of the QueryServer.
+    """
+
+    def do_GET(self):
+        """
+        Answers a GET request from the cache of responses, or computes the response and caches it.
+        """
+
+        start = time.perf_counter()
+
+        url = urlsplit(self.path)
+        parts = [unquote(part) for part in url.path.split('/') if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        endpoint = parts[0] if parts else 'index'
+
+        try:
+            if endpoint == 'stats': # Never cached, since it changes with every request.
+                status, content_type, body = 200, 'application/json', encode_json(self.stats())
+            else:
+                status, content_type, body = self.server.responses.get_or_compute(
+                    (url.path, url.query), lambda: self.respond(endpoint, parts[1:], query))
+
+        except ValueError as e: # An invalid parameter (e.g. ?top=abc).
+            status, content_type, body = 400, 'application/json', encode_json({'error': str(e)})
+
+        except Exception as e: # General error.
+            status, content_type, body = 500, 'application/json', encode_json({'error': str(e)})
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+        self.server.record_latency(endpoint if status != 404 else 'not_found', time.perf_counter() - start)
+
+
+    def respond(self, endpoint, arguments, query):
+        """
+        Computes the response of a request.
+
+        Return:
+            status (int) - The HTTP status.
+
+            content_type (str) - The type of the body.
+
+            body (bytes) - The body of the response.
+        """
+
+        visualization = self.server.visualization
+        index = visualization.index
+
+        if endpoint == 'index' and not arguments:
+            return 200, 'application/json', encode_json({
+                'tumors': list(visualization.cancer_type), 'alleles': len(visualization.alleles),
+                'endpoints': ['/alleles/<allele>', '/tumors/<tumor>?top=N&rank_by=R', '/tumors/<tumor>/correlations?all=1',
+                              '/plots/<expression|correlation|distribution>/<name>.png', '/search?q=TEXT&limit=N', '/stats']})
+
+        if endpoint == 'search' and not arguments:
+            limit = int(query['limit']) if 'limit' in query else 10
+            suggestions = visualization.suggest(query.get('q', ''), limit)
+
+            return 200, 'application/json', encode_json({
+                'query': query.get('q', ''),
+                'suggestions': [{'name': name, 'kind': kind, 'match': match} for name, kind, match in suggestions]})
+
+        if endpoint == 'alleles' and len(arguments) == 1 and index.has_allele(arguments[0]):
+            results = visualization.allele_results(arguments[0])
+
+            content = {'allele': arguments[0],
+                       'normal_expression': visualization.normal_means[arguments[0]],
+                       'tumors': frame_to_records(results['expression']),
+                       'summary': results['summary'].to_dict()}
+
+            if results.get('intervals') is not None: # The confidence intervals of the fold changes (--resamples).
+                content['intervals'] = frame_to_records(results['intervals'])
+
+            return 200, 'application/json', encode_json(content)
+
+        if endpoint == 'tumors' and len(arguments) == 1 and index.has_tumor(arguments[0]):
+            top = int(query['top']) if 'top' in query else visualization.num_for_plot
+            rank_by = query.get('rank_by', visualization.rank_by)
+
+            if rank_by not in RANKINGS: # Reported to the client as an invalid parameter (400).
+                raise ValueError(f"Invalid rank_by: {rank_by} (choose one of: {', '.join(RANKINGS)}).")
+
+            return 200, 'application/json', encode_json({
+                'tumor': arguments[0], 'alleles': frame_to_records(visualization.query_tumor(arguments[0], top, rank_by))})
+
+        if endpoint == 'tumors' and len(arguments) == 2 and arguments[1] == 'correlations' and index.has_tumor(arguments[0]):
+
+            if query.get('all') in ('1', 'true'): # Every correlated pair of the significant alleles of the tumor.
+                pairs = visualization.correlation_network(arguments[0])
+                return 200, 'application/json', encode_json({'tumor': arguments[0], 'pairs': frame_to_records(pairs)})
+
+            # The correlated alleles among the top ones, as analyze_tumor shows them.
+            results = visualization.tumor_results(arguments[0])
+            correlated = sorted(results['list_corr'] or [])
+
+            return 200, 'application/json', encode_json({
+                'tumor': arguments[0], 'correlated_alleles': correlated,
+                'correlations': frame_to_records(results['correlation_data'])})
+
+        if endpoint == 'plots' and len(arguments) == 2 and arguments[1].endswith('.png'):
+            kind, name = arguments[0], arguments[1][:-len('.png')]
+
+            known = index.has_allele(name) if kind == 'distribution' else index.has_tumor(name)
+
+            if kind in ('expression', 'correlation', 'distribution') and known:
+                with self.server.render_lock:
+                    png = visualization.render_png(kind, name)
+
+                if png is not None:
+                    return 200, 'image/png', png
+
+        return 404, 'application/json', encode_json({'error': f"Not found: /{'/'.join([endpoint] + arguments)}"})
+
+
+    def stats(self):
+        """
+        Returns the latencies of the endpoints and the counters of the caches.
+        """
+
+        return {'latency': self.server.latency_stats(),
+                'response_cache': self.server.responses.stats(),
+                'result_cache': self.server.visualization.cache_stats()}
+
+
+    def log_message(self, format, *args):
+        """
+        Keeps the requests from being printed (their latencies are reported by /stats instead).
+        """
+
+
+def frame_to_records(frame):
+
+    """
+    Converts a DataFrame (with its index as a column) into a list of dicts, one for each row.
+    """
+
+    return frame.reset_index().to_dict(orient='records')
+
+
+def encode_json(content):
+
+    """
+    Encodes content as JSON bytes, converting NumPy values into Python ones and NaN into null (NaN is not valid JSON).
+    """
+
+    def plain(value):
+        if isinstance(value, dict):
+            return {str(key): plain(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [plain(item) for item in value]
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, float) and not np.isfinite(value):
+            return None
+        return value
+
+    return json.dumps(plain(content)).encode('utf-8')
+
+
+def serve(visualization, host = '127.0.0.1', port = 8000):
+
+    """
+    Serves the visualization until the program is interrupted (Ctrl+C).
+
+    Args:
+        visualization (DataVisualization) - The (non-interactive) visualization of the data.
+
+        host (str) - The address to listen on. Baseline is '127.0.0.1' (only this machine).
+
+        port (int) - The port to listen on. Baseline is 8000.
+    """
+
+    server = QueryServer(visualization, host, port)
+    print(f"\nServing the analyses on http://{host}:{server.server_address[1]}/ (Ctrl+C to stop).")
+
+    # The distributions of the alleles are computed in the background while the first requests are served,
+    # so that the first analysis of an allele does not wait for them (the requests that need them wait for them once).
+    threading.Thread(target=visualization.distributions, daemon=True).start()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,196 @@
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import numpy as np
+import functools
+import os
+
+try: # When src is on sys.path (as in the tests).
+    from expression_matrix import as_expression_matrix
+    from allele_table import as_allele_table
+    from statistical_tests import permutation_weights
+    from instrumentation import span, count, timed
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.expression_matrix import as_expression_matrix
+    from src.allele_table import as_allele_table
+    from src.statistical_tests import permutation_weights
+    from src.instrumentation import span, count, timed
+
+"""
+This code adds the uncertainty of the fold changes of the significant alleles: a bootstrap confidence interval
+of the tumor expression as a percentage of the normal one, and a permutation P value of the log2 fold change
+(python main.py --resamples 1000, or fold_change_intervals for every significant allele of every tumor).
+
+The resamples are drawn once, as weights: a bootstrap resample of n samples is a row of how many times each
+sample was drawn (divided by n), and a permutation is a row of which samples fall into the tumor (see
+statistical_tests.permutation_weights). The means of every resample of every allele are then a single matrix
+product of the weights with the expression values, computed for blocks of alleles (bounding the memory of the
+resamples x alleles results), and the blocks of all the tumors are spread over a pool of threads, since NumPy
+releases the GIL in the products and the quantiles.
+"""
+
+# The columns of the results of fold_change_intervals.
+INTERVAL_COLUMNS = ('tumor_expression', 'normal_expression', 'percent_of_normal', 'ci_low', 'ci_high', 'log2_fold_change', 'p_value')
+
+# The number of bootstrap weight matrices kept once drawn (the least recently used are dropped first), as
+# statistical_tests.permutation_weights keeps its matrices.
+_BOOTSTRAP_CACHE_SIZE = 32
+
+
+@functools.lru_cache(maxsize=_BOOTSTRAP_CACHE_SIZE)
+def bootstrap_weights(sample_count, resamples = 1000, seed = 0):
+
+    """
+    Returns the weights (resamples x samples) whose product with the samples gives the mean of every bootstrap
+    resample: the number of times each sample was drawn (with replacement) divided by sample_count.
+    Drawn once for each sample count and seed, then reused (read-only) while it is among the most recently used.
+    """
+
+    rng = np.random.default_rng(seed)
+
+    # The samples drawn into each resample, and how many times each of them was drawn.
+    drawn = rng.integers(0, sample_count, size=(resamples, sample_count))
+    weights = np.zeros((resamples, sample_count))
+    np.add.at(weights, (np.arange(resamples)[:, None], drawn), 1 / sample_count)
+    weights.flags.writeable = False
+
+    return weights
+
+
+def significant_alleles(data):
+
+    """
+    Returns the significant alleles of each tumor (other than normal).
+
+    Args:
+        data (DataFrame / AlleleTable) - The mean expression of each significant allele of each tumor (as returned by clean_data).
+
+    Return:
+        significant (dict) - The names of the significant alleles (in values) of each tumor (in keys).
+    """
+
+    table = as_allele_table(data)
+
+    return {tumor: list(table.tumor(tumor).index) for tumor in table.index if tumor != 'normal'}
+
+
+@timed('fold_change_intervals')
+def fold_change_intervals(df, significant, resamples = 1000, permutations = 1000, confidence = 0.95, seed = 0,
+                          workers = None, block_size = 2048):
+
+    """
+    Computes a bootstrap confidence interval and a permutation P value of the fold change of every given allele of every given tumor.
+
+    Args:
+        df (DataFrame / ExpressionMatrix) - Consists of the raw data of the file.
+
+        significant (dict) - The alleles (in values) of each tumor (in keys), e.g. as returned by significant_alleles.
+
+        resamples (int) - The number of bootstrap resamples. Baseline is 1000.
+
+        permutations (int) - The number of permutations. Baseline is 1000.
+
+        confidence (float) - The confidence of the intervals. Can be somewhere between 0 and 1. Baseline is 0.95.
+
+        seed (int) - The seed of the resamples. Baseline is 0.
+
+        workers (int) - The number of threads. If no value is used then there is one for each CPU.
+
+        block_size (int) - The number of alleles resampled at once. Baseline is 2048.
+
+    Return:
+        intervals (DataFrame) - The tumor expression, the normal expression, the tumor expression as a percentage of
+                                the normal one with the low and high ends of its confidence interval, the log2 fold
+                                change and its permutation P value (in columns) of each (tumor, allele) (in index).
+                                None if there is no healthy tissue to compare the tumors with.
+    """
+
+    matrix = as_expression_matrix(df)
+
+    # In case the programmer has inserted invalid values.
+    if type(resamples) is not int or resamples < 1:
+        resamples = 1000
+        print('\nInserted number of resamples is invalid. Baseline value (1000) was used instead.')
+
+    if type(permutations) is not int or permutations < 1:
+        permutations = 1000
+        print('\nInserted number of permutations is invalid. Baseline value (1000) was used instead.')
+
+    if type(confidence) is not float or not 0 < confidence < 1:
+        confidence = 0.95
+        print('\nInserted confidence is invalid. Baseline value (0.95) was used instead.')
+
+    if 'normal' not in matrix.type_codes:
+        print('\nThere is no healthy tissue to compare the tumors with.')
+        return None
+
+    normal_rows = np.flatnonzero(matrix.codes == matrix.type_codes['normal'])
+
+    # Every (tumor, block of alleles) is a task of its own.
+    tasks = []
+    for tumor, alleles in significant.items():
+        if tumor == 'normal' or tumor not in matrix.type_codes:
+            continue
+
+        positions = matrix.alleles.get_indexer(list(alleles))
+        positions = positions[positions >= 0]
+
+        tumor_rows = np.flatnonzero(matrix.codes == matrix.type_codes[tumor])
+
+        for start in range(0, len(positions), block_size):
+            tasks.append((tumor, tumor_rows, positions[start:start + block_size]))
+
+    def run(task):
+        tumor, tumor_rows, positions = task
+        with span('resample', tumor=tumor):
+            return _resample_block(matrix.values, tumor_rows, normal_rows, positions, resamples, permutations, confidence, seed)
+
+    workers = workers or os.cpu_count() or 1
+
+    if workers > 1 and len(tasks) > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='resampling') as executor:
+            blocks = list(executor.map(run, tasks))
+    else:
+        blocks = [run(task) for task in tasks]
+
+    count('resampled_probes', sum(len(positions) for _, _, positions in tasks))
+
+    # The (tumor, allele) of every row, in the order of the tasks.
+    tumors = [tumor for tumor, _, positions in tasks for _ in positions]
+    positions = np.concatenate([np.empty(0, dtype=np.intp)] + [positions for _, _, positions in tasks])
+    index = pd.MultiIndex.from_arrays([tumors, matrix.alleles[positions]], names=['tumor', 'allele'])
+
+    return pd.DataFrame(np.concatenate(blocks) if blocks else np.empty((0, len(INTERVAL_COLUMNS))),
+                        index=index, columns=list(INTERVAL_COLUMNS))
+
+
+def _resample_block(values, tumor_rows, normal_rows, positions, resamples, permutations, confidence, seed):
+
+    """
+    Computes the columns of fold_change_intervals for one block of alleles of one tumor (alleles x 7).
+    """
+
+    tumor_values = values[np.ix_(tumor_rows, positions)].astype(np.float64)
+    normal_values = values[np.ix_(normal_rows, positions)].astype(np.float64)
+
+    tumor_means, normal_means = tumor_values.mean(axis=0), normal_values.mean(axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'): # Non-positive means have no fold change (NaN or inf).
+
+        # The means of every bootstrap resample of the tumor and of the normal tissue (drawn independently).
+        percents = (bootstrap_weights(len(tumor_rows), resamples, seed) @ tumor_values) / \
+                   (bootstrap_weights(len(normal_rows), resamples, seed + 1) @ normal_values) * 100
+
+        low, high = np.quantile(percents, [(1 - confidence) / 2, (1 + confidence) / 2], axis=0)
+
+        # The log2 fold change of every permutation of the samples between the tumor and the normal tissue.
+        members = permutation_weights(len(tumor_rows), len(normal_rows), permutations, seed) > 0
+        pooled = np.concatenate((tumor_values, normal_values))
+
+        permuted = np.abs(np.log2(((members / len(tumor_rows)) @ pooled) / ((~members / len(normal_rows)) @ pooled)))
+        observed = np.log2(tumor_means / normal_means)
+
+        # A tolerance for fold changes that are equal up to rounding.
+        p_values = ((permuted >= np.abs(observed) - 1e-12).sum(axis=0) + 1) / (permutations + 1)
+        p_values[~np.isfinite(observed)] = np.nan
+
+    return np.column_stack((tumor_means, normal_means, tumor_means / normal_means * 100, low, high, observed, p_values))
@@ -0,0 +1,149 @@
+from collections import OrderedDict
+import threading
+import pandas as pd
+import numpy as np
+
+try: # When src is on sys.path (as in the tests).
+    from instrumentation import count
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.instrumentation import count
+
+"""
+This code keeps the results of computations that are likely to be repeated (for example the analysis
+of a tumor the user asks for again) in a bounded least-recently-used (LRU) cache.
+
+The cache is bounded both by the number of results and by their total size in bytes; when either
+bound is exceeded, the results that were used least recently are dropped first. It counts its hits,
+misses and evictions so its effectiveness can be checked. It can be shared between threads (e.g. the
+worker threads of interactive_session.py): the results are computed outside of its lock.
+"""
+
+class ResultCache:
+    """
+    This class is a least-recently-used cache of computed results, bounded by count and by size.
+    """
+
+    def __init__(self, max_entries = 128, max_bytes = 64 * 1024 ** 2):
+        """
+        Initializes an empty cache.
+
+        Args:
+           max_entries (int) - The maximum number of results kept. Baseline is 128.
+
+           max_bytes (int) - The maximum total size (in bytes) of the results kept. None for no bound.
+                             Baseline is 64 MB.
+        """
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        # The results (in values) by their keys, from the least to the most recently used, and their sizes.
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Guards the entries and the counters when the cache is shared between threads.
+        self.lock = threading.RLock()
+
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the result of key from the cache, or computes it (by calling compute()) and caches it.
+
+        Args:
+            key (hashable) - The key of the result.
+
+            compute (function) - Computes the result when it is not in the cache.
+        """
+
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                count('result_cache_hits')
+                self.entries.move_to_end(key) # It is now the most recently used result.
+                return self.entries[key]
+
+            self.misses += 1
+            count('result_cache_misses')
+
+        value = compute() # Outside of the lock, so that other threads are not kept waiting.
+        self.put(key, value)
+
+        return value
+
+
+    def put(self, key, value):
+        """
+        Caches value as the result of key, dropping the least recently used results if needed.
+        A result larger than max_bytes on its own is not cached.
+        """
+
+        size = size_of(value)
+
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.sizes.pop(key)
+                del self.entries[key]
+
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+
+            self.entries[key] = value
+            self.sizes[key] = size
+            self.total_bytes += size
+
+            while len(self.entries) > self.max_entries or (self.max_bytes is not None and self.total_bytes > self.max_bytes):
+                oldest, _ = self.entries.popitem(last=False)
+                self.total_bytes -= self.sizes.pop(oldest)
+                self.evictions += 1
+
+
+    def clear(self):
+        """
+        Drops every result (the counters are kept).
+        """
+
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.total_bytes = 0
+
+
+    def stats(self):
+        """
+        Returns the counters of the cache as a dict.
+        """
+
+        with self.lock:
+            return {'entries': len(self.entries), 'bytes': self.total_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+def size_of(value):
+
+    """
+    Estimates the size (in bytes) of a result: arrays, pandas objects, bytes, strings and
+    (possibly nested) lists, tuples and dicts of them. Other objects count as 64 bytes.
+    """
+
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+
+    if isinstance(value, dict):
+        return sum(size_of(key) + size_of(item) for key, item in value.items())
+
+    if isinstance(value, (list, tuple, set)):
+        return sum(size_of(item) for item in value)
+
+    return 64
@@ -0,0 +1,334 @@
+import pandas as pd
+import numpy as np
+
+try: # When src is on sys.path (as in the tests).
+    from expression_matrix import as_expression_matrix
+    from allele_table import as_allele_table
+    from query_index import top_k
+    from instrumentation import span, timed
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.expression_matrix import as_expression_matrix
+    from src.allele_table import as_allele_table
+    from src.query_index import top_k
+    from src.instrumentation import span, timed
+
+"""
+This code gives an overview of how the samples (and the tumor types) separate over all the alleles at once
+(python main.py --overview): a PCA of the samples, a clustering of the samples on their principal components,
+and a clustering of the alleles that weigh the most in the components.
+
+The PCA is a randomized truncated SVD (Halko, Martinsson and Tropp): the range of the centered expression
+matrix is found by multiplying it with a few random vectors (and a few power iterations), and only the small
+matrix projected on that range is decomposed exactly. The matrix is never centered or copied as a whole: the
+products are computed block by block of alleles, each block centered as it is read, so the memory beyond the
+matrix is a few samples x block and alleles x components arrays, and no alleles x alleles matrix is ever formed.
+The samples are then clustered with k-means (or hierarchically, with scipy) on their principal components.
+"""
+
+# The clustering methods of sample_overview.
+CLUSTERING_METHODS = ('kmeans', 'hierarchical')
+
+
+def randomized_pca(values, positions = None, components = 10, oversamples = 10, iterations = 4, seed = 0, block_size = 8192):
+
+    """
+    Computes the principal components of the samples with a randomized truncated SVD.
+
+    Args:
+        values (ndarray) - The expression values (samples x alleles).
+
+        positions (ndarray) - The alleles (columns of values) to use. If no value is used then all of them are used.
+
+        components (int) - The number of principal components. Baseline is 10.
+
+        oversamples (int) - The number of random vectors beyond components (which make the range more accurate). Baseline is 10.
+
+        iterations (int) - The number of power iterations (which separate the components better). Baseline is 4.
+
+        seed (int) - The seed of the random vectors. Baseline is 0.
+
+        block_size (int) - The number of alleles read at once. Baseline is 8192.
+
+    Return:
+        scores (ndarray) - The coordinates of each sample on each component (samples x components).
+
+        loadings (ndarray) - The weight of each allele in each component (components x alleles).
+
+        explained (ndarray) - The fraction of the total variance explained by each component.
+    """
+
+    num_samples = values.shape[0]
+    num_alleles = values.shape[1] if positions is None else len(positions)
+
+    # The blocks of alleles: slices of values (no copy) when all the alleles are used.
+    if positions is None:
+        blocks = [(slice(start, min(start + block_size, num_alleles)),) * 2 for start in range(0, num_alleles, block_size)]
+    else:
+        blocks = [(slice(start, start + block_size), positions[start:start + block_size]) for start in range(0, num_alleles, block_size)]
+
+    # The mean of each allele, and the total variance of the samples.
+    means = np.empty(num_alleles)
+    total_variance = 0.0
+    for block, columns in blocks:
+        block_values = values[:, columns].astype(np.float64)
+        means[block] = block_values.mean(axis=0)
+        total_variance += ((block_values - means[block]) ** 2).sum() / max(num_samples - 1, 1)
+
+    def centered(block, columns): # A block of the centered matrix, centered as it is read.
+        return values[:, columns].astype(np.float64) - means[block]
+
+    def multiply(vectors): # The centered matrix times vectors (alleles x l): samples x l.
+        result = np.zeros((num_samples, vectors.shape[1]))
+        for block, columns in blocks:
+            result += centered(block, columns) @ vectors[block]
+        return result
+
+    def multiply_transposed(vectors): # The transposed centered matrix times vectors (samples x l): alleles x l.
+        result = np.empty((num_alleles, vectors.shape[1]))
+        for block, columns in blocks:
+            result[block] = centered(block, columns).T @ vectors
+        return result
+
+    size = min(components + oversamples, num_samples, num_alleles)
+    rng = np.random.default_rng(seed)
+
+    # An orthonormal basis of (approximately) the range of the matrix, refined by the power iterations.
+    basis, _ = np.linalg.qr(multiply(rng.standard_normal((num_alleles, size))))
+    for _ in range(iterations):
+        projected, _ = np.linalg.qr(multiply_transposed(basis))
+        basis, _ = np.linalg.qr(multiply(projected))
+
+    # The exact SVD of the matrix projected on the basis (its transpose: alleles x size).
+    right, singular_values, _ = np.linalg.svd(multiply_transposed(basis), full_matrices=False)
+
+    components = min(components, size)
+    loadings = right[:, :components].T
+    singular_values = singular_values[:components]
+
+    # The sign of each component is chosen so that its largest loading is positive (so the results are reproducible).
+    signs = np.sign(loadings[np.arange(components), np.abs(loadings).argmax(axis=1)])
+    signs[signs == 0] = 1
+    loadings = loadings * signs[:, None]
+
+    # The coordinates of the samples are their projections on the components.
+    scores = multiply(loadings.T)
+    explained = singular_values ** 2 / max(num_samples - 1, 1) / total_variance if total_variance > 0 else np.zeros(components)
+
+    return scores, loadings, explained
+
+
+def kmeans(points, clusters, iterations = 100, restarts = 10, seed = 0):
+
+    """
+    Clusters the points with k-means (k-means++ starts, keeping the best of several restarts).
+
+    Args:
+        points (ndarray) - The points (points x dimensions).
+
+        clusters (int) - The number of clusters.
+
+        iterations (int) - The maximum number of iterations of each restart. Baseline is 100.
+
+        restarts (int) - The number of restarts. Baseline is 10.
+
+        seed (int) - The seed of the starts. Baseline is 0.
+
+    Return:
+        labels (ndarray) - The cluster of each point.
+
+        centers (ndarray) - The center of each cluster (clusters x dimensions).
+
+        inertia (float) - The sum of the squared distances of the points from their centers.
+    """
+
+    points = np.asarray(points, dtype=np.float64)
+    clusters = min(clusters, len(points))
+    rng = np.random.default_rng(seed)
+    squared_norms = (points ** 2).sum(axis=1)
+
+    def distances(centers): # The squared distance of every point from every center (points x clusters).
+        return np.maximum(squared_norms[:, None] - 2 * points @ centers.T + (centers ** 2).sum(axis=1), 0)
+
+    best = None
+
+    for _ in range(restarts):
+
+        # k-means++: each center is drawn with a probability proportional to its squared distance from the nearest center.
+        centers = points[[rng.integers(len(points))]]
+        while len(centers) < clusters:
+            nearest = distances(centers).min(axis=1)
+            drawn = rng.choice(len(points), p=nearest / nearest.sum()) if nearest.sum() > 0 else rng.integers(len(points))
+            centers = np.vstack([centers, points[drawn]])
+
+        for _ in range(iterations):
+            labels = distances(centers).argmin(axis=1)
+
+            # Each center moves to the mean of its points (an empty cluster keeps its center).
+            sums = np.zeros_like(centers)
+            np.add.at(sums, labels, points)
+            sizes = np.bincount(labels, minlength=clusters)
+            moved = np.where(sizes[:, None] > 0, sums / np.maximum(sizes, 1)[:, None], centers)
+
+            if np.allclose(moved, centers):
+                break
+            centers = moved
+
+        labels = distances(centers).argmin(axis=1)
+        inertia = distances(centers)[np.arange(len(points)), labels].sum()
+
+        if best is None or inertia < best[2]:
+            best = (labels, centers, inertia)
+
+    return best
+
+
+def hierarchical_clusters(points, clusters, method = 'average', metric = 'euclidean'):
+
+    """
+    Clusters the points hierarchically (with scipy's linkage), cutting the tree into clusters.
+
+    Args:
+        points (ndarray) - The points (points x dimensions).
+
+        clusters (int) - The number of clusters.
+
+        method (str) - The linkage method (see scipy.cluster.hierarchy.linkage). Baseline is 'average'.
+
+        metric (str) - The distance between the points (e.g. 'euclidean' or 'correlation'). Baseline is 'euclidean'.
+
+    Return:
+        labels (ndarray) - The cluster of each point (from 0).
+    """
+
+    # Imported on first use, like the plotting libraries (see data_visualization.load_pyplot).
+    from scipy.cluster.hierarchy import linkage, fcluster
+
+    if len(points) < 2:
+        return np.zeros(len(points), dtype=np.intp)
+
+    tree = linkage(np.asarray(points, dtype=np.float64), method=method, metric=metric)
+
+    return fcluster(tree, clusters, criterion='maxclust') - 1
+
+
+@timed('sample_overview')
+def sample_overview(df, data = None, components = 10, clusters = None, method = 'kmeans', top_probes = 100, seed = 0):
+
+    """
+    Runs the PCA of the samples, clusters the samples on their principal components and clusters the alleles
+    that weigh the most in the components.
+
+    Args:
+        df (DataFrame / ExpressionMatrix) - Consists of the raw data of the file.
+
+        data (DataFrame / AlleleTable) - The result of clean_data. If given, only the alleles significant in at least
+                                         one tumor are used. If no value is used then all the alleles are used.
+
+        components (int) - The number of principal components. Baseline is 10.
+
+        clusters (int) - The number of clusters of the samples and of the alleles. If no value is used then
+                         there are as many as there are types of samples.
+
+        method (str) - The clustering of the samples: 'kmeans' or 'hierarchical' (average linkage).
+                       If no value is used (or an invalid one) then baseline is 'kmeans'.
+
+        top_probes (int) - The number of alleles (those that weigh the most in the components) that are clustered.
+                           Baseline is 100.
+
+        seed (int) - The seed of the PCA and of k-means. Baseline is 0.
+
+    Return:
+        overview (dict) - 'scores': the type and the coordinates on each component of each sample (DataFrame),
+                          'explained': the fraction of the variance explained by each component (Series),
+                          'loadings': the weight of each allele in each component (DataFrame, components x alleles),
+                          'sample_clusters': the cluster of each sample (Series), 'types_by_cluster': the number of
+                          samples of each type in each cluster (DataFrame), and 'probe_clusters': the cluster of
+                          each of the top alleles (Series). None if there are fewer than 2 samples or no alleles.
+    """
+
+    matrix = as_expression_matrix(df)
+
+    # In case the programmer has inserted invalid values.
+    if type(components) is not int or components < 1:
+        components = 10
+        print('\nInserted number of components is invalid. Baseline value (10) was used instead.')
+
+    if method not in CLUSTERING_METHODS:
+        method = 'kmeans'
+        print(f"\nInserted clustering method is invalid (choose one of: {', '.join(CLUSTERING_METHODS)}). Baseline method (kmeans) was used instead.")
+
+    if clusters is None or type(clusters) is not int or clusters < 1:
+        clusters = max(1, len(matrix.cancer_type))
+
+    # The alleles significant in at least one tumor (the normal tissue keeps every allele, so it is left out).
+    positions = None
+    if data is not None:
+        table = as_allele_table(data)
+        significant = [table.entries(tumor)[0] for tumor in table.index if tumor != 'normal']
+        columns = np.unique(np.concatenate(significant)) if significant else np.empty(0, dtype=np.intp)
+        positions = matrix.alleles.get_indexer(table.columns[columns])
+        positions = np.sort(positions[positions >= 0])
+
+    num_alleles = matrix.values.shape[1] if positions is None else len(positions)
+
+    if len(matrix) < 2 or num_alleles == 0:
+        print('\nNot enough samples or alleles for an overview.')
+        return None
+
+    alleles = matrix.alleles if positions is None else matrix.alleles[positions]
+
+    with span('pca'):
+        scores, loadings, explained = randomized_pca(matrix.values, positions, components, seed=seed)
+
+    names = [f"PC{component + 1}" for component in range(scores.shape[1])]
+
+    # Clustering the samples on their principal components.
+    with span('cluster_samples', method=method):
+        if method == 'kmeans':
+            sample_labels = kmeans(scores, clusters, seed=seed)[0]
+        else:
+            sample_labels = hierarchical_clusters(scores, clusters)
+
+    types = matrix.sample_types()
+    sample_clusters = pd.Series(sample_labels, index=pd.Index(matrix.samples, name='sample'), name='cluster')
+
+    # Clustering the alleles that weigh the most in the components (weighted by the variance of each component)
+    # on their standardized expression across the samples (so alleles that rise and fall together are close).
+    with span('cluster_probes'):
+        weights = np.sqrt(((loadings * np.sqrt(explained)[:, None]) ** 2).sum(axis=0))
+        top = np.sort(top_k(weights, top_probes))
+        top_columns = top if positions is None else positions[top]
+
+        profiles = matrix.values[:, top_columns].astype(np.float64).T
+        profiles = (profiles - profiles.mean(axis=1, keepdims=True)) / np.maximum(profiles.std(axis=1, keepdims=True), 1e-12)
+        probe_labels = hierarchical_clusters(profiles, clusters)
+
+    return {'scores': pd.DataFrame(scores, index=sample_clusters.index, columns=names).assign(type=np.asarray(types)),
+            'explained': pd.Series(explained, index=names, name='explained_variance'),
+            'loadings': pd.DataFrame(loadings, index=names, columns=alleles),
+            'sample_clusters': sample_clusters,
+            'types_by_cluster': pd.crosstab(pd.Series(np.asarray(types), name='type'), sample_clusters.to_numpy()).rename_axis(columns='cluster'),
+            'probe_clusters': pd.Series(probe_labels, index=pd.Index(alleles[top], name='allele'), name='cluster')}
+
+
+def plot_sample_overview(axes, overview):
+
+    """
+    Plots the samples on their first two principal components, colored by their type.
+
+    Args:
+        axes (Axes) - The axes to plot on.
+
+        overview (dict) - The overview of the samples (as returned by sample_overview).
+    """
+
+    scores, explained = overview['scores'], overview['explained']
+    second = 'PC2' if 'PC2' in scores else 'PC1'
+
+    for tumor, samples in scores.groupby('type', sort=False):
+        axes.scatter(samples['PC1'], samples[second], label=tumor, s=20)
+
+    axes.set_xlabel(f"PC1 ({explained['PC1'] * 100:.1f}% of the variance)")
+    axes.set_ylabel(f"{second} ({explained[second] * 100:.1f}% of the variance)")
+    axes.set_title('The Samples on Their First Two Principal Components')
+    axes.legend()
@@ -0,0 +1,392 @@
+from scipy.special import stdtr, ndtr, chdtrc
+import numpy as np
+import functools
+
+try: # When src is on sys.path (as in the tests).
+    from group_statistics import sufficient_statistics, anova_from_statistics
+    from instrumentation import span
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.group_statistics import sufficient_statistics, anova_from_statistics
+    from src.instrumentation import span
+
+"""
+This code provides the tests clean_data can compare each tumor with the normal tissue with, and the
+corrections for testing ~54,000 alleles at once (clean_data(df, test=..., correction=...)).
+
+Every test is computed for all the alleles at once, as whole-matrix operations:
+    'anova'       - The one-way ANOVA (the same as f_oneway), from the sufficient statistics of the groups.
+    'welch'       - Welch's t-test (the same as ttest_ind(equal_var=False)), from the same statistics.
+    'mannwhitney' - The Mann-Whitney U test (the same as mannwhitneyu(method='asymptotic')), and
+    'kruskal'     - the Kruskal-Wallis H test (the same as kruskal), both from a single sort of every
+                    allele's samples that gives their (average) ranks and ties.
+    'permutation' - A two-sided permutation test of the difference of the means. The permutations are drawn
+                    once as a matrix of weights (permutations x samples), so the differences of all the
+                    permutations of all the alleles are one matrix product, and the matrix is reused for
+                    every tumor with the same number of samples.
+
+The corrections ('bonferroni' and 'bh', Benjamini-Hochberg) adjust the P values of each tumor across
+its alleles, in a single sorted pass.
+"""
+
+# The names of the tests and of the corrections clean_data accepts.
+TESTS = ('anova', 'welch', 'mannwhitney', 'kruskal', 'permutation')
+CORRECTIONS = (None, 'bonferroni', 'bh')
+
+# The number of permutation matrices kept once drawn (the least recently used are dropped first). Each one is
+# permutations x samples float64 values (~1 MB for 1000 permutations of GSE50161's 130 samples).
+_PERMUTATION_CACHE_SIZE = 32
+
+
+def tumor_tests(values, codes, num_groups, control, test = 'anova', permutations = 1000, seed = 0, names = None):
+
+    """
+    Computes the test of every group against the control group, for all the alleles at once
+    (the same as group_statistics.tumor_anova, for any of the TESTS).
+
+    Args:
+        values (ndarray) - The expression values (samples x alleles).
+
+        codes (ndarray) - The group of each sample (as returned by group_samples).
+
+        num_groups (int) - The number of groups.
+
+        control (int) - The index of the control group (the normal tissue).
+
+        test (str) - The name of the test (one of TESTS). Baseline is 'anova'.
+
+        permutations (int) - The number of permutations of the 'permutation' test. Baseline is 1000.
+
+        seed (int) - The seed of the permutations (the same seed always gives the same P values). Baseline is 0.
+
+        names (list) - The name of each group (e.g. the types of tumors), which labels the time of each of them
+                       (when instrumentation is enabled). If no value is used then they are labelled by their index.
+
+    Return:
+        counts (ndarray) - The number of samples in each group (groups).
+
+        means (ndarray) - The mean expression of each allele in each group (groups x alleles).
+
+        p_values (ndarray) - The P value of each allele in each group (groups x alleles). NaN for
+                             groups with less than two samples, which cannot be tested.
+    """
+
+    values = np.asarray(values)
+    codes = np.asarray(codes)
+
+    counts, means, squares = sufficient_statistics(values, codes, num_groups)
+    p_values = np.full(means.shape, np.nan)
+
+    for group in range(num_groups):
+        if counts[group] > 1 and counts[control] > 0:
+
+            with span('group', tumor=names[group] if names is not None else group): # The time of each tumor (when instrumentation is enabled).
+                if test == 'anova': # Computed from the statistics of all the groups, without selecting the samples again.
+                    p_values[group] = anova_from_statistics(counts, means, squares, group, control)[1]
+                else:
+                    p_values[group] = compare_groups(values[codes == group], values[codes == control], test, permutations, seed)
+
+    return counts, means, p_values
+
+
+def compare_groups(group_values, control_values, test = 'anova', permutations = 1000, seed = 0):
+
+    """
+    Computes the P value of the test of a group against the control group, for all the alleles at once.
+
+    Args:
+        group_values (ndarray) - The expression values of the samples of the group (samples x alleles).
+
+        control_values (ndarray) - The expression values of the samples of the control group (samples x alleles).
+
+        test (str) - The name of the test (one of TESTS). Baseline is 'anova'.
+
+        permutations (int) - The number of permutations of the 'permutation' test. Baseline is 1000.
+
+        seed (int) - The seed of the permutations. Baseline is 0.
+
+    Return:
+        p_values (ndarray) - The P value of each allele (NaN where the test is undefined).
+    """
+
+    group_values = np.asarray(group_values, dtype=np.float64)
+    control_values = np.asarray(control_values, dtype=np.float64)
+
+    if test in ('anova', 'welch'):
+        counts, means, squares = sufficient_statistics(np.concatenate((group_values, control_values)),
+                                                       np.repeat([0, 1], [len(group_values), len(control_values)]), 2)
+
+        if test == 'anova':
+            return anova_from_statistics(counts, means, squares, 0, 1)[1]
+
+        return welch_from_statistics(counts, means, squares, 0, 1)
+
+    if test in ('mannwhitney', 'kruskal'):
+        return rank_test(group_values, control_values, test)
+
+    if test == 'permutation':
+        return permutation_test(group_values, control_values, permutations, seed)
+
+    raise ValueError(f"Unknown test '{test}'. Choose one of: {', '.join(TESTS)}.")
+
+
+def welch_from_statistics(counts, means, squares, group, control):
+
+    """
+    Computes Welch's t-test between two groups (the same test as ttest_ind(group_data, control_data, equal_var=False))
+    for all the alleles at once.
+
+    Args:
+        counts, means, squares (ndarray) - The statistics of the groups (as returned by sufficient_statistics).
+
+        group (int) - The index of the tested group (for example a tumor).
+
+        control (int) - The index of the control group (the normal tissue).
+
+    Return:
+        p_values (ndarray) - The two-sided P value of each allele (NaN where the test is undefined).
+    """
+
+    t_statistics, degrees = welch_statistics(counts, means, squares, group, control)
+
+    return 2 * stdtr(degrees, -np.abs(t_statistics))
+
+
+def welch_statistics(counts, means, squares, group, control):
+
+    """
+    Computes the t statistic and the degrees of freedom of Welch's t-test between two groups, for all the alleles at once.
+
+    Args:
+        counts, means, squares (ndarray) - The statistics of the groups (as returned by sufficient_statistics).
+
+        group (int) - The index of the tested group (for example a tumor).
+
+        control (int) - The index of the control group (the normal tissue).
+
+    Return:
+        t_statistics (ndarray) - The t statistic of each allele (positive where the group is more expressed). NaN where undefined.
+
+        degrees (ndarray) - The Welch-Satterthwaite degrees of freedom of each allele.
+    """
+
+    group_count, control_count = counts[group], counts[control]
+
+    with np.errstate(divide='ignore', invalid='ignore'): # Constant alleles give 0/0 (NaN), as in ttest_ind.
+
+        # The variance of the mean of each group.
+        group_error = squares[group] / (group_count - 1) / group_count
+        control_error = squares[control] / (control_count - 1) / control_count
+
+        t_statistics = (means[group] - means[control]) / np.sqrt(group_error + control_error)
+
+        # The Welch-Satterthwaite degrees of freedom.
+        degrees = (group_error + control_error) ** 2 / (group_error ** 2 / (group_count - 1) + control_error ** 2 / (control_count - 1))
+
+    return t_statistics, degrees
+
+
+def rank_columns(values):
+
+    """
+    Ranks the samples of every allele (1 for the lowest, with the average rank for ties, as rankdata does)
+    with a single sort of all the alleles at once.
+
+    Args:
+        values (ndarray) - The expression values (samples x alleles).
+
+    Return:
+        ranks (ndarray) - The rank of each sample for each allele (samples x alleles).
+
+        ties (ndarray) - The sum of t^3 - t over the groups of t tied samples of each allele (alleles),
+                         used by the tie corrections of the rank tests.
+    """
+
+    num_samples = values.shape[0]
+    positions = np.arange(num_samples)[:, None]
+
+    order = np.argsort(values, axis=0, kind='stable')
+    sorted_values = np.take_along_axis(values, order, axis=0)
+
+    # Whether each sorted sample starts (or ends) a run of tied samples.
+    starts = np.ones(sorted_values.shape, dtype=bool)
+    starts[1:] = sorted_values[1:] != sorted_values[:-1]
+    ends = np.ones(sorted_values.shape, dtype=bool)
+    ends[:-1] = starts[1:]
+
+    # The first and last position of the run of each sorted sample.
+    first = np.maximum.accumulate(np.where(starts, positions, 0), axis=0)
+    last = np.minimum.accumulate(np.where(ends, positions, num_samples)[::-1], axis=0)[::-1]
+
+    ranks = np.empty(values.shape)
+    np.put_along_axis(ranks, order, (first + last) / 2 + 1, axis=0)
+
+    # Every sample of a run of t samples adds t^2 - 1, so every run adds t^3 - t.
+    run_lengths = last - first + 1
+    ties = (run_lengths ** 2 - 1).sum(axis=0)
+
+    return ranks, ties
+
+
+def rank_test(group_values, control_values, test = 'mannwhitney'):
+
+    """
+    Computes the Mann-Whitney U test (two-sided, asymptotic, with continuity and tie corrections,
+    as mannwhitneyu(method='asymptotic')) or the Kruskal-Wallis H test (as kruskal) of a group
+    against the control group, for all the alleles at once.
+
+    Args:
+        group_values (ndarray) - The expression values of the samples of the group (samples x alleles).
+
+        control_values (ndarray) - The expression values of the samples of the control group (samples x alleles).
+
+        test (str) - 'mannwhitney' or 'kruskal'. Baseline is 'mannwhitney'.
+
+    Return:
+        p_values (ndarray) - The P value of each allele (NaN where the test is undefined).
+    """
+
+    group_count, control_count = len(group_values), len(control_values)
+    total_count = group_count + control_count
+
+    pooled = np.concatenate((group_values, control_values))
+    ranks, ties = rank_columns(pooled)
+
+    group_ranks = ranks[:group_count].sum(axis=0)
+    control_ranks = ranks[group_count:].sum(axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'): # Alleles with every sample tied give 0/0 (NaN).
+
+        if test == 'kruskal':
+            h_statistics = (12 / (total_count * (total_count + 1)) * (group_ranks ** 2 / group_count + control_ranks ** 2 / control_count)
+                            - 3 * (total_count + 1))
+            correction = 1 - ties / (total_count ** 3 - total_count)
+            h_statistics /= correction
+
+            p_values = chdtrc(1, h_statistics)
+            p_values[correction <= 0] = np.nan # Every sample is tied (kruskal refuses to test them).
+
+        else:
+            u_statistics = group_ranks - group_count * (group_count + 1) / 2
+            mean_u = group_count * control_count / 2
+            deviation_u = np.sqrt(group_count * control_count / 12 * ((total_count + 1) - ties / (total_count * (total_count - 1))))
+
+            z_statistics = (np.abs(u_statistics - mean_u) - 0.5) / deviation_u
+            p_values = np.minimum(2 * ndtr(-z_statistics), 1)
+
+    # As in scipy, alleles with missing values have no P value.
+    p_values[np.isnan(pooled).any(axis=0)] = np.nan
+
+    return p_values
+
+
+def permutation_test(group_values, control_values, permutations = 1000, seed = 0, block_size = 4096):
+
+    """
+    Computes a two-sided permutation test of the difference between the means of a group and of the
+    control group, for all the alleles at once.
+
+    Args:
+        group_values (ndarray) - The expression values of the samples of the group (samples x alleles).
+
+        control_values (ndarray) - The expression values of the samples of the control group (samples x alleles).
+
+        permutations (int) - The number of permutations. Baseline is 1000.
+
+        seed (int) - The seed of the permutations. Baseline is 0.
+
+        block_size (int) - The number of alleles whose permutations are computed at once (bounds the
+                           memory of the permutations x alleles differences). Baseline is 4096.
+
+    Return:
+        p_values (ndarray) - The P value of each allele: (1 + the permutations whose difference is at least
+                             as large as the observed one) / (1 + permutations).
+    """
+
+    group_count, control_count = len(group_values), len(control_values)
+    pooled = np.concatenate((group_values, control_values))
+
+    weights = permutation_weights(group_count, control_count, permutations, seed)
+
+    # The observed difference of the means, and a tolerance for differences that are equal up to rounding.
+    observed = np.abs(group_values.mean(axis=0) - control_values.mean(axis=0))
+    tolerance = 1e-12 * np.maximum(1, np.abs(pooled).max(axis=0, initial=0))
+
+    exceeding = np.zeros(pooled.shape[1])
+    for start in range(0, pooled.shape[1], block_size):
+        stop = start + block_size
+
+        # The difference of the means of every permutation for every allele of the block.
+        differences = weights @ pooled[:, start:stop]
+        exceeding[start:stop] = (np.abs(differences) >= observed[start:stop] - tolerance[start:stop]).sum(axis=0)
+
+    p_values = (exceeding + 1) / (permutations + 1)
+    p_values[np.isnan(observed)] = np.nan
+
+    return p_values
+
+
+@functools.lru_cache(maxsize=_PERMUTATION_CACHE_SIZE)
+def permutation_weights(group_count, control_count, permutations = 1000, seed = 0):
+
+    """
+    Returns the weights (permutations x samples) whose product with the pooled samples gives the difference
+    of the means of every permutation: 1/group_count for the samples drawn into the group, and
+    -1/control_count for the rest. Drawn once for each group size and seed, then reused (read-only, since
+    every caller shares them) while it is among the _PERMUTATION_CACHE_SIZE most recently used.
+    """
+
+    rng = np.random.default_rng(seed)
+    total_count = group_count + control_count
+
+    # Each row is a random permutation of the samples, whose first group_count samples form the group.
+    drawn = rng.permuted(np.tile(np.arange(total_count), (permutations, 1)), axis=1)[:, :group_count]
+
+    weights = np.full((permutations, total_count), -1 / control_count)
+    np.put_along_axis(weights, drawn, 1 / group_count, axis=1)
+    weights.flags.writeable = False
+
+    return weights
+
+
+def adjust_p_values(p_values, correction = None):
+
+    """
+    Adjusts the P values of each tumor (each row) for testing all its alleles.
+
+    Args:
+        p_values (ndarray) - The P value of each allele in each tumor (tumors x alleles). NaN values are
+                             not counted as tests and stay NaN.
+
+        correction (str) - None (no correction, the baseline), 'bonferroni' (controls the family-wise error rate)
+                           or 'bh' (Benjamini-Hochberg, controls the false discovery rate).
+
+    Return:
+        adjusted (ndarray) - The adjusted P values (tumors x alleles), at most 1.
+    """
+
+    if correction is None:
+        return p_values
+
+    p_values = np.atleast_2d(np.asarray(p_values, dtype=np.float64))
+    tests = (~np.isnan(p_values)).sum(axis=1, keepdims=True) # The number of alleles tested in each tumor.
+
+    if correction == 'bonferroni':
+        return np.minimum(p_values * tests, 1)
+
+    if correction != 'bh':
+        raise ValueError(f"Unknown correction '{correction}'. Choose one of: bonferroni, bh.")
+
+    # Sorting the P values of each tumor once (NaN values go last).
+    order = np.argsort(p_values, axis=1, kind='stable')
+    sorted_p_values = np.take_along_axis(p_values, order, axis=1)
+    ranks = np.arange(1, p_values.shape[1] + 1)
+
+    # p * m / rank, made monotone from the largest P value down (the NaN values at the end must not take part).
+    scaled = np.where(np.isnan(sorted_p_values), np.inf, sorted_p_values * tests / ranks)
+    scaled = np.minimum.accumulate(scaled[:, ::-1], axis=1)[:, ::-1]
+    scaled = np.where(np.isnan(sorted_p_values), np.nan, np.minimum(scaled, 1))
+
+    adjusted = np.empty_like(p_values)
+    np.put_along_axis(adjusted, order, scaled, axis=1)
+
+    return adjusted
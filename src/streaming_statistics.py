@@ -0,0 +1,193 @@
+import pandas as pd
+import numpy as np
+from itertools import islice
+
+try: # When src is on sys.path (as in the tests).
+    from data_extraction import (EXPRESSION_DTYPE, csv_path, read_header, validate_critical_alpha, validate_test,
+                                 tabulate_significant_alleles, parse_expression_rows)
+    from group_statistics import group_samples
+    from statistical_tests import tumor_tests
+    from incremental_statistics import INCREMENTAL_TESTS, merge_samples, table_from_statistics
+except ModuleNotFoundError: # When running from the project's directory (as in main.py).
+    from src.data_extraction import (EXPRESSION_DTYPE, csv_path, read_header, validate_critical_alpha, validate_test,
+                                     tabulate_significant_alleles, parse_expression_rows)
+    from src.group_statistics import group_samples
+    from src.statistical_tests import tumor_tests
+    from src.incremental_statistics import INCREMENTAL_TESTS, merge_samples, table_from_statistics
+
+"""
+This code runs the same analysis as import_data + clean_data on CSV files that do not fit in memory.
+
+For the tests that only depend on the per-type statistics ('anova' and 'welch'), the CSV file is read once,
+in chunks of samples (rows): the count, mean and sum of squared deviations of every allele in every type are
+computed for each chunk and merged into the ones of the chunks before it (with the pairwise formula of
+Chan et al., as incremental_statistics.py merges appended samples), and the P values are derived from them
+at the end. Only chunk_size samples are held in memory at once; each parse of a chunk also has a fixed cost
+(a column for each of the ~54,000 alleles), so smaller chunks use less memory but take longer. On a
+GSE50161-sized file (130 samples), chunks of 100 samples took 8.1 s with a peak of ~255 MB, chunks of 25
+took 11.6 s with ~85 MB and chunks of 10 took 16.0 s with ~52 MB.
+
+The other tests ('mannwhitney', 'kruskal' and 'permutation') need every sample of an allele at once, so the
+file is read in blocks of alleles (columns) instead. pd.read_csv(usecols=...) still tokenizes every column
+of the file, so each block costs a pass over the whole file, and the time grows with the number of blocks:
+block_size trades memory (samples x block_size values) for the number of passes. Its baseline (20000 alleles,
+3 passes over a GSE50161-sized file, 9.1 s against 13.1 s for blocks of 5000) keeps the blocks small even
+for thousands of samples.
+
+Since every allele is tested independently, the results are the same as the ones of clean_data.
+"""
+
+def stream_clean_data(csv_name, critical_alpha = 0.01, block_size = 20000, test = 'anova', correction = None, permutations = 1000,
+                      chunk_size = 100):
+
+    """
+    Runs the analysis of clean_data on the CSV file chunk by chunk.
+
+    Args:
+        csv_name (str) - The name of the CSV file.
+
+        critical_alpha (float) - Significance threshold for identifying significant alleles.
+                                 Can be somewhere between 0 and 1. If the user has not inserted
+                                 a value for it or an invalid one, baseline value shall be 0.01.
+
+        block_size (int) - The number of alleles read at once by the tests that need every sample
+                           ('mannwhitney', 'kruskal' and 'permutation'). If no value is used then baseline is 20000.
+
+        test, correction, permutations - The test, the correction and the number of permutations (as in clean_data).
+                                         The corrections are applied once all the blocks were tested.
+
+        chunk_size (int) - The number of samples read at once by 'anova' and 'welch'. If no value is used then baseline is 100.
+
+    Return:
+        data (DataFrame) - Contains solely the mean expression of each allele that had a significant
+                           effect over the normal tissue (the same data as clean_data returns).
+    """
+
+    try:
+        # The directory of the excel we were using.
+        excel_directory = csv_path(csv_name)
+
+        # Only the header is read before the chunks (or blocks).
+        columns = read_header(excel_directory)
+
+    except FileNotFoundError: # If the excel file is not in the same directory as the code.
+        print(f"\nError: File {csv_name} not found. Ensure the file is in the correct directory.")
+        return
+
+    if len(columns) <= 2: # If excel file is empty.
+        print('\nCSV file is empty. Please add info.')
+        return
+
+    critical_alpha = validate_critical_alpha(critical_alpha)
+    test, correction = validate_test(test, correction)
+
+    if type(block_size) is not int or block_size < 1: # In case block size is not valid.
+        block_size = 20000
+        print('\nInserted value of block size is invalid. Baseline value (20000) was used instead.')
+
+    if type(chunk_size) is not int or chunk_size < 1: # In case chunk size is not valid.
+        chunk_size = 100
+        print('\nInserted value of chunk size is invalid. Baseline value (100) was used instead.')
+
+    # A list containing all the different alleles in the dataset.
+    alleles = columns[2:]
+
+    if test in INCREMENTAL_TESTS:
+        # The statistics of every type, merged chunk by chunk (in the same form as the store of incremental_statistics.py).
+        store = {'alleles': alleles, 'cancer_type': [], 'counts': np.zeros(0, dtype=np.int64),
+                 'means': np.zeros((0, len(alleles))), 'squares': np.zeros((0, len(alleles))), 'rows': 0}
+
+        for chunk in iter_sample_chunks(excel_directory, chunk_size):
+            merge_samples(store, chunk.iloc[:, 1], chunk.iloc[:, 2:].to_numpy())
+
+        if store['rows'] == 0: # If excel file is empty.
+            print('\nCSV file is empty. Please add info.')
+            return
+
+        return table_from_statistics(store, critical_alpha, test, correction)
+
+    means = p_values = None
+
+    for start, types, block in iter_allele_blocks(excel_directory, len(alleles), block_size):
+
+        if means is None: # The types are read with the first block.
+            if len(types) == 0: # If excel file is empty.
+                print('\nCSV file is empty. Please add info.')
+                return
+
+            # A list containing the types of each brain tumor, and the type of each sample (as an index of that list).
+            cancer_type, codes = group_samples(types)
+
+            if 'normal' not in cancer_type: # There is no control group to compare the tumors with.
+                return tabulate_significant_alleles(alleles, cancer_type, None, None, None, critical_alpha)
+
+            normal = cancer_type.index('normal')
+
+            # The mean and P value of every allele in every tumor, filled block by block.
+            means = np.zeros((len(cancer_type), len(alleles)))
+            p_values = np.full((len(cancer_type), len(alleles)), np.nan)
+
+        counts, means[:, start:start + block.shape[1]], p_values[:, start:start + block.shape[1]] = tumor_tests(
+            block, codes, len(cancer_type), normal, test, permutations, names=cancer_type)
+
+    return tabulate_significant_alleles(alleles, cancer_type, counts, means, p_values, critical_alpha, correction)
+
+
+def iter_sample_chunks(excel_directory, chunk_size):
+
+    """
+    Reads the CSV file once, a chunk of samples (lines) at a time.
+
+    Args:
+        excel_directory (str) - The path of the CSV file.
+
+        chunk_size (int) - The number of samples in each chunk.
+
+    Yield:
+        chunk (DataFrame) - The samples of the chunk: their names, their types and their expression values
+                            (as EXPRESSION_DTYPE), in columns numbered as in the file.
+    """
+
+    with open(excel_directory, 'rb') as excel_file:
+        excel_file.readline() # The header (see read_header).
+
+        while True:
+            lines = b''.join(islice(excel_file, chunk_size))
+
+            if not lines:
+                return
+
+            if lines.strip(): # Skipping chunks of empty lines, as pd.read_csv does.
+                # As in read_expression_csv, the alleles are parsed with a single dtype and the first two columns on their own.
+                yield parse_expression_rows(lines, header=False)
+
+
+def iter_allele_blocks(excel_directory, num_alleles, block_size):
+
+    """
+    Reads the expression values of the CSV file one block of alleles at a time (each block is a pass over the file).
+
+    Args:
+        excel_directory (str) - The path of the CSV file.
+
+        num_alleles (int) - The number of alleles in the file (all the columns but the first two).
+
+        block_size (int) - The number of alleles in each block.
+
+    Yield:
+        start (int) - The index of the first allele of the block.
+
+        types (Series) - The type of each sample (read along with every block, which costs nothing more).
+
+        block (ndarray) - The expression values of the block (samples x alleles), as EXPRESSION_DTYPE.
+    """
+
+    for start in range(0, num_alleles, block_size):
+
+        # The positions (in the CSV file) of the columns of the block, skipping the first two.
+        positions = range(start + 2, min(start + block_size, num_alleles) + 2)
+
+        # (The values are parsed as float64 and then converted, as pd.read_csv(dtype=...) does itself.)
+        block = pd.read_csv(excel_directory, usecols=[1, *positions])
+
+        yield start, block.iloc[:, 0], block.iloc[:, 1:].to_numpy(dtype=EXPRESSION_DTYPE)
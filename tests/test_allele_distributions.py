@@ -0,0 +1,105 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from allele_distributions import AlleleDistributions, distribution_of
+from data_extraction import clean_data
+from data_visualization import DataVisualization
+
+
+def example_df():
+
+    # Example of df, with a skewed allele and an allele whose values are all equal.
+    rng = np.random.default_rng(0)
+    types = ["ependymoma", "glioblastoma", "normal"] * 20
+    df = pd.DataFrame(rng.normal(8, 1, (60, 50)), columns=[f"{allele}_at" for allele in range(50)])
+    df["1_at"] = rng.exponential(2, 60)
+    df["2_at"] = 5.0
+    df.insert(0, "type", types)
+    df.insert(0, "samples", range(60))
+
+    return df
+
+
+def test_AlleleDistributions():
+
+    print('\n\\\\\\\\\\\\\\\\\\ AlleleDistributions() Test')
+
+    df = example_df()
+    distributions = AlleleDistributions(df, block_size=16)
+
+    for allele in ["0_at", "1_at", "2_at", "49_at"]:
+        values = df[allele]
+
+        # The statistics are those of describe(), in all the samples and in the samples of each type.
+        pd.testing.assert_series_equal(distributions.summary(allele), values.describe())
+        pd.testing.assert_series_equal(distributions.summary(allele, "glioblastoma"), values[df["type"] == "glioblastoma"].describe())
+
+        # The histograms are those of np.histogram, the ones of the types on the bins of all the samples.
+        counts, edges = distributions.histogram(allele)
+        expected_counts, expected_edges = np.histogram(values, distributions.bins)
+        assert (counts == expected_counts).all() and np.allclose(edges, expected_edges)
+        assert (distributions.histogram(allele, "normal")[0] == np.histogram(values[df["type"] == "normal"], edges)[0]).all()
+
+    # The KDE is the one of scipy (as seaborn fits it), and there is none for an allele whose values are all equal.
+    for allele in ["0_at", "1_at"]:
+        distribution = distributions.distribution(allele)
+        expected = stats.gaussian_kde(df[allele])(distribution['grid'])
+        assert np.allclose(distribution['density'], expected, atol=1e-3 * expected.max())
+
+    assert np.isnan(distributions.distribution("2_at")['density']).all()
+
+    # The distribution of an allele that was not precomputed is the same.
+    single = distribution_of(df["1_at"])
+    assert (single['counts'] == distributions.distribution("1_at")['counts']).all()
+    assert np.allclose(single['density'], distributions.distribution("1_at")['density'], rtol=1e-5)
+
+    # DataVisualization reads the summaries from the distributions.
+    visualization = DataVisualization(clean_data(df, 0.05), df, interactive=False, plots=False)
+    pd.testing.assert_series_equal(visualization.allele_results("1_at")['summary'], df["1_at"].describe())
+    assert visualization.allele_distributions is not None
+
+    print("\nTEST CONCLUSION: AlleleDistributions precomputes the statistics, histograms and KDE of every allele.")
+
+
+def test_AlleleDistributions_missing_values():
+
+    print('\n\\\\\\\\\\\\\\\\\\ AlleleDistributions() Missing Values Test')
+
+    # Example of df with missing values: a few in one allele, and all the glioblastoma samples of another one.
+    df = example_df()
+    df.loc[[0, 4, 7, 30], "3_at"] = np.nan
+    df.loc[df["type"] == "glioblastoma", "4_at"] = np.nan
+
+    distributions = AlleleDistributions(df, block_size=16)
+
+    # The missing values are skipped, as describe() skips them.
+    for allele in ["3_at", "4_at"]:
+        values = df[allele]
+        pd.testing.assert_series_equal(distributions.summary(allele), values.describe())
+        for tumor_type in ["ependymoma", "glioblastoma", "normal"]:
+            pd.testing.assert_series_equal(distributions.summary(allele, tumor_type), values[df["type"] == tumor_type].describe())
+
+        # The histograms and the KDE are those of the values that are not missing.
+        counts, edges = distributions.histogram(allele)
+        assert (counts == np.histogram(values.dropna(), distributions.bins)[0]).all()
+        assert distributions.histogram(allele, "glioblastoma")[0].sum() == values[df["type"] == "glioblastoma"].count()
+
+        distribution = distributions.distribution(allele)
+        expected = stats.gaussian_kde(values.dropna())(distribution['grid'])
+        assert distribution['samples'] == values.count()
+        assert np.allclose(distribution['density'], expected, atol=1e-3 * expected.max())
+
+    # The summaries are float64, as describe() gives them.
+    assert distributions.summary("3_at").dtype == np.float64
+
+    print("\nTEST CONCLUSION: AlleleDistributions skips the missing values.")
+
+
+test_AlleleDistributions()
+test_AlleleDistributions_missing_values()
@@ -0,0 +1,55 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from allele_table import AlleleTable, as_allele_table
+from data_extraction import clean_data
+from query_index import QueryIndex
+
+
+def test_allele_table():
+
+    print('\n\\\\\\\\\\\\\\\\\\ AlleleTable Test')
+
+    # Example of df, where ependymoma and glioblastoma have different (overlapping) significant alleles.
+    rng = np.random.default_rng(0)
+    types = ["ependymoma"] * 8 + ["glioblastoma"] * 8 + ["medulloblastoma"] * 8 + ["normal"] * 8
+    df = pd.DataFrame(rng.normal(8, 1, (32, 300)), columns=[f"{allele}_at" for allele in range(300)])
+    df.iloc[:8, 100:120] += 4
+    df.iloc[8:16, 50:110] -= 4
+    df.insert(0, "type", types)
+    df.insert(0, "samples", range(32))
+
+    data = clean_data(df, 0.01)
+    table = clean_data(df, 0.01, sparse=True)
+
+    # The sparse table is the same table, holding only the significant entries.
+    assert isinstance(table, AlleleTable)
+    pd.testing.assert_frame_equal(table.to_frame(), data)
+    assert list(table.index) == list(data.index) and list(table.columns) == list(data.columns)
+    assert len(table.values) == data.count().sum()
+    pd.testing.assert_series_equal(table.counts(), data.count(axis=1))
+
+    # Each tumor gives what dropna gives on its row.
+    for tumor in data.index:
+        pd.testing.assert_series_equal(table.tumor(tumor), data.loc[tumor].dropna())
+
+    # A DataFrame converted to a table gives the same entries, and the lookups built on either are the same.
+    converted = as_allele_table(data)
+    assert np.array_equal(converted.offsets, table.offsets) and np.array_equal(converted.indexes, table.indexes)
+    assert as_allele_table(table) is table
+
+    for tumor in data.index:
+        pd.testing.assert_frame_equal(QueryIndex(table, df).query_tumor(tumor), QueryIndex(data, df).query_tumor(tumor))
+
+    # An empty result is an empty table.
+    assert len(as_allele_table(pd.DataFrame())) == 0 and as_allele_table(pd.DataFrame()).to_frame().empty
+
+    print("\nTEST CONCLUSION: AlleleTable holds the results of clean_data sparsely with the same lookups.")
+
+
+test_allele_table()
@@ -0,0 +1,73 @@
+import sys
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from analysis_artifact import build_artifact, load_artifact, load_or_build_artifact
+from data_extraction import clean_data
+
+
+def test_analysis_artifact():
+
+    print('\n\\\\\\\\\\\\\\\\\\ AnalysisArtifact Test')
+
+    # Example of df, where the first 20 alleles are significant for ependymoma.
+    rng = np.random.default_rng(0)
+    types = ["ependymoma"] * 10 + ["glioblastoma"] * 10 + ["normal"] * 10
+    df = pd.DataFrame(rng.normal(8, 1, (30, 2000)), columns=[f"{allele}_at" for allele in range(2000)])
+    df.iloc[:10, :20] += 4
+    df.insert(0, "type", types)
+    df.insert(0, "samples", range(30))
+
+    expected = clean_data(df, 0.01)
+    artifact = build_artifact(df, 0.01, source={'path': 'example.csv', 'size': 1, 'mtime_ns': 1})
+
+    # The artifact holds exactly the result of clean_data, and the significant alleles of each tumor.
+    pd.testing.assert_frame_equal(artifact.to_table(), expected)
+    ependymoma = artifact.tumor("ependymoma")
+    assert list(ependymoma.index) == list(expected.loc["ependymoma"].dropna().index)
+    assert (ependymoma['p_value'] < 0.01).all() and (ependymoma.loc["0_at", 'log2_fold_change'] > 0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'analysis.npz')
+        artifact.save(path)
+
+        # Reloaded, it gives the same table, from a file smaller than the dense table.
+        loaded = load_artifact(path)
+        pd.testing.assert_frame_equal(loaded.to_table(), expected)
+        assert loaded.parameters == artifact.parameters and loaded.source == artifact.source
+        assert os.path.getsize(path) < expected.memory_usage(deep=True).sum()
+
+        # The file is reused only for the same parameters and the same CSV file.
+        parameters = {'critical_alpha': 0.01, 'test': 'anova', 'correction': None, 'permutations': 1000}
+        assert loaded.matches(parameters, artifact.source)
+        assert not loaded.matches(dict(parameters, critical_alpha=0.05), artifact.source)
+        assert not loaded.matches(parameters, {'path': 'example.csv', 'size': 2, 'mtime_ns': 1})
+        assert not loaded.matches(parameters, None) # Unknown data is never taken for the data of the file.
+
+        rebuilt = load_or_build_artifact(path, df, 0.05, source=artifact.source)
+        pd.testing.assert_frame_equal(rebuilt.to_table(), clean_data(df, 0.05))
+        assert load_artifact(path).parameters['critical_alpha'] == 0.05
+
+        # Invalid parameters are compared as their baseline values, so the artifact built with them is reused.
+        artifact.save(path)
+        mtime = os.stat(path).st_mtime_ns
+        reused = load_or_build_artifact(path, df, 5, test='invalid', source=artifact.source)
+        assert reused.parameters == parameters and os.stat(path).st_mtime_ns == mtime
+
+        # The file is replaced as a whole, without temporary files left behind.
+        assert os.listdir(directory) == ['analysis.npz']
+
+        # A damaged file is not trusted.
+        with open(path, 'wb') as damaged_file:
+            damaged_file.write(b'not an artifact')
+        assert load_artifact(path) is None
+
+    print("\nTEST CONCLUSION: AnalysisArtifact saves and reloads the results of clean_data.")
+
+
+test_analysis_artifact()
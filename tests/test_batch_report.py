@@ -0,0 +1,48 @@
+import sys
+import os
+import tempfile
+import pandas as pd
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from data_visualization import DataVisualization
+from batch_report import run_batch_report
+
+
+def test_run_batch_report():
+
+    print('\n\\\\\\\\\\\\\\\\\\ run_batch_report() Test')
+
+    # Example of df
+    df = pd.DataFrame({
+    "samples": [  834,          835,          836,            837,                   838,        839], 
+    "type": ["ependymoma", "glioblastoma", "normal", "ependymoma", "glioblastoma", "normal"],
+    "1007_s_at": [12,           15,          15,               9,                     10,         17],
+    "1053_at": [  5,            6,            7,               8,                     9,          9],
+    "117_at": [   10,           11,          12,               14,                    14,         12],
+    })
+
+    # Example of data
+    data = pd.DataFrame({
+    "1007_s_at": [10.5,         12.5,         16],
+    "1053_at": [  6.5,          None,         8],
+    "117_at": [   12,           12.5,         12],
+    }, index=["ependymoma", "glioblastoma", "normal"])
+
+    visualization = DataVisualization(data, df, 2, interactive=False)
+
+    with tempfile.TemporaryDirectory() as directory:
+
+        summary = run_batch_report(visualization, ['all'], ['unknown', 'all'], directory, workers=2)
+
+        # A row for every tumor (but normal) and allele, and every file it lists must exist.
+        assert list(summary['name']) == ["ependymoma", "glioblastoma", "1007_s_at", "1053_at", "117_at"]
+        assert all(os.path.exists(path) for files in summary['files'] for path in files.split(';'))
+        assert os.path.exists(os.path.join(directory, 'summary.csv'))
+
+    print("\nTEST CONCLUSION: run_batch_report saved every plot and the summary table.")
+
+
+
+test_run_batch_report()
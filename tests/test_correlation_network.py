@@ -0,0 +1,52 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from correlation_network import correlation_edges, edges_to_sparse
+
+
+def test_correlation_edges():
+
+    print('\n\\\\\\\\\\\\\\\\\\ correlation_edges() Test')
+
+    # Example of expression values with some correlated alleles and a constant one
+    rng = np.random.default_rng(0)
+    values = rng.normal(8, 1, (12, 40))
+    values[:, 1] = values[:, 0] * 2 + rng.normal(0, 0.1, 12)
+    values[:, 30] = -values[:, 5]
+    values[:, 7] = 3
+    alleles = [f"{allele}_at" for allele in range(40)]
+
+    # Tiles that do not divide the alleles evenly.
+    edges = correlation_edges(values, alleles, 0.7, block_size=16)
+
+    # The pairs must be exactly the ones of the full correlation matrix (each pair once).
+    correlation_data = pd.DataFrame(values, columns=alleles).corr().to_numpy()
+    rows, columns = np.nonzero(np.triu(np.abs(np.nan_to_num(correlation_data)) >= 0.7, k=1))
+
+    expected = {(alleles[row], alleles[column]) for row, column in zip(rows, columns)}
+    assert set(zip(edges['allele_a'], edges['allele_b'])) == expected
+    assert ("0_at", "1_at") in expected and ("5_at", "30_at") in expected
+
+    assert np.allclose(edges['correlation'], correlation_data[rows, columns], atol=1e-5)
+
+    # With a threshold of 0, every pair of alleles that vary is kept once, and no allele with itself.
+    everything = correlation_edges(values, alleles, 0, block_size=16)
+    assert len(everything) == 39 * 38 // 2
+    assert (everything['allele_a'] != everything['allele_b']).all()
+    assert not everything[['allele_a', 'allele_b']].duplicated().any()
+
+    # The sparse matrix is symmetric.
+    matrix = edges_to_sparse(edges, alleles)
+    assert matrix.shape == (40, 40) and matrix.nnz == 2 * len(edges)
+    assert np.isclose(matrix[30, 5], matrix[5, 30])
+
+    print("\nTEST CONCLUSION: correlation_edges found exactly the correlated pairs.")
+
+
+
+test_correlation_edges()
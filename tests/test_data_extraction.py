@@ -1,12 +1,13 @@
 import sys
 import os
+import tempfile
 import numpy as np
 import pandas as pd
 
 # Add the 'src' folder to the sys.path so Python can find the src package
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
 
-from data_extraction import import_data, clean_data, print_data
+from data_extraction import import_data, clean_data, print_data, read_expression_csv, CACHE_DIRECTORY
 
 
 def test_import_data():
@@ -28,6 +29,92 @@ def test_import_data():
     except Exception as e:
         print(f"\nTEST CONCLUSION: import_data failed with error: {e}")
 
+    # A missing name is reported (as a file that was not found), not raised.
+    assert import_data(csv_name) is None
+
+
+def test_import_data_cache():
+
+    print('\n\\\\\\\\\\\\\\\\\\ import_data() Cache Test')
+
+    # Example of a CSV file
+    df = pd.DataFrame({
+    "samples": [  834,          835,          836], 
+    "type": ["ependymoma", "glioblastoma", "normal"],
+    "1007_s_at": [12.5,         15,           15],
+    "1053_at": [  5,            6.25,         7],
+    })
+
+    current_directory = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory) # import_data looks for the CSV file in the current directory.
+
+        try:
+            df.to_csv("example.csv", index=False)
+
+            first = import_data("example") # Parses the CSV file and writes the cache.
+            assert os.path.exists(os.path.join(directory, CACHE_DIRECTORY, "example.npy"))
+
+            second = import_data("example") # Loads the cache.
+            pd.testing.assert_frame_equal(first, second)
+            assert second["1007_s_at"].dtype == np.float32
+
+            # Changing the CSV file must invalidate the cache.
+            df.loc[0, "1053_at"] = 100
+            df.to_csv("example.csv", index=False)
+            os.utime("example.csv", ns=(0, 0)) # Making sure the modification time changes as well.
+
+            third = import_data("example")
+            assert third.loc[0, "1053_at"] == 100
+
+            # A truncated or corrupt cache is parsed again (and rewritten) instead of failing.
+            values_path = os.path.join(directory, CACHE_DIRECTORY, "example.npy")
+            meta_path = os.path.join(directory, CACHE_DIRECTORY, "example.json")
+
+            with open(values_path, 'r+b') as values_file:
+                values_file.truncate(os.path.getsize(values_path) - 8)
+            pd.testing.assert_frame_equal(import_data("example"), third)
+
+            with open(meta_path, 'w') as meta_file:
+                meta_file.write('{"key": ')
+            pd.testing.assert_frame_equal(import_data("example"), third)
+            pd.testing.assert_frame_equal(import_data("example"), third) # From the rewritten cache.
+
+            # No temporary files are left behind.
+            assert sorted(os.listdir(os.path.join(directory, CACHE_DIRECTORY))) == ["example.json", "example.npy"]
+
+        finally:
+            os.chdir(current_directory)
+
+    print("\nTEST CONCLUSION: import_data cache was written, reused and invalidated correctly.")
+
+
+def test_read_expression_csv():
+
+    print('\n\\\\\\\\\\\\\\\\\\ read_expression_csv() Test')
+
+    # Example of a CSV file, with quoted first fields (one of them with a comma) and Windows line endings
+    text = ('samples,type,1007_s_at,1053_at\r\n'
+            '834,ependymoma,12.5,5\r\n'
+            '"835","glioblastoma, grade 4",15,6.25\r\n'
+            '836,normal,15,7\r\n')
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "example.csv")
+        with open(path, 'w', newline='') as excel_file:
+            excel_file.write(text)
+
+        # The same data as parsing the whole file at once, with the expression values as float32.
+        df = read_expression_csv(path)
+        expected = pd.read_csv(path)
+        expected[["1007_s_at", "1053_at"]] = expected[["1007_s_at", "1053_at"]].astype(np.float32)
+
+        pd.testing.assert_frame_equal(df, expected)
+        assert df.loc[1, "type"] == "glioblastoma, grade 4"
+
+    print("\nTEST CONCLUSION: read_expression_csv parsed the CSV file correctly.")
+
 
 def test_clean_data():
 
@@ -142,5 +229,7 @@ def test_print_data():
 
 
 test_import_data()
+test_import_data_cache()
+test_read_expression_csv()
 test_clean_data()
 test_print_data()
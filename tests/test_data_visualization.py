@@ -1,5 +1,7 @@
 import sys
 import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 
 # Add the 'src' folder to the sys.path so Python can find the src package
@@ -50,4 +52,86 @@ def test_DataVisualization():
 
 
 
+def test_DataVisualization_queries():
+
+    print('\n\\\\\\\\\\\\\\\\\\ DataVisualization() Queries Test')
+
+    # Example of df
+    df = pd.DataFrame({
+    "samples": [  834,          835,          836,            837,                   838], 
+    "type": ["ependymoma", "glioblastoma", "normal", "pilocytic_astrocytoma", "medulloblastoma"],
+    "1007_s_at": [12,           15,          15,               9,                     10],
+    "1053_at": [  5,            6,            7,               8,                     9],
+    "117_at": [   10,           11,          12,               13,                    14],
+    })
+
+    # Example of data
+    data = pd.DataFrame({
+    "1007_s_at": [None,       15,           15,               9,                    10],
+    "1053_at": [  5,            6,            7,               None,                9],
+    "117_at": [   10,           11,           12,               13,                None],
+    }, index=["ependymoma", "glioblastoma", "normal", "pilocytic_astrocytoma", "medulloblastoma"])
+
+    # Without the interface, the class can be queried directly (no input() or plt.show()).
+    visualization = DataVisualization(data, df, 2, interactive=False)
+
+    assert list(visualization.query_allele("1007_s_at").index) == ["glioblastoma", "pilocytic_astrocytoma", "medulloblastoma"]
+    assert list(visualization.query_tumor("medulloblastoma", 1).index) == ["1007_s_at"]
+
+    # Repeated analyses are read from the cache.
+    first = visualization.tumor_results("glioblastoma")
+    assert visualization.tumor_results("glioblastoma") is first
+    assert visualization.cache_stats()['hits'] == 1
+
+    # Changing num_for_plot is a different analysis.
+    visualization.num_for_plot = 3
+    assert visualization.tumor_results("glioblastoma") is not first
+
+    # The distributions are built once, even when several threads ask for them at the same time.
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        built = list(executor.map(lambda _: visualization.distributions(), range(8)))
+    assert all(distributions is built[0] for distributions in built)
+
+    png = visualization.render_png('distribution', "117_at")
+    assert png.startswith(b'\x89PNG') and visualization.render_png('distribution', "117_at") is png
+
+    print("\nTEST CONCLUSION: DataVisualization queries ran successfully without the interface.")
+
+
+
+def test_DataVisualization_no_plots():
+
+    print('\n\\\\\\\\\\\\\\\\\\ DataVisualization() Without Plots Test')
+
+    # Run in a new interpreter, since the other tests have already imported matplotlib in this one.
+    code = '''
+import sys
+import pandas as pd
+sys.path.insert(0, 'src')
+from data_visualization import DataVisualization
+
+df = pd.DataFrame({"samples": [1, 2, 3, 4], "type": ["glioblastoma", "glioblastoma", "normal", "normal"],
+                   "1007_s_at": [12, 14, 5, 6], "1053_at": [5, 6, 7, 8], "117_at": [10, 11, 1, 2]})
+data = pd.DataFrame({"1007_s_at": [13, 5.5], "1053_at": [None, 7.5], "117_at": [10.5, 1.5]}, index=["glioblastoma", "normal"])
+
+visualization = DataVisualization(data, df, 2, interactive=False, plots=False)
+visualization.analyze_tumor("glioblastoma", block=False)
+visualization.analyze_allele_expression("1007_s_at", block=False)
+assert visualization.render_png('distribution', "117_at") is None
+
+# Neither the analyses nor the import of the module loaded the plotting libraries.
+assert not [module for module in ('matplotlib', 'seaborn', 'scipy.stats') if module in sys.modules]
+'''
+
+    result = subprocess.run([sys.executable, '-c', code], cwd=os.path.join(os.path.dirname(__file__), '..'),
+                            capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+
+    print("\nTEST CONCLUSION: DataVisualization analyses without plots never import matplotlib or seaborn.")
+
+
+
 test_DataVisualization()
+test_DataVisualization_queries()
+test_DataVisualization_no_plots()
@@ -0,0 +1,93 @@
+import sys
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from expression_matrix import ExpressionMatrix, as_expression_matrix
+from data_extraction import import_data, clean_data
+from data_visualization import DataVisualization
+
+
+def example_df():
+
+    # Example of df
+    rng = np.random.default_rng(0)
+    types = ["ependymoma", "glioblastoma", "normal"] * 4
+
+    df = pd.DataFrame(rng.normal(8, 1, (len(types), 6)), columns=[f"{i}_at" for i in range(6)])
+    df.loc[[i for i, tumor in enumerate(types) if tumor == "glioblastoma"], "0_at"] += 5 # A significant allele.
+    df.insert(0, "type", types)
+    df.insert(0, "samples", range(len(types)))
+
+    return df
+
+
+def test_as_expression_matrix():
+
+    print('\n\\\\\\\\\\\\\\\\\\ as_expression_matrix() Test')
+
+    df = example_df()
+    matrix = as_expression_matrix(df, np.float32)
+
+    assert matrix.values.dtype == np.float32 and matrix.values.flags['C_CONTIGUOUS']
+    assert matrix.codes.dtype == np.int8
+    assert matrix.cancer_type == ["ependymoma", "glioblastoma", "normal"]
+    assert list(matrix.alleles) == list(df.columns[2:])
+
+    # The samples of a tumor are the same as masking the types of df.
+    assert np.allclose(matrix.group_values("glioblastoma", ["0_at", "3_at"]),
+                       df[df["type"] == "glioblastoma"][["0_at", "3_at"]])
+    assert matrix.group_values("unknown").shape == (0, 6)
+    assert np.allclose(matrix.allele("2_at"), df["2_at"])
+
+    # Converting back gives the same frame (up to the float32 values).
+    pd.testing.assert_frame_equal(matrix.to_frame(), df.astype({allele: np.float32 for allele in df.columns[2:]}))
+
+    assert as_expression_matrix(matrix) is matrix
+    assert as_expression_matrix(matrix, np.float16).values.dtype == np.float16
+    assert as_expression_matrix(matrix, np.float16).nbytes() < matrix.nbytes()
+
+    print("\nTEST CONCLUSION: as_expression_matrix stores the values and types of df compactly.")
+
+
+def test_compact_analysis():
+
+    print('\n\\\\\\\\\\\\\\\\\\ ExpressionMatrix Analysis Test')
+
+    df = example_df()
+    current_directory = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory) # import_data looks for the CSV file in the current directory.
+
+        try:
+            df.to_csv("example.csv", index=False)
+
+            import_data("example") # Writes the cache.
+            matrix = import_data("example", compact=True) # Loads the cache as an ExpressionMatrix.
+            assert isinstance(matrix, ExpressionMatrix)
+
+            # clean_data gives the same results on the matrix as on the DataFrame of the same file.
+            frame = import_data("example", use_cache=False)
+            pd.testing.assert_frame_equal(clean_data(matrix), clean_data(frame))
+            assert "0_at" in clean_data(matrix).loc["glioblastoma"].dropna().index
+
+            # The visualization gives the same results as well.
+            from_matrix = DataVisualization(clean_data(matrix), matrix, interactive=False)
+            from_frame = DataVisualization(clean_data(frame), frame, interactive=False)
+
+            pd.testing.assert_frame_equal(from_matrix.query_tumor("glioblastoma"), from_frame.query_tumor("glioblastoma"))
+            pd.testing.assert_series_equal(from_matrix.allele_results("0_at")['summary'], frame["0_at"].describe())
+
+        finally:
+            os.chdir(current_directory)
+
+    print("\nTEST CONCLUSION: clean_data and DataVisualization work off the ExpressionMatrix.")
+
+
+test_as_expression_matrix()
+test_compact_analysis()
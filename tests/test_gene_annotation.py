@@ -0,0 +1,83 @@
+import sys
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from gene_annotation import load_annotation, aggregate_genes
+from data_extraction import clean_data
+from data_visualization import DataVisualization
+
+
+def test_gene_annotation():
+
+    print('\n\\\\\\\\\\\\\\\\\\ gene_annotation Test')
+
+    # Example of an annotation file: 60 probes of 20 genes (3 probes each), one probe of two genes and one without a gene.
+    probes = [f"{probe}_at" for probe in range(62)]
+    genes = [f"GENE{probe % 20}" for probe in range(60)] + ["GENE0 /// GENE1", ""]
+
+    # Example of df, where the probes of GENE0 are overexpressed in ependymoma.
+    rng = np.random.default_rng(0)
+    types = ["ependymoma"] * 10 + ["glioblastoma"] * 10 + ["normal"] * 10
+    df = pd.DataFrame(rng.normal(8, 1, (30, 62)), columns=probes)
+    df.loc[:9, ["0_at", "20_at", "40_at"]] += 4
+    df.insert(0, "type", types)
+    df.insert(0, "samples", range(30))
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'GPL570.annot')
+        with open(path, 'w', encoding='utf-8') as annotation_file:
+            annotation_file.write("#ID = Affymetrix probe set ID\n!Annotation_date = today\n")
+            annotation_file.write("ID\tGene title\tGene symbol\tGene ID\n")
+            for probe, gene in zip(probes, genes):
+                annotation_file.write(f"{probe}\tsome title\t{gene}\t1\n")
+
+        annotation = load_annotation(path)
+        assert os.path.exists(os.path.join(directory, '.expression_cache', 'GPL570.annot.json'))
+
+        # Loaded again from the cache, with the same lookups.
+        cached = load_annotation(path)
+        assert cached.probe_genes == annotation.probe_genes and cached.gene_probes == annotation.gene_probes
+
+    assert load_annotation(os.path.join(directory, 'missing.annot')) is None
+
+    # Lookups in both directions (the genes regardless of case).
+    assert annotation.gene("20_at") == "GENE0" and annotation.gene("60_at") == "GENE0" and annotation.gene("61_at") is None
+    assert annotation.probes("gene0") == ["0_at", "20_at", "40_at", "60_at"] and annotation.symbol("gene3") == "GENE3"
+    assert len(annotation) == 61
+
+    # Every aggregation gives what pandas gives by grouping the probes by their gene.
+    values = df[probes[:61]]
+    groups = values.T.groupby([annotation.gene(probe) for probe in probes[:61]], sort=False)
+    expected = {'mean': groups.mean().T, 'max': groups.max().T}
+
+    for method in ('mean', 'max', 'most_variable'):
+        matrix = aggregate_genes(df, annotation, method)
+        assert list(matrix.alleles) == [f"GENE{gene}" for gene in range(20)]
+
+        if method in expected:
+            assert np.allclose(matrix.values, expected[method][list(matrix.alleles)].to_numpy(), atol=1e-5)
+        else: # Each gene is its probe with the largest variance.
+            variances = values.var()
+            chosen = [max(annotation.probes(gene), key=lambda probe: variances[probe]) for gene in matrix.alleles]
+            assert np.allclose(matrix.values, values[chosen].to_numpy())
+
+    # clean_data and DataVisualization run on the genes, and genes can be looked up by their symbol.
+    genes_matrix = aggregate_genes(df, annotation)
+    data = clean_data(genes_matrix, 0.01)
+    assert "GENE0" in data.loc["ependymoma"].dropna().index
+
+    visualization = DataVisualization(data, genes_matrix, interactive=False, plots=False, annotation=annotation)
+    assert not visualization.query_allele("GENE0").empty
+
+    probe_visualization = DataVisualization(clean_data(df, 0.01), df, interactive=False, plots=False, annotation=annotation)
+    probe_visualization.analyze_gene("gene0")
+
+    print("\nTEST CONCLUSION: gene_annotation maps the probes to their genes and collapses them.")
+
+
+test_gene_annotation()
@@ -0,0 +1,64 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+from scipy.stats import f_oneway
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from group_statistics import group_samples, sufficient_statistics, anova_from_statistics, build_allele_table
+
+
+def test_anova_from_statistics():
+
+    print('\n\\\\\\\\\\\\\\\\\\ anova_from_statistics() Test')
+
+    # Example of expression values for two tumors and the normal tissue
+    rng = np.random.default_rng(0)
+    values = rng.normal(8, 1, (12, 6))
+    values[:, 0] = 3 # A constant allele (undefined ANOVA).
+    types = ["ependymoma", "normal", "glioblastoma", "normal"] * 3
+
+    cancer_type, codes = group_samples(types)
+    assert cancer_type == ["ependymoma", "normal", "glioblastoma"] # Same order as df['type'].unique().
+
+    counts, means, squares = sufficient_statistics(values, codes, len(cancer_type))
+    assert list(counts) == [3, 6, 3]
+
+    # The F and P values must match f_oneway(tumor_data, normal_data).
+    f_statistics, p_values = anova_from_statistics(counts, means, squares, 0, 1)
+    expected_f, expected_p = f_oneway(values[codes == 0], values[codes == 1])
+
+    assert np.allclose(f_statistics, expected_f, equal_nan=True)
+    assert np.allclose(p_values, expected_p, equal_nan=True)
+
+    print("\nTEST CONCLUSION: anova_from_statistics matches f_oneway.")
+
+
+def test_build_allele_table():
+
+    print('\n\\\\\\\\\\\\\\\\\\ build_allele_table() Test')
+
+    alleles = pd.Index(["1007_s_at", "1053_at", "117_at", "121_at"])
+
+    # Example of significant alleles, the same ones as a dict and as (tumor, indexes, values) rows.
+    dict_alleles = {"ependymoma": {"117_at": 1.0},
+                    "glioblastoma": {},
+                    "normal": {"1007_s_at": 2.0, "1053_at": 3.0, "117_at": 4.0, "121_at": 5.0},
+                    "medulloblastoma": {"121_at": 6.0, "1007_s_at": 7.0}}
+
+    rows = [(tumor, [alleles.get_loc(allele) for allele in values], list(values.values()))
+            for tumor, values in dict_alleles.items()]
+
+    data = build_allele_table(alleles, rows)
+
+    # The table must be laid out exactly as pd.DataFrame.from_dict lays it out.
+    pd.testing.assert_frame_equal(data, pd.DataFrame.from_dict(dict_alleles, orient='index'))
+
+    print("\nTEST CONCLUSION: build_allele_table matches pd.DataFrame.from_dict.")
+
+
+
+test_anova_from_statistics()
+test_build_allele_table()
@@ -0,0 +1,104 @@
+import sys
+import os
+import tempfile
+import json
+import numpy as np
+import pandas as pd
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from incremental_statistics import update_statistics, incremental_clean_data, verify_statistics, merge_statistics
+from group_statistics import sufficient_statistics
+from data_extraction import import_data, clean_data, file_key, CACHE_DIRECTORY
+
+
+def example_df():
+
+    # Example of df
+    rng = np.random.default_rng(0)
+    types = ["ependymoma", "glioblastoma", "normal"] * 8 + ["medulloblastoma"] * 4
+
+    df = pd.DataFrame(rng.normal(8, 1, (len(types), 20)), columns=[f"{i}_at" for i in range(20)])
+    df.loc[[i for i, tumor in enumerate(types) if tumor == "glioblastoma"], ["0_at", "1_at"]] += 3 # Significant alleles.
+    df.insert(0, "type", types)
+    df.insert(0, "samples", range(len(types)))
+
+    return df
+
+
+def test_merge_statistics():
+
+    print('\n\\\\\\\\\\\\\\\\\\ merge_statistics() Test')
+
+    rng = np.random.default_rng(1)
+    values = rng.normal(1000, 1, (30, 5))
+    codes = rng.integers(0, 3, 30)
+
+    # Merging the statistics of two halves gives the statistics of the whole.
+    merged = merge_statistics(*sufficient_statistics(values[:17], codes[:17], 3), *sufficient_statistics(values[17:], codes[17:], 3))
+
+    for expected_array, merged_array in zip(sufficient_statistics(values, codes, 3), merged):
+        assert np.allclose(expected_array, merged_array, rtol=1e-12)
+
+    print("\nTEST CONCLUSION: merge_statistics matches the statistics of all the samples.")
+
+
+def test_incremental_clean_data():
+
+    print('\n\\\\\\\\\\\\\\\\\\ incremental_clean_data() Test')
+
+    df = example_df()
+    current_directory = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory) # The CSV file is looked for in the current directory.
+
+        try:
+            df.iloc[:18].to_csv("example.csv", index=False)
+            assert update_statistics("example")['rows'] == 18 # The store is built from the whole file.
+
+            # Appending samples (including a new type) only reads the new rows.
+            with open("example.csv", 'a', newline='') as excel_file:
+                df.iloc[18:].to_csv(excel_file, index=False, header=False)
+
+            data = incremental_clean_data("example", 0.05)
+            pd.testing.assert_frame_equal(data, clean_data(import_data("example", use_cache=False), 0.05), rtol=1e-9)
+
+            # The binary copy of the file was extended with the new rows, so it is loaded without parsing the file again.
+            with open(os.path.join(CACHE_DIRECTORY, "example.json")) as meta_file:
+                assert json.load(meta_file)['key'] == file_key("example.csv")
+            pd.testing.assert_frame_equal(import_data("example"), import_data("example", use_cache=False))
+
+            # The store is saved without leaving temporary files behind.
+            assert not [name for name in os.listdir(CACHE_DIRECTORY) if name.endswith('.tmp')]
+            assert update_statistics("example")['cancer_type'] == ["ependymoma", "glioblastoma", "normal", "medulloblastoma"]
+
+            assert verify_statistics("example", 0.05)
+            assert verify_statistics("example", 0.05, test='welch', correction='bh')
+
+            # Changing the samples already seen rebuilds the store.
+            df.loc[0, "0_at"] = 100
+            df.to_csv("example.csv", index=False)
+            assert verify_statistics("example", 0.05)
+
+            # Even an edit of the same length to the first sample, far before the end of the file, is noticed.
+            with open("example.csv") as excel_file:
+                lines = excel_file.read().split('\n')
+            fields = lines[1].split(',')
+            fields[2] = '9' * len(fields[2])
+            lines[1] = ','.join(fields)
+            with open("example.csv", 'w') as excel_file:
+                excel_file.write('\n'.join(lines))
+
+            assert os.path.getsize("example.csv") > 4 * len(lines[1])
+            assert verify_statistics("example", 0.05)
+
+        finally:
+            os.chdir(current_directory)
+
+    print("\nTEST CONCLUSION: incremental_clean_data matches a full recompute after samples are appended.")
+
+
+test_merge_statistics()
+test_incremental_clean_data()
@@ -0,0 +1,69 @@
+import sys
+import os
+import json
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from instrumentation import enable_instrumentation, disable_instrumentation, span, count, report, summary_table, export_json
+from data_extraction import clean_data
+
+
+def test_instrumentation():
+
+    print('\n\\\\\\\\\\\\\\\\\\ instrumentation Test')
+
+    # Example of df
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(8, 1, (24, 50)), columns=[f"{allele}_at" for allele in range(50)])
+    df.iloc[:8, :5] += 4 # Significant alleles for ependymoma.
+    df.insert(0, "type", ["ependymoma"] * 8 + ["glioblastoma"] * 8 + ["normal"] * 8)
+    df.insert(0, "samples", range(24))
+
+    # While disabled, nothing is recorded and the results are the same.
+    expected = clean_data(df, 0.01)
+    assert report() is None and disable_instrumentation() is None
+
+    enable_instrumentation(memory=True)
+    data = clean_data(df, 0.01)
+
+    with span('outer'):
+        with span('inner', tumor='ependymoma'):
+            count('queries', 2)
+
+    result = disable_instrumentation()
+    pd.testing.assert_frame_equal(data, expected)
+
+    spans = {(statistics['path'], tuple(statistics['labels'].items())): statistics for statistics in result['spans']}
+    counters = {(counter['name'], tuple(counter['labels'].items())): counter['value'] for counter in result['counters']}
+
+    # The stages are recorded under the stages they ran in, once for each tumor where they are per tumor.
+    assert spans[('clean_data', ())]['calls'] == 1
+    assert ('clean_data/tests', (('test', 'anova'),)) in spans and ('clean_data/tabulate', ()) in spans
+    assert ('clean_data/tests/group', (('tumor', 'ependymoma'),)) in spans and ('clean_data/tests/group', (('tumor', 'glioblastoma'),)) in spans
+    assert spans[('outer/inner', (('tumor', 'ependymoma'),))]['peak_bytes'] is not None
+    assert spans[('clean_data', ())]['seconds'] >= spans[('clean_data/tests', (('test', 'anova'),))]['seconds']
+
+    # Every allele of every tumor was tested, and the significant ones are those kept by clean_data.
+    assert counters[('probes_tested', (('tumor', 'ependymoma'),))] == 50
+    assert counters[('probes_significant', (('tumor', 'ependymoma'),))] == data.loc['ependymoma'].count()
+    assert counters[('queries', ())] == 2
+
+    # The report can be exported and read back, and printed as a table.
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'profile.json')
+        export_json(path, result)
+
+        with open(path, encoding='utf-8') as profile_file:
+            assert json.load(profile_file)['counters'] == json.loads(json.dumps(result['counters']))
+
+    table = summary_table(result)
+    assert 'clean_data/tests' in table and 'probes_significant [tumor=ependymoma]' in table
+
+    print("\nTEST CONCLUSION: instrumentation records the stages and counters of clean_data only when enabled.")
+
+
+test_instrumentation()
@@ -0,0 +1,62 @@
+import sys
+import os
+import time
+import matplotlib
+matplotlib.use('Agg') # The plots are drawn without opening windows.
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from data_extraction import clean_data
+from data_visualization import DataVisualization
+from interactive_session import InteractiveSession
+
+
+def test_InteractiveSession():
+
+    print('\n\\\\\\\\\\\\\\\\\\ InteractiveSession() Test')
+
+    # Example of df
+    rng = np.random.default_rng(0)
+    types = ["ependymoma", "glioblastoma", "normal"] * 6
+
+    df = pd.DataFrame(rng.normal(8, 1, (len(types), 12)), columns=[f"{i}_at" for i in range(12)])
+    df.loc[[i for i, tumor in enumerate(types) if tumor != "normal"], ["0_at", "1_at", "2_at"]] += 3
+    df.insert(0, "type", types)
+    df.insert(0, "samples", range(len(types)))
+
+    visualization = DataVisualization(clean_data(df, 0.05), df, 2, interactive=False)
+
+    # The lines the user types: queries, invalid entries (which must not nest any calls) and 'exit'.
+    lines = iter(["glioblastoma", "not_a_gene"] * 5 + ["0_at", "ependymoma", "exit"])
+
+    def type_line(prompt):
+        line = next(lines)
+        if line == 'exit': # The user waits for the results of the queries before quitting.
+            deadline = time.time() + 30
+            while len(session.latencies) < 7 and time.time() < deadline:
+                time.sleep(0.01)
+        return line
+
+    session = InteractiveSession(visualization, workers=2, input_function=type_line)
+    session.run()
+    plt.close('all')
+
+    shown = [(kind, name) for kind, name, _ in session.latencies]
+    assert ('allele', '0_at') in shown and ('tumor', 'ependymoma') in shown
+    assert shown.count(('tumor', 'glioblastoma')) == 5
+
+    # The distributions of the alleles were prefetched as well.
+    assert visualization.allele_distributions is not None
+
+    # Every tumor was prefetched, so each analysis was only computed once.
+    assert visualization.cache_stats()['misses'] == len(visualization.cancer_type) + 1
+    assert session.latency_stats()['queries'] == 7
+
+    print("\nTEST CONCLUSION: InteractiveSession answered every query without blocking or recursion.")
+
+
+test_InteractiveSession()
@@ -0,0 +1,69 @@
+import sys
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from multi_dataset import DatasetCollection, compare_datasets, replicated_alleles, shared_alleles
+from data_extraction import clean_data
+
+
+def example_dataset(seed, alleles, tumors):
+
+    # Example of df, where the first 5 shared alleles are significant for ependymoma.
+    rng = np.random.default_rng(seed)
+    types = [tumor for tumor in tumors for _ in range(6)] + ["normal"] * 6
+    df = pd.DataFrame(rng.normal(8, 1, (len(types), len(alleles))), columns=alleles)
+    df.loc[np.array(types) == "ependymoma", [f"{allele}_at" for allele in range(5)]] += 5
+    df.insert(0, "type", types)
+    df.insert(0, "samples", range(len(types)))
+
+    return df
+
+
+def test_compare_datasets():
+
+    print('\n\\\\\\\\\\\\\\\\\\ compare_datasets() Test')
+
+    # Two series that share 30 of their probes (in a different order), and share only one tumor.
+    first = example_dataset(0, [f"{allele}_at" for allele in range(40)], ["ependymoma", "glioblastoma"])
+    second = example_dataset(1, [f"{allele}_at" for allele in reversed(range(30))] + ["extra_at"], ["ependymoma", "medulloblastoma"])
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [os.path.join(directory, 'first.csv'), os.path.join(directory, 'second.csv')]
+        first.to_csv(paths[0], index=False)
+        second.to_csv(paths[1], index=False)
+
+        collection = DatasetCollection(paths)
+        assert not collection.loading # Nothing is loaded before it is needed.
+
+        matrices = collection.datasets()
+        assert list(shared_alleles(matrices)) == [f"{allele}_at" for allele in range(30)]
+
+        combined = compare_datasets(collection, 0.01)
+        collection.close()
+
+        # Running compare_datasets on the names gives the same table.
+        pd.testing.assert_frame_equal(compare_datasets(paths, 0.01), combined)
+
+    # Each dataset is analysed on the shared alleles only, exactly as clean_data analyses it alone.
+    shared = [f"{allele}_at" for allele in range(30)]
+    expected = clean_data(first[["samples", "type"] + shared], 0.01)
+    pd.testing.assert_frame_equal(combined.loc[paths[0]], expected, check_dtype=False, check_names=False, atol=1e-5)
+
+    assert list(combined.index.names) == ['dataset', 'tumor']
+    assert set(combined.loc[paths[1]].index) == {"ependymoma", "medulloblastoma", "normal"}
+
+    # The significant alleles of ependymoma are found in both series.
+    replicated = replicated_alleles(combined)
+    assert replicated.loc["ependymoma", "datasets"] == 2
+    assert set(replicated.loc["ependymoma", "replicated_alleles"].split(';')) >= {f"{allele}_at" for allele in range(5)}
+    assert "normal" not in replicated.index
+
+    print("\nTEST CONCLUSION: compare_datasets analyses several datasets on their shared alleles.")
+
+
+test_compare_datasets()
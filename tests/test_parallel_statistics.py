@@ -0,0 +1,51 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from data_extraction import clean_data
+from group_statistics import tumor_anova
+from parallel_statistics import parallel_tumor_anova
+
+
+def test_parallel_tumor_anova():
+
+    print('\n\\\\\\\\\\\\\\\\\\ parallel_tumor_anova() Test')
+
+    # Example of expression values for two tumors (one with a single sample) and the normal tissue
+    rng = np.random.default_rng(0)
+    values = rng.normal(8, 1, (13, 50)).astype(np.float32)
+    codes = np.array([0, 1, 2, 1] * 3 + [3])
+
+    expected = tumor_anova(values, codes, 4, 1)
+    result = parallel_tumor_anova(values, codes, 4, 1, workers=2, chunk_size=7, min_values=0) # Chunks that do not divide the alleles evenly.
+
+    # The results must be identical to the ones computed in a single process.
+    for expected_array, result_array in zip(expected, result):
+        np.testing.assert_array_equal(expected_array, result_array)
+
+    print("\nTEST CONCLUSION: parallel_tumor_anova matches tumor_anova.")
+
+
+def test_clean_data_workers():
+
+    print('\n\\\\\\\\\\\\\\\\\\ clean_data() Workers Test')
+
+    # Example of df
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame(rng.normal(8, 1, (20, 30)), columns=[f"{allele}_at" for allele in range(30)])
+    df.iloc[:5, :10] += 3 # Significant alleles for ependymoma.
+    df.insert(0, "type", ["ependymoma"] * 5 + ["glioblastoma"] * 5 + ["normal"] * 10)
+    df.insert(0, "samples", range(20))
+
+    pd.testing.assert_frame_equal(clean_data(df, 0.05), clean_data(df, 0.05, workers=3))
+
+    print("\nTEST CONCLUSION: clean_data gives the same data with and without workers.")
+
+
+
+test_parallel_tumor_anova()
+test_clean_data_workers()
@@ -0,0 +1,66 @@
+import sys
+import os
+import numpy as np
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from probe_search import ProbeSearch
+
+
+def edit_distance(a, b):
+
+    # The distance with swaps of two neighbouring letters, one cell at a time.
+    d = [[i + j if i * j == 0 else 0 for j in range(len(b) + 1)] for i in range(len(a) + 1)]
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[-1][-1]
+
+
+def test_search():
+
+    print('\n\\\\\\\\\\\\\\\\\\ ProbeSearch.search() Test')
+
+    alleles = ["1007_s_at", "1053_at", "117_at", "121_at", "1255_g_at", "AFFX-BioB-5_at", "TP53"]
+    search = ProbeSearch(alleles, genes=["TP53", "EGFR", "DDR1"], tumors=["normal", "glioblastoma", "ependymoma"])
+
+    # A name that is both an allele and a gene is kept once, as an allele.
+    assert len(search) == 12 and search.exact("tp53") == ("TP53", "allele")
+
+    # The exact name first (regardless of case), then the names starting with it.
+    assert search.search("AFFX-biob-5_AT")[0] == ("AFFX-BioB-5_at", "allele", "exact")
+    assert search.search("10", 2) == [("1053_at", "allele", "prefix"), ("1007_s_at", "allele", "prefix")]
+
+    # Substrings, then typos (a swap of two letters is one typo).
+    assert search.search("_g_")[0] == ("1255_g_at", "allele", "substring")
+    assert search.search("egrf") == [("EGFR", "gene", "fuzzy")]
+    assert search.search("gliobastoma")[0] == ("glioblastoma", "tumor", "fuzzy")
+    assert search.search("zzzz") == [] and search.search("") == []
+
+    print("\nTEST CONCLUSION: The suggestions are ranked exact, prefix, substring and fuzzy.")
+
+
+def test_fuzzy():
+
+    print('\n\\\\\\\\\\\\\\\\\\ ProbeSearch.fuzzy() Test')
+
+    rng = np.random.default_rng(0)
+    alleles = [f"{number}_{suffix}at" for number, suffix in zip(rng.integers(1000, 100000, 2000), rng.choice(["", "s_", "x_"], 2000))]
+    search = ProbeSearch(alleles)
+
+    # The vectorized distances are the same as the distances computed one name at a time.
+    for query in [alleles[0], alleles[1][:-1] + "x", "1234_at", "s_at"]:
+        positions, distances = search.fuzzy(query, 2)
+        found = dict(zip(search.keys[positions], distances.tolist()))
+
+        expected = {key: edit_distance(query, key) for key in search.keys if abs(len(key) - len(query)) <= 2}
+        assert found == {key: distance for key, distance in expected.items() if distance <= 2}
+
+    print("\nTEST CONCLUSION: ProbeSearch finds every name within the distance, with its edit distance.")
+
+
+test_search()
+test_fuzzy()
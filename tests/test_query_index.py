@@ -0,0 +1,133 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from query_index import QueryIndex, top_k
+
+
+def example_data():
+
+    # Example of df
+    df = pd.DataFrame({
+    "samples": [  834,          835,          836,            837,                   838,        839], 
+    "type": ["ependymoma", "glioblastoma", "normal", "pilocytic_astrocytoma", "medulloblastoma", "normal"],
+    "1007_s_at": [12,           15,          15,               9,                     10,         17],
+    "1053_at": [  5,            6,            7,               8,                     9,          9],
+    "117_at": [   10,           11,          12,               13,                    14,         12],
+    })
+
+    # Example of data
+    data = pd.DataFrame({
+    "1007_s_at": [None,         15,           16,               9,                    10],
+    "1053_at": [  5,            6,            8,                None,                 9],
+    "117_at": [   20,           11,           12,               13,                   None],
+    }, index=["ependymoma", "glioblastoma", "normal", "pilocytic_astrocytoma", "medulloblastoma"])
+
+    return data, df
+
+
+def test_query_tumor():
+
+    print('\n\\\\\\\\\\\\\\\\\\ QueryIndex.query_tumor() Test')
+
+    data, df = example_data()
+    index = QueryIndex(data, df)
+
+    result = index.query_tumor("glioblastoma")
+
+    # The alleles must be ranked exactly as sorting the absolute differences from normal ranks them.
+    normal_means = df[df['type'] == 'normal'][df.columns[2:]].mean()
+    row = data.loc["glioblastoma"].dropna()
+    differences = {allele: abs(row[allele] - normal_means[allele]) for allele in row.index}
+
+    assert list(result.index) == sorted(differences, key=differences.get, reverse=True)
+    assert list(index.query_tumor("glioblastoma", 2).index) == list(result.index[:2])
+    assert np.allclose(result['percent_of_normal'], row[result.index] / normal_means[result.index] * 100)
+
+    assert index.query_tumor("unknown").empty
+
+    print("\nTEST CONCLUSION: query_tumor ranks the alleles of the tumor correctly.")
+
+
+def test_query_allele():
+
+    print('\n\\\\\\\\\\\\\\\\\\ QueryIndex.query_allele() Test')
+
+    data, df = example_data()
+    index = QueryIndex(data, df)
+
+    assert index.has_allele("117_at") and not index.has_allele("normal")
+    assert index.has_tumor("normal") and not index.has_tumor("117_at")
+
+    result = index.query_allele("117_at")
+
+    # The allele is significant in every tumor but medulloblastoma (and normal is excluded).
+    assert list(result.index) == ["ependymoma", "glioblastoma", "pilocytic_astrocytoma"]
+    assert result.loc["ependymoma", "percent_of_normal"] == 20 / 12 * 100
+
+    assert index.query_allele("unknown").empty
+
+    print("\nTEST CONCLUSION: query_allele returns the tumors in which the allele is significant.")
+
+
+
+def test_query_tumor_rankings():
+
+    print('\n\\\\\\\\\\\\\\\\\\ QueryIndex.query_tumor() Rankings Test')
+
+    # Example of a larger dataset, with many ties among the differences.
+    rng = np.random.default_rng(0)
+    alleles = [f"{allele}_at" for allele in range(800)]
+    df = pd.DataFrame(np.round(rng.normal(8, 2, (30, 800))), columns=alleles)
+    df.insert(0, "type", ["glioblastoma"] * 15 + ["normal"] * 15)
+    df.insert(0, "samples", range(30))
+
+    means = df.groupby("type")[alleles].mean()
+    data = means.where(rng.random(means.shape) < 0.7) # Some alleles are not significant.
+    data.loc["normal"] = means.loc["normal"]
+
+    index = QueryIndex(data, df)
+    significant = data.loc["glioblastoma"].dropna().index
+    tumor, normal = df[df["type"] == "glioblastoma"][significant], df[df["type"] == "normal"][significant]
+
+    expected_scores = {'difference': (means.loc["glioblastoma", significant] - means.loc["normal", significant]).abs(),
+                       'log2_fold_change': np.log2(means.loc["glioblastoma", significant] / means.loc["normal", significant]).abs()}
+
+    for rank_by in ('difference', 'log2_fold_change', 'statistic'):
+        full = index.query_tumor("glioblastoma", rank_by=rank_by)
+
+        # Ranked as a stable sort of the scores ranks them (ties keep the order of data). Equal t statistics
+        # differ in their last digits, so for them only the order of the scores is checked.
+        if rank_by in expected_scores:
+            scores = expected_scores[rank_by]
+            assert list(full.index) == list(scores.index[np.argsort(-scores.to_numpy(), kind='stable')]), rank_by
+        else:
+            assert np.all(np.diff(full['statistic'].abs().to_numpy()) <= 0)
+
+        # The top N (selected with argpartition) are the first N of the full ranking, for small and large N.
+        for top in (1, 5, 500):
+            assert list(index.query_tumor("glioblastoma", top, rank_by).index) == list(full.index[:top]), (rank_by, top)
+
+    # The t statistic is Welch's, as ttest_ind computes it.
+    result = index.query_tumor("glioblastoma")
+    assert np.allclose(result['statistic'], stats.ttest_ind(tumor, normal, equal_var=False).statistic[significant.get_indexer(result.index)])
+
+    # An invalid ranking falls back to the difference.
+    assert list(index.query_tumor("glioblastoma", 5, 'unknown').index) == list(index.query_tumor("glioblastoma", 5).index)
+
+    # top_k gives the order of a stable sort, with NaN last.
+    scores = np.array([3, np.nan, 1, 3, 2, np.nan, 3])
+    assert list(top_k(scores, 2)) == [0, 3] and list(top_k(scores, 6)) == [0, 3, 6, 4, 2, 1]
+
+    print("\nTEST CONCLUSION: query_tumor ranks the alleles by difference, log2 fold change and t statistic.")
+
+
+
+test_query_tumor()
+test_query_allele()
+test_query_tumor_rankings()
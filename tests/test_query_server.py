@@ -0,0 +1,83 @@
+import sys
+import os
+import json
+import threading
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+import matplotlib
+matplotlib.use('Agg') # The plots are drawn without opening windows.
+import numpy as np
+import pandas as pd
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from data_extraction import clean_data
+from data_visualization import DataVisualization
+from query_server import QueryServer
+
+
+def test_QueryServer():
+
+    print('\n\\\\\\\\\\\\\\\\\\ QueryServer() Test')
+
+    # Example of df
+    rng = np.random.default_rng(0)
+    types = ["ependymoma", "glioblastoma", "normal"] * 6
+
+    df = pd.DataFrame(rng.normal(8, 1, (len(types), 12)), columns=[f"{i}_at" for i in range(12)])
+    df.loc[[i for i, tumor in enumerate(types) if tumor != "normal"], ["0_at", "1_at", "2_at"]] += 3
+    df.insert(0, "type", types)
+    df.insert(0, "samples", range(len(types)))
+
+    visualization = DataVisualization(clean_data(df, 0.05), df, 2, interactive=False)
+
+    server = QueryServer(visualization, port=0) # A free port.
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    address = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def get(path):
+        try:
+            with urllib.request.urlopen(address + path) as response:
+                return response.status, response.headers['Content-Type'], response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.headers['Content-Type'], error.read()
+
+    try:
+        status, _, body = get("/tumors/glioblastoma?top=2")
+        assert status == 200
+        ranking = json.loads(body)['alleles']
+        assert [row['allele'] for row in ranking] == list(visualization.query_tumor("glioblastoma", 2).index)
+
+        status, _, body = get("/alleles/0_at")
+        assert status == 200 and {row['tumor'] for row in json.loads(body)['tumors']} == {"ependymoma", "glioblastoma"}
+
+        assert get("/tumors/glioblastoma/correlations")[0] == 200
+        assert get("/tumors/glioblastoma/correlations?all=1")[0] == 200
+        assert get("/alleles/unknown")[0] == 404
+        assert get("/tumors/glioblastoma?top=abc")[0] == 400
+
+        status, _, body = get("/search?q=gliobastoma&limit=3")
+        assert status == 200 and json.loads(body)['suggestions'][0] == {'name': 'glioblastoma', 'kind': 'tumor', 'match': 'fuzzy'}
+
+        status, content_type, png = get("/plots/expression/glioblastoma.png")
+        assert status == 200 and content_type == 'image/png' and png.startswith(b'\x89PNG')
+
+        # Concurrent requests get the same (cached) responses.
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            bodies = list(executor.map(lambda _: get("/tumors/ependymoma")[2], range(32)))
+        assert len(set(bodies)) == 1
+
+        stats = json.loads(get("/stats")[2])
+        assert stats['latency']['tumors']['requests'] >= 34
+        assert stats['response_cache']['hits'] > 0
+
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print("\nTEST CONCLUSION: QueryServer answers concurrent JSON and PNG requests from its caches.")
+
+
+test_QueryServer()
@@ -0,0 +1,67 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from resampling import fold_change_intervals, significant_alleles, bootstrap_weights
+from data_extraction import clean_data
+from data_visualization import DataVisualization
+
+
+def test_fold_change_intervals():
+
+    print('\n\\\\\\\\\\\\\\\\\\ fold_change_intervals() Test')
+
+    # Example of df, where the first 10 alleles are overexpressed in ependymoma (twice the normal expression).
+    rng = np.random.default_rng(0)
+    types = ["ependymoma"] * 12 + ["glioblastoma"] * 12 + ["normal"] * 12
+    df = pd.DataFrame(rng.normal(8, 0.5, (36, 200)), columns=[f"{allele}_at" for allele in range(200)])
+    df.iloc[:12, :10] += 8
+    df.insert(0, "type", types)
+    df.insert(0, "samples", range(36))
+
+    data = clean_data(df, 0.01, sparse=True)
+    significant = significant_alleles(data)
+    assert set(significant["ependymoma"]) >= {f"{allele}_at" for allele in range(10)} and "normal" not in significant
+
+    # Each bootstrap resample draws as many samples as there are.
+    weights = bootstrap_weights(12, 500)
+    assert weights.shape == (500, 12) and np.allclose(weights.sum(axis=1), 1)
+
+    # The drawn resamples are reused, but only a bounded number of them are kept.
+    assert bootstrap_weights(12, 500) is weights
+    for sample_count in range(2, 100):
+        bootstrap_weights(sample_count, 10)
+    assert bootstrap_weights.cache_info().currsize <= bootstrap_weights.cache_info().maxsize
+
+    # The same results whether the blocks are computed on one thread or several.
+    intervals = fold_change_intervals(df, significant, 500, 500, workers=1, block_size=4)
+    pd.testing.assert_frame_equal(fold_change_intervals(df, significant, 500, 500, workers=4, block_size=4), intervals)
+
+    assert list(intervals.index.names) == ['tumor', 'allele']
+    assert len(intervals) == sum(len(alleles) for alleles in significant.values())
+
+    # Every interval holds its point estimate, and the overexpressed alleles are around 200% with small P values.
+    assert (intervals['ci_low'] <= intervals['percent_of_normal']).all() and (intervals['percent_of_normal'] <= intervals['ci_high']).all()
+    overexpressed = intervals.loc["ependymoma"].loc[[f"{allele}_at" for allele in range(10)]]
+    assert (overexpressed['ci_low'] > 150).all() and (overexpressed['ci_high'] < 250).all()
+    assert (overexpressed['p_value'] == 1 / 501).all()
+
+    # The point estimates are those of the tumor and the normal means.
+    tumor_means = df.iloc[:12, 2:].mean()
+    normal_means = df.iloc[24:, 2:].mean()
+    assert np.allclose(overexpressed['percent_of_normal'], (tumor_means / normal_means * 100)[overexpressed.index])
+
+    # DataVisualization adds the intervals of an allele to its analysis when resamples is given.
+    visualization = DataVisualization(data, df, interactive=False, plots=False, resamples=200)
+    results = visualization.allele_results("0_at")
+    assert ("ependymoma", "0_at") in results['intervals'].index
+    visualization.analyze_allele_expression("0_at", results, block=False)
+
+    print("\nTEST CONCLUSION: fold_change_intervals computes the uncertainty of the fold changes of the significant alleles.")
+
+
+test_fold_change_intervals()
@@ -0,0 +1,51 @@
+import sys
+import os
+import numpy as np
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from result_cache import ResultCache
+
+
+def test_result_cache():
+
+    print('\n\\\\\\\\\\\\\\\\\\ ResultCache() Test')
+
+    cache = ResultCache(max_entries=2, max_bytes=None)
+    computed = [] # The keys that had to be computed.
+
+    def compute(key):
+        computed.append(key)
+        return key * 2
+
+    for key in [1, 2, 1, 3, 2, 1]:
+        cache.get_or_compute(key, lambda: compute(key))
+
+    # 1 is used again before 3 arrives, so 2 (the least recently used) is dropped, and so on.
+    assert computed == [1, 2, 3, 2, 1]
+    assert cache.stats() == {'entries': 2, 'bytes': 128, 'hits': 1, 'misses': 5, 'evictions': 3}
+
+    print("\nTEST CONCLUSION: ResultCache drops the least recently used results.")
+
+
+def test_result_cache_bytes():
+
+    print('\n\\\\\\\\\\\\\\\\\\ ResultCache() Bytes Test')
+
+    cache = ResultCache(max_entries=10, max_bytes=2000)
+
+    cache.put('a', np.zeros(100)) # 800 bytes.
+    cache.put('b', np.zeros(100))
+    cache.put('c', np.zeros(100)) # Exceeds the bound, so 'a' is dropped.
+    cache.put('d', np.zeros(1000)) # Larger than the bound on its own, so it is not cached.
+
+    assert list(cache.entries) == ['b', 'c']
+    assert cache.total_bytes == 1600
+
+    print("\nTEST CONCLUSION: ResultCache keeps its results under the size bound.")
+
+
+
+test_result_cache()
+test_result_cache_bytes()
@@ -0,0 +1,82 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from sample_overview import randomized_pca, kmeans, hierarchical_clusters, sample_overview
+from data_extraction import clean_data
+
+
+def example_dataset():
+
+    # Example of df, where each tumor has 40 alleles of its own that are overexpressed.
+    rng = np.random.default_rng(0)
+    tumors = ["ependymoma", "glioblastoma", "medulloblastoma", "normal"]
+    types = np.repeat(tumors, 10)
+    df = pd.DataFrame(rng.normal(8, 1, (40, 1000)), columns=[f"{allele}_at" for allele in range(1000)])
+    for index, tumor in enumerate(tumors[:3]):
+        df.loc[types == tumor, [f"{allele}_at" for allele in range(index * 40, (index + 1) * 40)]] += 3
+    df.insert(0, "type", types)
+    df.insert(0, "samples", [f"GSM{sample}" for sample in range(40)])
+
+    return df
+
+
+def test_randomized_pca():
+
+    print('\n\\\\\\\\\\\\\\\\\\ randomized_pca() Test')
+
+    values = example_dataset().iloc[:, 2:].to_numpy()
+
+    # The first components are those of the exact SVD of the centered matrix (up to their sign and the accuracy of the randomized SVD).
+    scores, loadings, explained = randomized_pca(values, components=3, block_size=128)
+    centered = values - values.mean(axis=0)
+    _, singular_values, right = np.linalg.svd(centered, full_matrices=False)
+
+    assert np.allclose(np.abs((loadings * right[:3]).sum(axis=1)), 1, atol=1e-2)
+    assert np.allclose(explained, singular_values[:3] ** 2 / (centered ** 2).sum(), rtol=1e-2)
+    assert np.allclose(scores, centered @ loadings.T)
+
+    # A subset of the alleles gives the PCA of that subset.
+    positions = np.arange(0, 1000, 3)
+    subset_scores = randomized_pca(values, positions, components=2, block_size=100)[0]
+    assert np.allclose(subset_scores, randomized_pca(values[:, positions], components=2)[0])
+
+    print("\nTEST CONCLUSION: randomized_pca finds the principal components block by block.")
+
+
+def test_sample_overview():
+
+    print('\n\\\\\\\\\\\\\\\\\\ sample_overview() Test')
+
+    df = example_dataset()
+    types = df["type"].to_numpy()
+
+    # Two well separated groups of points are found by both clusterings.
+    points = np.vstack([np.zeros((5, 2)), np.full((5, 2), 10.0)]) + np.random.default_rng(1).normal(0, 0.1, (10, 2))
+    for labels in (kmeans(points, 2)[0], hierarchical_clusters(points, 2)):
+        assert len(set(labels[:5])) == 1 and len(set(labels[5:])) == 1 and labels[0] != labels[5]
+
+    # Every type of sample is a cluster of its own, with either clustering and either set of alleles.
+    data = clean_data(df, 0.01, sparse=True)
+    for method, significant in (('kmeans', None), ('hierarchical', data)):
+        overview = sample_overview(df, significant, components=5, method=method)
+        clusters = overview['sample_clusters'].to_numpy()
+
+        assert all(len(set(clusters[types == tumor])) == 1 for tumor in set(types))
+        assert len(set(clusters)) == 4
+        assert (overview['types_by_cluster'] > 0).sum(axis=1).eq(1).all()
+
+    # The significant alleles are fewer than all of them, and the top alleles include the overexpressed ones.
+    assert overview['loadings'].shape[1] < 1000
+    assert len(set(overview['probe_clusters'].index) & {f"{allele}_at" for allele in range(120)}) > 60
+    assert list(overview['scores'].columns[:2]) == ['PC1', 'PC2'] and (overview['scores']['type'].to_numpy() == types).all()
+
+    print("\nTEST CONCLUSION: sample_overview separates the types of the samples.")
+
+
+test_randomized_pca()
+test_sample_overview()
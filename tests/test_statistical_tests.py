@@ -0,0 +1,107 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from statistical_tests import compare_groups, adjust_p_values, tumor_tests, permutation_weights
+from parallel_statistics import parallel_tumor_anova
+from data_extraction import clean_data
+
+
+def test_compare_groups():
+
+    print('\n\\\\\\\\\\\\\\\\\\ compare_groups() Test')
+
+    # Example of expression values of a tumor and of the normal tissue, with ties in the first alleles
+    rng = np.random.default_rng(0)
+    tumor = rng.normal(0, 1, (12, 40))
+    normal = rng.normal(0.5, 2, (9, 40))
+    tumor[:, :10], normal[:, :10] = np.round(tumor[:, :10]), np.round(normal[:, :10])
+
+    references = {'anova': lambda x, y: stats.f_oneway(x, y).pvalue,
+                  'welch': lambda x, y: stats.ttest_ind(x, y, equal_var=False).pvalue,
+                  'mannwhitney': lambda x, y: stats.mannwhitneyu(x, y, method='asymptotic').pvalue,
+                  'kruskal': lambda x, y: stats.kruskal(x, y).pvalue}
+
+    # Every test must give the P values scipy gives for each allele on its own.
+    for test, reference in references.items():
+        expected = [reference(tumor[:, allele], normal[:, allele]) for allele in range(40)]
+        assert np.allclose(compare_groups(tumor, normal, test), expected), test
+
+    # The permutation test is reproducible, and finds a large difference.
+    shifted = tumor + 5 * (np.arange(40) < 5)
+    p_values = compare_groups(shifted, normal, 'permutation', 500)
+
+    assert np.array_equal(p_values, compare_groups(shifted, normal, 'permutation', 500))
+    assert np.all(p_values[:5] == 1 / 501) and np.all((p_values > 0) & (p_values <= 1))
+
+    # The drawn permutations are reused, but only a bounded number of them are kept.
+    assert permutation_weights(10, 12, 500) is permutation_weights(10, 12, 500)
+    for group_count in range(2, 100):
+        permutation_weights(group_count, 5, 10)
+    assert permutation_weights.cache_info().currsize <= permutation_weights.cache_info().maxsize
+
+    print("\nTEST CONCLUSION: compare_groups matches scipy's tests.")
+
+
+def test_adjust_p_values():
+
+    print('\n\\\\\\\\\\\\\\\\\\ adjust_p_values() Test')
+
+    # Example of P values of two tumors, the second with untested alleles (NaN)
+    rng = np.random.default_rng(1)
+    p_values = rng.uniform(0, 0.1, (2, 200))
+    p_values[1, ::5] = np.nan
+
+    adjusted = adjust_p_values(p_values, 'bh')
+    tested = ~np.isnan(p_values[1])
+
+    assert np.allclose(adjusted[0], stats.false_discovery_control(p_values[0]))
+    assert np.allclose(adjusted[1, tested], stats.false_discovery_control(p_values[1, tested]))
+    assert np.all(np.isnan(adjusted[1, ~tested]))
+
+    assert np.allclose(adjust_p_values(p_values, 'bonferroni')[0], np.minimum(p_values[0] * 200, 1))
+    assert adjust_p_values(p_values) is p_values
+
+    print("\nTEST CONCLUSION: adjust_p_values matches the Benjamini-Hochberg and Bonferroni corrections.")
+
+
+def test_clean_data_tests():
+
+    print('\n\\\\\\\\\\\\\\\\\\ clean_data() Tests and Corrections Test')
+
+    # Example of df
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame(rng.normal(8, 1, (24, 60)), columns=[f"{allele}_at" for allele in range(60)])
+    df.iloc[:8, :6] += 4 # Significant alleles for ependymoma.
+    df.insert(0, "type", ["ependymoma"] * 8 + ["glioblastoma"] * 8 + ["normal"] * 8)
+    df.insert(0, "samples", range(24))
+
+    for test in ('welch', 'mannwhitney', 'permutation'):
+        data = clean_data(df, 0.01, test=test)
+        assert set(df.columns[2:8]) <= set(data.loc["ependymoma"].dropna().index), test
+
+    # A correction can only keep fewer alleles.
+    uncorrected = clean_data(df, 0.05)
+    corrected = clean_data(df, 0.05, correction='bh')
+    assert corrected.loc["ependymoma"].count() <= uncorrected.loc["ependymoma"].count()
+
+    # The tests give the same results on several processes.
+    values, codes = df.iloc[:, 2:].to_numpy(), pd.factorize(df["type"])[0]
+    for expected_array, result_array in zip(tumor_tests(values, codes, 3, 2, 'permutation', 200),
+                                            parallel_tumor_anova(values, codes, 3, 2, 2, 25, 'permutation', 200)):
+        np.testing.assert_array_equal(expected_array, result_array)
+
+    # An invalid test falls back to the ANOVA.
+    pd.testing.assert_frame_equal(clean_data(df, 0.05, test='unknown'), uncorrected)
+
+    print("\nTEST CONCLUSION: clean_data runs every test and correction.")
+
+
+test_compare_groups()
+test_adjust_p_values()
+test_clean_data_tests()
@@ -0,0 +1,67 @@
+import sys
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Add the 'src' folder to the sys.path so Python can find the src package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from data_extraction import import_data, clean_data
+from streaming_statistics import stream_clean_data
+
+
+def test_stream_clean_data():
+
+    print('\n\\\\\\\\\\\\\\\\\\ stream_clean_data() Test')
+
+    # Example of a CSV file
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(8, 1, (16, 11)).round(3), columns=[f"{allele}_at" for allele in range(11)])
+    df.iloc[:4, :5] += 2 # Significant alleles for ependymoma.
+    df.insert(0, "type", ["ependymoma"] * 4 + ["glioblastoma"] * 4 + ["normal"] * 7 + ["medulloblastoma"])
+    df.insert(0, "samples", range(16))
+
+    current_directory = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory) # Both functions look for the CSV file in the current directory.
+
+        try:
+            df.to_csv("example.csv", index=False)
+
+            loaded = import_data("example", use_cache=False)
+            expected = clean_data(loaded, 0.05)
+
+            # Chunks that do not divide the samples evenly must give the same data as the in-memory path.
+            data = stream_clean_data("example", 0.05, chunk_size=5)
+            pd.testing.assert_frame_equal(stream_clean_data("example", 0.05, test='welch', chunk_size=3),
+                                          clean_data(loaded, 0.05, test='welch'))
+
+            # And so must blocks that do not divide the alleles evenly, for the tests that need every sample.
+            pd.testing.assert_frame_equal(stream_clean_data("example", 0.05, block_size=4, test='mannwhitney', correction='bh'),
+                                          clean_data(loaded, 0.05, test='mannwhitney', correction='bh'))
+
+            # The file is found as import_data finds it (with or without the extension).
+            pd.testing.assert_frame_equal(stream_clean_data("example.csv", 0.05), expected)
+
+        finally:
+            os.chdir(current_directory)
+
+    pd.testing.assert_frame_equal(data, expected)
+
+    print("\nTEST CONCLUSION: stream_clean_data matches clean_data.")
+
+
+def test_stream_clean_data_missing_file():
+
+    print('\n\\\\\\\\\\\\\\\\\\ stream_clean_data() Missing File Test')
+
+    assert stream_clean_data(None) is None
+
+    print("\nTEST CONCLUSION: stream_clean_data correctly handled missing filename.")
+
+
+
+test_stream_clean_data()
+test_stream_clean_data_missing_file()